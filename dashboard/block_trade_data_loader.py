@@ -1,29 +1,20 @@
-import duckdb
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 
+from dashboard.db import connect, db_path, get_catalog_connection
+
 # Database paths
-REF_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_ref.db'
-STOCK_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_stock.db'
+REF_DB_PATH = db_path('reference')
+STOCK_DB_PATH = db_path('stock')
 
 def get_ref_db_connection():
     """Establish connection to reference DuckDB."""
-    try:
-        conn = duckdb.connect(REF_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to reference database: {e}")
-        return None
+    return connect(REF_DB_PATH)
 
 def get_stock_db_connection():
     """Establish connection to stock DuckDB."""
-    try:
-        conn = duckdb.connect(STOCK_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to stock database: {e}")
-        return None
+    return connect(STOCK_DB_PATH)
 
 @st.cache_data
 def load_market_block_activity(start_date: str, end_date: str):
@@ -60,31 +51,31 @@ def load_top_block_trades(date_str: str, limit: int = 20):
     """
     Fetch stocks with highest block trade amount on a specific date.
     """
-    conn = get_ref_db_connection()
+    conn = get_catalog_connection('reference', 'stock')
     if not conn:
         return pd.DataFrame()
     
     try:
-        # Join with stock names if possible, but let's do it simply first
+        # Top trades joined with stock names in one catalog query
         query = f"""
-            SELECT ts_code, 
-                   COUNT(*) as trade_count,
-                   SUM(vol) as total_vol,
-                   SUM(amount) as total_amount,
-                   AVG(price) as avg_price
-            FROM block_trade
-            WHERE trade_date = '{date_str}'
-            GROUP BY ts_code
-            ORDER BY total_amount DESC
-            LIMIT {limit}
+            WITH top AS (
+                SELECT ts_code, 
+                       COUNT(*) as trade_count,
+                       SUM(vol) as total_vol,
+                       SUM(amount) as total_amount,
+                       AVG(price) as avg_price
+                FROM reference.block_trade
+                WHERE trade_date = ?
+                GROUP BY ts_code
+                ORDER BY total_amount DESC
+                LIMIT {int(limit)}
+            )
+            SELECT top.*, s.name
+            FROM top
+            LEFT JOIN stock.stock_basic s ON top.ts_code = s.ts_code
+            ORDER BY top.total_amount DESC
         """
-        df = conn.execute(query).fetchdf()
-        
-        # Add names
-        if not df.empty:
-            names_df = load_stock_names(df['ts_code'].tolist())
-            df = df.merge(names_df, on='ts_code', how='left')
-            
+        df = conn.execute(query, [date_str]).fetchdf()
         return df
     except Exception as e:
         st.error(f"Error loading top block trades: {e}")
@@ -97,53 +88,36 @@ def load_stock_block_history(ts_code: str, start_date: str, end_date: str):
     """
     Fetch block trade history for a specific stock, including daily close for discount calculation.
     """
-    ref_conn = get_ref_db_connection()
-    if not ref_conn:
+    conn = get_catalog_connection('reference', 'stock')
+    if not conn:
         return pd.DataFrame()
     
     try:
-        # 1. Fetch block trade records
-        query_block = f"""
-            SELECT trade_date, price as block_price, vol, amount, buyer, seller
-            FROM block_trade
-            WHERE ts_code = '{ts_code}'
-              AND trade_date BETWEEN '{start_date}' AND '{end_date}'
-            ORDER BY trade_date ASC
+        # Block trade records with the same day's close (stock.daily) to calculate discount
+        query = """
+            SELECT b.trade_date, b.price as block_price, b.vol, b.amount, b.buyer, b.seller,
+                   d.close as daily_close
+            FROM reference.block_trade b
+            LEFT JOIN stock.daily d ON d.ts_code = b.ts_code AND d.trade_date = b.trade_date
+            WHERE b.ts_code = ?
+              AND b.trade_date BETWEEN ? AND ?
+            ORDER BY b.trade_date ASC
         """
-        df_block = ref_conn.execute(query_block).fetchdf()
+        df_merged = conn.execute(query, [ts_code, start_date, end_date]).fetchdf()
         
-        if df_block.empty:
+        if df_merged.empty:
             return pd.DataFrame()
-            
-        # 2. Fetch daily close prices for those dates to calculate discount
-        stock_conn = get_stock_db_connection()
-        if stock_conn:
-            dates = df_block['trade_date'].unique().tolist()
-            dates_str = ",".join([f"'{d}'" for d in dates])
-            query_daily = f"""
-                SELECT trade_date, close as daily_close
-                FROM daily
-                WHERE ts_code = '{ts_code}'
-                  AND trade_date IN ({dates_str})
-            """
-            df_daily = stock_conn.execute(query_daily).fetchdf()
-            stock_conn.close()
-            
-            # Merge
-            df_merged = df_block.merge(df_daily, on='trade_date', how='left')
-            
-            # Calculate discount: (daily_close - block_price) / daily_close
-            df_merged['discount_rate'] = (df_merged['daily_close'] - df_merged['block_price']) / df_merged['daily_close'] * 100
-            
-            df_merged['trade_date'] = pd.to_datetime(df_merged['trade_date'])
-            return df_merged
-            
-        return df_block
+        
+        # Calculate discount: (daily_close - block_price) / daily_close
+        df_merged['discount_rate'] = (df_merged['daily_close'] - df_merged['block_price']) / df_merged['daily_close'] * 100
+        
+        df_merged['trade_date'] = pd.to_datetime(df_merged['trade_date'])
+        return df_merged
     except Exception as e:
         st.error(f"Error loading stock block history: {e}")
         return pd.DataFrame()
     finally:
-        ref_conn.close()
+        conn.close()
 
 @st.cache_data
 def load_stock_names(ts_codes: list):
@@ -0,0 +1,196 @@
+"""
+Dashboard Persistent Cache
+==========================
+数据加载函数的持久化缓存：结果按「函数 + 参数 + 数据版本」保存为 Arrow IPC 文件，
+进程重启 / 重新部署后首次访问直接读盘，不再重新查询 DuckDB。
+
+- 数据版本取自所读各表在本库 metadata 表中的 (max_date, last_updated)：daily_fetcher 写入后
+  update_metadata 刷新这两列，版本随之改变，旧条目不再命中（同参数的旧文件在写入新文件时删除）
+- 内存层仍是 st.cache_data，但数据版本是键的一部分，夜间更新后不会继续返回旧结果
+- 表不存在（数据库未配置 / 文件缺失 / 尚未建表）记为 absent，建表后版本同样改变；
+  表存在但 metadata 中没有记录时无法判断版本，只走内存缓存（按 ttl 过期）
+- 只有非空 DataFrame 写入磁盘，其余返回值（日期字符串、字典等）只缓存在内存
+- 版本查询按数据库文件逐个以只读方式短暂打开、查完即关，不持有文件锁；结果按
+  DASHBOARD_VERSION_TTL 秒（默认 30）缓存，页面重跑直接复用，夜间更新最多延迟这么久被发现
+- 缓存目录 DASHBOARD_CACHE_DIR（默认 ${DB_ROOT}/dashboard_cache），可随时整体删除；每次写入后
+  删除超过 DASHBOARD_CACHE_MAX_AGE_DAYS 天未访问的文件，总大小超过 DASHBOARD_CACHE_MAX_MB 时
+  按最近访问时间从旧到新继续删除（读取命中会刷新文件的修改时间）
+
+用法：
+
+    @persistent_cache('index.sw_daily', 'index.sw_index_member_all', ttl=3600)
+    def get_top_l1_gainers(trade_date: str, top_n: int = 5):
+        ...
+
+表以 '<类别>.<表名>' 给出，类别为 settings.yaml 顶层类别或 'agg'（聚合库）。
+"""
+import functools
+import hashlib
+import inspect
+import os
+import time
+from pathlib import Path
+
+import duckdb
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from dashboard.db import AGG_DB_PATH, DB_ROOT, db_path
+
+CACHE_DIR = Path(os.getenv('DASHBOARD_CACHE_DIR', os.path.join(DB_ROOT, 'dashboard_cache')))
+
+# 磁盘缓存上限：总大小（MB）与未访问天数
+CACHE_MAX_MB = float(os.getenv('DASHBOARD_CACHE_MAX_MB', '1024'))
+CACHE_MAX_AGE_DAYS = float(os.getenv('DASHBOARD_CACHE_MAX_AGE_DAYS', '30'))
+
+# 数据版本查询结果的缓存时间（秒）
+VERSION_TTL = int(os.getenv('DASHBOARD_VERSION_TTL', '30'))
+
+
+def _table_path(category):
+    """类别对应的数据库文件，未配置时为 None。"""
+    if category == 'agg':
+        return AGG_DB_PATH
+    try:
+        return db_path(category)
+    except KeyError:
+        return None
+
+
+@st.cache_data(ttl=VERSION_TTL, show_spinner=False)
+def data_version(tables):
+    """
+    tables 当前的数据版本（metadata 中 max_date / last_updated 的摘要），按 VERSION_TTL 缓存。
+
+    Args:
+        tables: '<类别>.<表名>' 元组
+
+    Returns:
+        str，或 None（无法确定版本：表存在但 metadata 无记录、查询失败）
+    """
+    by_path = {}
+    for spec in tables:
+        category, table_name = spec.split('.', 1)
+        by_path.setdefault(_table_path(category), []).append((spec, table_name))
+
+    versions = {}
+    try:
+        for path, specs in by_path.items():
+            if not path or not Path(path).exists():
+                versions.update((spec, 'absent') for spec, _ in specs)
+                continue
+            with duckdb.connect(path, read_only=True) as conn:
+                existing = {r[0] for r in conn.execute(
+                    "SELECT table_name FROM information_schema.tables WHERE table_schema = 'main'"
+                ).fetchall()}
+                for spec, table_name in specs:
+                    if table_name not in existing:
+                        versions[spec] = 'absent'
+                        continue
+                    row = None
+                    if 'metadata' in existing:
+                        row = conn.execute(
+                            "SELECT max_date, last_updated FROM metadata WHERE table_name = ?", [table_name]
+                        ).fetchone()
+                    if row is None:
+                        return None
+                    versions[spec] = f"{row[0]}@{row[1]}"
+    except Exception:
+        return None
+    parts = [f"{spec}={versions[spec]}" for spec in tables]
+    return hashlib.sha1('|'.join(parts).encode('utf-8')).hexdigest()[:16]
+
+
+def _read_entry(path):
+    with pa.OSFile(str(path), 'rb') as source:
+        df = pa.ipc.open_file(source).read_all().to_pandas()
+    # 修改时间即最近访问时间，供 _evict 按 LRU 淘汰
+    os.utime(path)
+    return df
+
+
+def _write_entry(path, df):
+    """原子写入（临时文件 + 替换），并删除同一参数其他版本的旧文件。"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with pa.OSFile(str(tmp_path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    args_key = path.name.split('-', 1)[0]
+    for stale in path.parent.glob(f"{args_key}-*.arrow"):
+        if stale != path:
+            stale.unlink(missing_ok=True)
+    _evict(keep=path)
+
+
+def _evict(keep=None):
+    """删除超过 CACHE_MAX_AGE_DAYS 未访问的条目，总大小超过 CACHE_MAX_MB 时再从最久未访问的删起。"""
+    entries = []
+    for entry in CACHE_DIR.glob('*/*.arrow'):
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry))
+    entries.sort(key=lambda e: e[0])
+
+    expire_before = time.time() - CACHE_MAX_AGE_DAYS * 86400
+    total = sum(size for _, size, _ in entries)
+    limit = CACHE_MAX_MB * 1024 * 1024
+    for mtime, size, entry in entries:
+        if entry == keep:
+            continue
+        if mtime >= expire_before and total <= limit:
+            break
+        entry.unlink(missing_ok=True)
+        total -= size
+
+
+def persistent_cache(*tables, ttl=None):
+    """
+    数据加载函数的持久化缓存装饰器，见模块说明。
+
+    Args:
+        *tables: 函数读取的表，'<类别>.<表名>'
+        ttl: 内存层过期时间（秒），同 st.cache_data；数据版本变化时无论是否过期都会重新加载
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        entry_dir = CACHE_DIR / f"{func.__module__}.{func.__qualname__}"
+
+        def load(version, *args, **kwargs):
+            if version is None:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            args_key = hashlib.sha1(repr(list(bound.arguments.items())).encode('utf-8')).hexdigest()[:16]
+            path = entry_dir / f"{args_key}-{version}.arrow"
+            if path.exists():
+                try:
+                    return _read_entry(path)
+                except Exception:
+                    path.unlink(missing_ok=True)
+            result = func(*args, **kwargs)
+            if isinstance(result, pd.DataFrame) and not result.empty:
+                try:
+                    _write_entry(path, result)
+                except Exception:
+                    # 无法转换为 Arrow 的结果（如混合类型 object 列）只缓存在内存
+                    pass
+            return result
+
+        # st.cache_data 按模块与限定名区分函数
+        load.__module__, load.__name__, load.__qualname__ = func.__module__, func.__name__, func.__qualname__
+        cached = st.cache_data(ttl=ttl)(load)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return cached(data_version(tables), *args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+
+    return decorator
@@ -1,19 +1,15 @@
-import duckdb
 import pandas as pd
 import yaml
 import streamlit as st
 
-# Hardcoded path since YAML config is inaccessible in this environment
-MACRO_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_macro.db'
+from dashboard.db import connect, db_path
+
+# Database path (settings.yaml)
+MACRO_DB_PATH = db_path('macro')
 
 def get_db_connection():
     """Establish connection to DuckDB."""
-    try:
-        conn = duckdb.connect(MACRO_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to database at {MACRO_DB_PATH}: {e}")
-        return None
+    return connect(MACRO_DB_PATH)
 
 @st.cache_data
 def load_pmi_data():
@@ -0,0 +1,253 @@
+"""
+Dashboard Data Access
+=====================
+所有 dashboard 数据加载模块共用的 DuckDB 只读连接。
+
+- 数据库路径统一从 settings.yaml 的 <category>.db_path 解析（${DB_ROOT} 取环境变量 DB_ROOT）
+- 每个数据库文件在进程内共享一个只读连接（st.cache_resource 管理），各会话 / 线程共享同一数据库
+  实例，页面交互不再重复付出打开文件与加载 catalog 的开销
+- connect() / get_connection() 返回共享连接上的新游标：DuckDB 连接对象不是线程安全的，游标是
+  同一实例上的独立连接，可在任一线程中使用；调用方照常 close() 只关闭游标
+- 最后一个游标关闭后空闲 DASHBOARD_CONNECTION_IDLE 秒（默认 30），后台计时器关闭共享连接并释放
+  文件锁：dashboard 空闲时不持有锁，daily_fetcher 等写入进程可以拿到写锁；下次查询时重新打开
+- get_catalog_connection('stock', 'index') 返回目录会话：新建内存库并以类别名只读 ATTACH 查询用到的数据库，
+  跨库查询直接写 stock.daily JOIN "index".sw_index_member_all，一条 SQL 完成，无需在 pandas 中合并；
+  未列出的数据库不挂载，其他文件被写入进程锁定时不影响本次查询；每次调用独立打开，
+  用完 close() 即解除全部挂载与文件锁；daily_fetcher 维护的聚合库（AGG_DB_PATH，
+  见 src/tushare_duckdb/aggregates.py）以别名 agg 挂载
+"""
+import os
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import duckdb
+import streamlit as st
+import yaml
+
+DB_ROOT = os.getenv('DB_ROOT', '/Users/robert/Developer/DuckDB')
+
+# 横截面聚合表 agg_* 所在数据库（与 src/tushare_duckdb/config.py 中 AGG_DB_PATH 一致）
+AGG_DB_PATH = os.getenv('AGG_DB_PATH', os.path.join(DB_ROOT, 'tushare_duck_agg.db'))
+
+SETTINGS_PATH = Path(__file__).resolve().parent.parent / 'settings.yaml'
+
+# 共享只读连接在没有游标使用后保持打开的时间（秒），之后关闭以释放文件锁
+CONNECTION_IDLE = float(os.getenv('DASHBOARD_CONNECTION_IDLE', '30'))
+
+
+@lru_cache(maxsize=None)
+def _db_paths():
+    """settings.yaml 中各类别的 db_path（已替换 ${DB_ROOT}）。"""
+    with open(SETTINGS_PATH, 'r', encoding='utf-8') as f:
+        settings = yaml.safe_load(f) or {}
+    return {
+        category: config['db_path'].replace('${DB_ROOT}', DB_ROOT)
+        for category, config in settings.items()
+        if isinstance(config, dict) and config.get('db_path')
+    }
+
+
+def db_path(category):
+    """
+    类别对应的数据库文件路径。
+
+    Args:
+        category: settings.yaml 顶层类别，如 'stock'、'index'、'macro'
+
+    Raises:
+        KeyError: settings.yaml 中没有该类别的 db_path
+    """
+    paths = _db_paths()
+    if category not in paths:
+        raise KeyError(f"settings.yaml 中未配置 {category}.db_path")
+    return paths[category]
+
+
+class SharedConnection:
+    """
+    一个数据库文件的共享只读连接：首次取游标时打开，最后一个游标关闭后空闲
+    CONNECTION_IDLE 秒由后台计时器关闭，下次取游标时重新打开。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._active = 0
+        self._last_used = 0.0
+        self._timer = None
+
+    def cursor(self):
+        """共享连接上的新游标（Cursor），用完 close()"""
+        with self._lock:
+            if self._conn is None:
+                self._conn = duckdb.connect(self.path, read_only=True)
+            cursor = self._conn.cursor()
+            self._active += 1
+        return Cursor(self, cursor)
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+            self._last_used = time.monotonic()
+            if self._timer is None:
+                self._schedule(CONNECTION_IDLE)
+
+    def _schedule(self, delay):
+        self._timer = threading.Timer(delay, self._close_if_idle)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _close_if_idle(self):
+        with self._lock:
+            self._timer = None
+            if self._conn is None or self._active:
+                # 仍有游标在用：由其 close() 重新计时
+                return
+            idle = time.monotonic() - self._last_used
+            if idle < CONNECTION_IDLE:
+                self._schedule(CONNECTION_IDLE - idle)
+                return
+            self._conn.close()
+            self._conn = None
+
+    @property
+    def is_open(self):
+        return self._conn is not None
+
+
+class Cursor:
+    """SharedConnection 上的游标：接口同 DuckDB 连接，close() 后计入空闲计时"""
+
+    def __init__(self, owner, cursor):
+        self._owner = owner
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def close(self):
+        if self._cursor is not None:
+            cursor, self._cursor = self._cursor, None
+            cursor.close()
+            self._owner._release()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # 调用方漏掉 close() 时兜底，避免共享连接永远不进入空闲
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+@st.cache_resource(show_spinner=False)
+def _shared_connection(path):
+    """进程内每个数据库文件一个 SharedConnection"""
+    return SharedConnection(path)
+
+
+def connect(path):
+    """
+    path 的共享只读连接上的新游标；失败时 st.error 提示并返回 None。
+
+    Returns:
+        Cursor（接口同 duckdb.DuckDBPyConnection）或 None，用完调用 close()
+    """
+    try:
+        if not Path(path).exists():
+            st.error(f"Database not found at {path}")
+            return None
+        return _shared_connection(path).cursor()
+    except Exception as e:
+        st.error(f"Error connecting to database at {path}: {e}")
+        return None
+
+
+def get_connection(category):
+    """settings.yaml 类别对应数据库的只读游标，见 connect()。"""
+    try:
+        path = db_path(category)
+    except Exception as e:
+        st.error(f"Error resolving database for '{category}': {e}")
+        return None
+    return connect(path)
+
+
+def catalog_aliases():
+    """
+    目录会话中的数据库别名 → 文件路径。
+
+    别名即 settings.yaml 类别名；多个类别共用一个文件时（如 stock / stock_events、
+    index / index_basic）只挂载一次，别名取与文件名 tushare_duck_<类别>.db 一致的类别，
+    否则取第一个类别。聚合库固定别名 agg。
+    """
+    by_path = {}
+    for category, path in _db_paths().items():
+        by_path.setdefault(path, []).append(category)
+    aliases = {}
+    for path, categories in by_path.items():
+        stem = Path(path).stem
+        alias = next((c for c in categories if stem == f'tushare_duck_{c}'), categories[0])
+        aliases[alias] = path
+    aliases['agg'] = AGG_DB_PATH
+    return aliases
+
+
+def catalog_alias(category):
+    """
+    类别在目录会话中的数据库别名（共用文件的类别返回同一别名，'agg' 为聚合库）。
+
+    Raises:
+        KeyError: settings.yaml 中没有该类别的 db_path
+    """
+    if category == 'agg':
+        return 'agg'
+    path = db_path(category)
+    return next(alias for alias, p in catalog_aliases().items() if p == path)
+
+
+def get_catalog_connection(*aliases):
+    """
+    目录会话：内存库 + aliases 所列数据库的只读 ATTACH。表名以别名限定，如 reference.pledge_stat、
+    stock.stock_basic、"index".sw_daily（index 为保留字，需加引号）。
+
+    只挂载查询用到的数据库：其他文件被写入进程（daily_fetcher、聚合更新）锁定时不影响本次查询。
+    文件不存在的别名不挂载（可用 has_table 判断）。失败时 st.error 提示并返回 None，
+    用完务必 close() 以释放各文件锁。
+
+    Args:
+        *aliases: 数据库别名（settings.yaml 类别名或 'agg'，共用文件的类别按 catalog_alias 归一），
+                  如 get_catalog_connection('reference', 'stock')
+    """
+    conn = None
+    try:
+        if not aliases:
+            raise ValueError("get_catalog_connection() 需要指定要挂载的数据库别名")
+        paths = catalog_aliases()
+        conn = duckdb.connect()
+        for alias in dict.fromkeys(catalog_alias(a) for a in aliases):
+            if Path(paths[alias]).exists():
+                conn.execute(f"ATTACH '{paths[alias]}' AS \"{alias}\" (READ_ONLY)")
+        return conn
+    except Exception as e:
+        if conn is not None:
+            conn.close()
+        st.error(f"Error opening database catalog: {e}")
+        return None
+
+
+def has_table(conn, database, table_name):
+    """目录会话中 database.table_name 是否存在（数据库未挂载时为 False）。"""
+    return conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_catalog = ? AND table_name = ?",
+        [database, table_name]
+    ).fetchone()[0] > 0
+
@@ -1,16 +1,13 @@
-import duckdb
 import pandas as pd
 import streamlit as st
 
-DC_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_index.db'
+from dashboard.db import connect, db_path
+
+DC_DB_PATH = db_path('index')
 
 
 def get_dc_connection():
-    try:
-        return duckdb.connect(DC_DB_PATH, read_only=True)
-    except Exception as e:
-        st.error(f"连接 DC 数据库失败: {e}")
-        return None
+    return connect(DC_DB_PATH)
 
 
 @st.cache_data
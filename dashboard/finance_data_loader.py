@@ -1,37 +1,21 @@
 import os
 
-import duckdb
 import pandas as pd
 import streamlit as st
 
+from dashboard.db import connect, db_path, get_catalog_connection
 
-def _default_db_root() -> str:
-    return os.getenv("DB_ROOT", "/Users/robert/Developer/DuckDB")
+FINANCE_DB_PATH = os.getenv("FINANCE_DB_PATH", db_path("finance"))
 
-
-FINANCE_DB_PATH = os.getenv(
-    "FINANCE_DB_PATH", os.path.join(_default_db_root(), "tushare_duck_finance.db")
-)
-
-STOCK_DB_PATH = os.getenv(
-    "STOCK_DB_PATH", os.path.join(_default_db_root(), "tushare_duck_stock.db")
-)
+STOCK_DB_PATH = os.getenv("STOCK_DB_PATH", db_path("stock"))
 
 
 def get_finance_db_connection():
-    try:
-        return duckdb.connect(FINANCE_DB_PATH, read_only=True)
-    except Exception as e:
-        st.error(f"Error connecting to finance database at {FINANCE_DB_PATH}: {e}")
-        return None
+    return connect(FINANCE_DB_PATH)
 
 
 def get_stock_db_connection():
-    try:
-        return duckdb.connect(STOCK_DB_PATH, read_only=True)
-    except Exception as e:
-        st.error(f"Error connecting to stock database at {STOCK_DB_PATH}: {e}")
-        return None
+    return connect(STOCK_DB_PATH)
 
 
 def _parse_yyyymmdd(series: pd.Series) -> pd.Series:
@@ -308,6 +292,58 @@ def load_peer_indicators_latest(ts_codes: tuple, period: str = None) -> pd.DataF
     return df
 
 
+@st.cache_data(ttl=3600)
+def load_industry_peer_indicators(ts_code: str, limit: int = 15) -> pd.DataFrame:
+    """
+    Latest fina_indicator of a stock and its industry peers in one catalog query
+    (stock.stock_basic peers × finance.fina_indicator); same rows as
+    load_peer_indicators_latest((ts_code, *load_industry_peers(ts_code, limit).ts_code)).
+    Empty when the stock has no listed peers.
+    """
+    conn = get_catalog_connection('finance', 'stock')
+    if not conn:
+        return pd.DataFrame()
+    try:
+        df = conn.execute(
+            """
+            WITH target AS (
+                SELECT industry FROM stock.stock_basic WHERE ts_code = ?
+            ),
+            peers AS (
+                SELECT sb.ts_code
+                FROM stock.stock_basic sb, target t
+                WHERE sb.industry = t.industry
+                  AND sb.list_status = 'L'
+                  AND sb.ts_code != ?
+                ORDER BY sb.ts_code
+                LIMIT ?
+            ),
+            codes AS (
+                SELECT ts_code FROM peers
+                UNION
+                SELECT ? WHERE EXISTS (SELECT 1 FROM peers)
+            ),
+            ranked AS (
+                SELECT f.*, ROW_NUMBER() OVER (PARTITION BY f.ts_code ORDER BY f.end_date DESC) as rn
+                FROM finance.fina_indicator f
+                JOIN codes c ON f.ts_code = c.ts_code
+            )
+            SELECT ts_code, end_date, roe, roa, roic,
+                   netprofit_margin, grossprofit_margin,
+                   debt_to_assets, current_ratio, assets_turn,
+                   netprofit_yoy, tr_yoy, fcff
+            FROM ranked WHERE rn = 1
+            """,
+            [ts_code, ts_code, int(limit), ts_code],
+        ).fetchdf()
+    except Exception as e:
+        st.error(f"Failed to load peer indicators for {ts_code}: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+    return df
+
+
 def calculate_earnings_quality(df_income: pd.DataFrame, df_cashflow: pd.DataFrame, df_balance: pd.DataFrame) -> pd.DataFrame:
     """
     Calculate earnings quality metrics:
@@ -4,14 +4,15 @@ FX & Commodity Data Loader Module
 Provides data loading functions for the FX Education dashboard.
 Connects to tushare_duck_fx.db and loads fx_obasic and fx_daily tables.
 """
-import duckdb
 import pandas as pd
 import numpy as np
 import streamlit as st
 from datetime import datetime, timedelta
 
+from dashboard.db import connect, db_path
+
 # Database path
-FX_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_fx.db'
+FX_DB_PATH = db_path('fx')
 
 # Default assets for visualization
 DEFAULT_FX_ASSETS = [
@@ -28,12 +29,7 @@ DEFAULT_FX_ASSETS = [
 
 def get_fx_db_connection():
     """Establish connection to FX DuckDB."""
-    try:
-        conn = duckdb.connect(FX_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to FX database at {FX_DB_PATH}: {e}")
-        return None
+    return connect(FX_DB_PATH)
 
 
 @st.cache_data
@@ -1,10 +1,12 @@
-import duckdb
 import pandas as pd
 import streamlit as st
 
+from dashboard.cache import persistent_cache
+from dashboard.db import connect, db_path
+
 # Database paths
-INDEX_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_index.db'
-INDEX_WEIGHT_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_index_weight.db'
+INDEX_DB_PATH = db_path('index')
+INDEX_WEIGHT_DB_PATH = db_path('index_member')
 
 # Major indices for heatmap visualization
 MAJOR_INDICES = [
@@ -16,25 +18,15 @@ MAJOR_INDICES = [
 
 def get_index_db_connection():
     """Establish connection to index info DuckDB."""
-    try:
-        conn = duckdb.connect(INDEX_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to index database at {INDEX_DB_PATH}: {e}")
-        return None
+    return connect(INDEX_DB_PATH)
 
 
 def get_weight_db_connection():
     """Establish connection to index weight DuckDB."""
-    try:
-        conn = duckdb.connect(INDEX_WEIGHT_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to weight database at {INDEX_WEIGHT_DB_PATH}: {e}")
-        return None
+    return connect(INDEX_WEIGHT_DB_PATH)
 
 
-@st.cache_data
+@persistent_cache('index.index_basic')
 def load_index_basic():
     """Fetch all index basic info from DuckDB."""
     conn = get_index_db_connection()
@@ -57,7 +49,7 @@ def load_index_basic():
     return df
 
 
-@st.cache_data
+@persistent_cache('index_member.index_weight')
 def get_indices_with_weight_data():
     """Get list of index codes that have weight data available."""
     conn = get_weight_db_connection()
@@ -76,7 +68,7 @@ def get_indices_with_weight_data():
         conn.close()
 
 
-@st.cache_data
+@persistent_cache('index_member.index_weight')
 def load_index_weight_for_index(index_code: str):
     """Load all weight data for a specific index."""
     conn = get_weight_db_connection()
@@ -99,7 +91,7 @@ def load_index_weight_for_index(index_code: str):
     return df
 
 
-@st.cache_data
+@persistent_cache('index_member.index_weight')
 def get_available_trade_dates(index_code: str):
     """Get distinct trade dates for an index, sorted descending."""
     conn = get_weight_db_connection()
@@ -120,7 +112,7 @@ def get_available_trade_dates(index_code: str):
         conn.close()
 
 
-@st.cache_data
+@persistent_cache('index_member.index_weight')
 def get_constituents_for_date(index_code: str, trade_date: str):
     """Get constituent codes and weights for a specific date."""
     conn = get_weight_db_connection()
@@ -143,7 +135,7 @@ def get_constituents_for_date(index_code: str, trade_date: str):
     return df
 
 
-@st.cache_data
+@persistent_cache('index_member.index_weight')
 def get_constituent_count_per_date(index_code: str):
     """Get count of constituents per trade date for an index."""
     conn = get_weight_db_connection()
@@ -166,7 +158,7 @@ def get_constituent_count_per_date(index_code: str):
 
     return df
 
-@st.cache_data
+@persistent_cache('index.index_daily', 'index.index_basic')
 def load_major_indices_daily(start_date: str, end_date: str):
     """Fetch daily returns (pct_chg) for major indices."""
     conn = get_index_db_connection()
@@ -1,5 +1,12 @@
+import os
+import sys
+
 import streamlit as st
 import pandas as pd
+
+# Project root on sys.path for the shared dashboard.db module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 from index_data_loader import (
     load_index_basic, get_indices_with_weight_data, 
     get_constituent_count_per_date, get_available_trade_dates,
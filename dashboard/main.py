@@ -1,5 +1,12 @@
+import os
+import sys
+
 import streamlit as st
 import pandas as pd
+
+# Project root on sys.path for the shared dashboard.db module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
 from data_loader import load_pmi_data, load_sf_data, load_m_data
 from charts import (plot_pmi_trend, plot_sub_indicators_bar, plot_heatmap, 
                     plot_sf_charts, plot_m_levels, plot_m_yoy, plot_m_mom)
@@ -979,6 +979,41 @@ def plot_risk_warning_box(df: pd.DataFrame, metric: str = 'tr'):
     return fig
 
 
+def plot_market_breadth(df: pd.DataFrame, ma_period: int = 20):
+    """
+    Market breadth: advancers / decliners bars, limit-up / limit-down counts,
+    and % of stocks above MA (right axis).
+    """
+    if df.empty or 'up' not in df.columns:
+        return None
+    
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    
+    fig.add_trace(go.Bar(x=df['trade_date'], y=df['up'], name='Advancers',
+                         marker_color=COLORS['danger'], opacity=0.7), secondary_y=False)
+    fig.add_trace(go.Bar(x=df['trade_date'], y=-df['down'], name='Decliners',
+                         marker_color=COLORS['success'], opacity=0.7), secondary_y=False)
+    
+    for col, name, color in (('limit_up', 'Limit Up', COLORS['primary']),
+                             ('limit_down', 'Limit Down', COLORS['accent'])):
+        if col in df.columns:
+            fig.add_trace(go.Scatter(x=df['trade_date'], y=df[col], name=name, mode='lines',
+                                     line=dict(color=color, width=1.5)), secondary_y=False)
+    
+    above_col = f'above_ma{ma_period}'
+    if above_col in df.columns:
+        fig.add_trace(go.Scatter(x=df['trade_date'], y=df[above_col] / df['total'] * 100,
+                                 name=f'% Above MA{ma_period}', mode='lines',
+                                 line=dict(color=COLORS['secondary'], width=2, dash='dot')), secondary_y=True)
+    
+    fig = apply_chart_style(fig, title="Market Breadth (Advance / Decline)")
+    fig.update_layout(barmode='relative', hovermode='x unified')
+    fig.update_yaxes(title_text='Stocks', secondary_y=False)
+    fig.update_yaxes(title_text='% Above MA', range=[0, 100], showgrid=False, secondary_y=True)
+    
+    return fig
+
+
 def plot_liquidity_score_gauge(df: pd.DataFrame, ts_code: str):
     """
     Liquidity Score Dashboard。
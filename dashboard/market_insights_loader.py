@@ -3,16 +3,18 @@ Market Insights Data Loading Module
 ====================================
 Loads market trading statistics and global index data for professional market analysis.
 """
-import duckdb
 import pandas as pd
 import numpy as np
 import streamlit as st
 from datetime import datetime, timedelta
 import re
 
+from dashboard.cache import persistent_cache
+from dashboard.db import connect, db_path, get_catalog_connection, has_table
+
 # Database paths
-INDEX_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_index.db'
-OPT_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_opt.db'
+INDEX_DB_PATH = db_path('index')
+OPT_DB_PATH = db_path('option')
 
 # Global Index Code to Name Mapping (Complete Version)
 # Note: Index names are kept in Chinese as requested
@@ -71,12 +73,7 @@ SZ_DAILY_CODES = {
 
 def get_index_db_connection():
     """Connect to Index database."""
-    try:
-        conn = duckdb.connect(INDEX_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Database connection failed: {e}")
-        return None
+    return connect(INDEX_DB_PATH)
 
 
 # Exchange Mapping (Derived from user task file)
@@ -91,19 +88,14 @@ EXCHANGE_MAPPING = {
 
 def get_opt_db_connection():
     """Connect to Options database."""
-    try:
-        conn = duckdb.connect(OPT_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Options Database connection failed: {e}")
-        return None
+    return connect(OPT_DB_PATH)
 
 
 # ============================================================================
 # Market Statistics Data - daily_info
 # ============================================================================
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.daily_info', ttl=3600)
 def load_daily_info(start_date: str = None, end_date: str = None, ts_codes: list = None):
     """
     Load market trading statistics data.
@@ -160,7 +152,7 @@ def load_daily_info(start_date: str = None, end_date: str = None, ts_codes: list
     return df
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.daily_info', ttl=3600)
 def get_available_market_codes():
     """Get available sector code list."""
     conn = get_index_db_connection()
@@ -180,7 +172,7 @@ def get_available_market_codes():
     return list(zip(df['ts_code'], df['ts_name']))
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.sz_daily_info', ttl=3600)
 def load_sz_daily_info(start_date: str = None, end_date: str = None, ts_codes: list = None):
     """
     Load Shenzhen market statistics (sz_daily_info).
@@ -239,7 +231,7 @@ def load_sz_daily_info(start_date: str = None, end_date: str = None, ts_codes: l
     return df
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.daily_info', 'index.sz_daily_info', ttl=3600)
 def load_combined_amount_data(start_date: str, end_date: str):
     """
     Load combined trading amount data, including:
@@ -275,6 +267,51 @@ def load_combined_amount_data(start_date: str, end_date: str):
     return df_combined
 
 
+# ============================================================================
+# Market Breadth - agg_breadth (materialized after the nightly load)
+# ============================================================================
+
+@persistent_cache('agg.agg_breadth', ttl=3600)
+def load_market_breadth(start_date: str = None, end_date: str = None):
+    """
+    Load whole-market breadth from the materialized agg_breadth table (level 'MKT').
+    
+    Args:
+        start_date: Start date 'YYYYMMDD'
+        end_date: End date 'YYYYMMDD'
+    
+    Returns:
+        DataFrame: trade_date, total, up, down, flat, ret_mean, amount,
+                   limit_up, limit_down, above_ma5 ... above_ma250 (counts of stocks);
+                   empty when the aggregate table has not been built
+    """
+    conn = get_catalog_connection('agg')
+    if not conn:
+        return pd.DataFrame()
+    
+    try:
+        if not has_table(conn, 'agg', 'agg_breadth'):
+            return pd.DataFrame()
+        query = """
+            SELECT trade_date, metric, value
+            FROM agg.agg_breadth
+            WHERE level = 'MKT' AND trade_date >= ? AND trade_date <= ?
+        """
+        df = conn.execute(query, [start_date or '00000000', end_date or '99999999']).fetchdf()
+    except Exception as e:
+        st.error(f"Failed to load market breadth: {e}")
+        return pd.DataFrame()
+    finally:
+        conn.close()
+    
+    if not df.empty:
+        df = df.pivot(index='trade_date', columns='metric', values='value').reset_index()
+        df.columns.name = None
+        df['trade_date'] = pd.to_datetime(df['trade_date'], format='%Y%m%d', errors='coerce')
+    
+    return df
+
+
 def calculate_pe_percentile(df: pd.DataFrame, ts_code: str):
     """
     Calculate PE historical percentile.
@@ -325,7 +362,7 @@ def calculate_market_stats(df: pd.DataFrame):
 # Global Index Data - index_global
 # ============================================================================
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.index_global', ttl=3600)
 def load_index_global(start_date: str = None, end_date: str = None, ts_codes: list = None):
     """
     Load global index market data.
@@ -381,7 +418,7 @@ def load_index_global(start_date: str = None, end_date: str = None, ts_codes: li
     return df
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.index_global', ttl=3600)
 def get_available_global_indices():
     """Get available global index codes."""
     conn = get_index_db_connection()
@@ -656,7 +693,7 @@ def calculate_liquidity_score(df: pd.DataFrame, ts_code: str):
 # Options Data - opt_basic, opt_daily
 # ============================================================================
 
-@st.cache_data(ttl=3600)
+@persistent_cache('option.opt_basic', ttl=3600)
 def load_opt_basic(exchange: str = None):
     """
     Load option basic information.
@@ -778,7 +815,7 @@ def process_opt_basic_data(df: pd.DataFrame):
     return df
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('option.opt_basic', 'option.opt_daily', ttl=3600)
 def load_opt_daily_by_underlying(underlying: str, start_date: str = None, end_date: str = None):
     """
     Load daily data for ALL contracts of a specific underlying.
@@ -803,7 +840,7 @@ def load_opt_daily_by_underlying(underlying: str, start_date: str = None, end_da
 
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('option.opt_daily', ttl=3600)
 def load_opt_daily(ts_code: str = None, start_date: str = None, end_date: str = None, ts_codes: list = None):
     """
     Load option daily quotes.
@@ -853,7 +890,7 @@ def load_opt_daily(ts_code: str = None, start_date: str = None, end_date: str =
     return df
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('option.opt_basic', ttl=3600)
 def get_available_opt_codes():
     """Get available option codes mapping (ts_code -> name)."""
     df = load_opt_basic()
@@ -872,7 +909,7 @@ def get_available_opt_codes():
     return list(zip(df['ts_code'], df['display']))
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('option.opt_basic', ttl=3600)
 def get_opt_stats_underlying_counts():
     """
     Fast SQL aggregation for Total Contracts by Underlying.
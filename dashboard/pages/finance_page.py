@@ -37,8 +37,7 @@ from dashboard.finance_data_loader import (
     load_stock_universe,
     # Deep Insights functions
     load_extended_indicator,
-    load_industry_peers,
-    load_peer_indicators_latest,
+    load_industry_peer_indicators,
     calculate_earnings_quality,
     calculate_piotroski_score,
     detect_anomalies,
@@ -212,27 +211,21 @@ def render_finance_page(subcategory_key=None):
             # --- 行业排名 ---
             st.markdown("### 行业排名")
             st.caption("您的股票在同行业中处于什么水平？")
-            peers = load_industry_peers(ts_code, limit=15)
-            if not peers.empty:
-                all_codes = tuple([ts_code] + peers["ts_code"].tolist())
-                df_peer_ind = load_peer_indicators_latest(all_codes)
+            df_peer_ind = load_industry_peer_indicators(ts_code, limit=15)
+            if not df_peer_ind.empty:
+                stock_name = None
+                if not universe.empty:
+                    match = universe[universe["ts_code"] == ts_code]
+                    if not match.empty:
+                        stock_name = match.iloc[0].get("name")
                 
-                if not df_peer_ind.empty:
-                    stock_name = None
-                    if not universe.empty:
-                        match = universe[universe["ts_code"] == ts_code]
-                        if not match.empty:
-                            stock_name = match.iloc[0].get("name")
-                    
-                    fig_peer = plot_peer_percentile_bars(ts_code, df_peer_ind, target_name=stock_name)
-                    if fig_peer:
-                        st.plotly_chart(fig_peer, use_container_width=True, key="fin_peer_rank")
-                    else:
-                        st.info("同行排名数据不足。")
+                fig_peer = plot_peer_percentile_bars(ts_code, df_peer_ind, target_name=stock_name)
+                if fig_peer:
+                    st.plotly_chart(fig_peer, use_container_width=True, key="fin_peer_rank")
                 else:
-                    st.info("同行财务数据不足。")
+                    st.info("同行排名数据不足。")
             else:
-                st.info("未找到同行业公司进行比较。")
+                st.info("未找到同行业公司或同行财务数据不足。")
 
         # ========== TAB 2: 盈利分析 ==========
         with tab_profit:
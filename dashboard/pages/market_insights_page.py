@@ -10,7 +10,7 @@ from dashboard.market_insights_loader import (
     load_daily_info, get_available_market_codes, calculate_pe_percentile,
     load_index_global, get_available_global_indices, calculate_global_correlation,
     calculate_index_returns, create_normalized_pivot, calculate_market_sentiment,
-    load_sz_daily_info, get_index_display_name,
+    load_sz_daily_info, get_index_display_name, load_market_breadth,
     load_opt_basic, load_opt_daily, get_available_opt_codes, process_opt_basic_data, load_opt_daily_by_underlying, get_opt_stats_underlying_counts,
     GLOBAL_INDICES, MARKET_CODES, SZ_DAILY_CODES, EXCHANGE_MAPPING
 )
@@ -21,7 +21,7 @@ from dashboard.market_insights_charts import (
     plot_global_correlation_heatmap,
     plot_index_returns_bar, plot_risk_return_global, plot_market_mv_trend,
     plot_trading_amount_trend, plot_sh_sz_comparison, plot_sector_heatmap,
-    plot_risk_warning_box, plot_liquidity_score_gauge, plot_market_turnover_scatter,
+    plot_risk_warning_box, plot_liquidity_score_gauge, plot_market_turnover_scatter, plot_market_breadth,
     plot_opt_distribution_heatmap, plot_opt_trend, plot_opt_liquidity_scatter,
     plot_opt_underlying_counts, plot_opt_strike_distribution, plot_opt_maturity_heatmap, plot_opt_strike_maturity_scatter
 )
@@ -675,6 +675,16 @@ def render_market_insights_page(subcategory_key):
                         - AmountTurnover Rate异常高：Beware of Excessive Speculation
                         """))
                         
+                        # Market Breadth (materialized agg_breadth)
+                        st.markdown("#### Market Breadth")
+                        df_breadth = load_market_breadth(start_str, end_str)
+                        fig_breadth = plot_market_breadth(df_breadth)
+                        if fig_breadth:
+                            st.plotly_chart(fig_breadth, use_container_width=True, key="mkt_trading_breadth")
+                            st.caption("Source: agg_breadth (daily, stk_limit)")
+                        else:
+                            st.info("Market breadth aggregates not built yet (python -m src.tushare_duckdb.aggregates)。")
+                        
                     with tab5:
                         st.subheader("Comprehensive Market Framework")
                         
@@ -15,7 +15,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 from dashboard.tdx_data_loader import (
     load_tdx_daily, load_tdx_index, load_tdx_member,
-    get_idx_type_stats, get_latest_trade_date
+    get_idx_type_stats, get_latest_trade_date, load_tdx_sentiment
 )
 from dashboard.tdx_charts import (
     plot_sector_rotation_heatmap, plot_top_gainers_ranking, plot_idx_type_leadership,
@@ -256,7 +256,9 @@ def render_tdx_index_page():
     
     # --- Tab 3: Sentiment ---
     with tab3:
-        render_sentiment_tab(df_daily, df_index)
+        # 未选具体板块时情绪仪表盘直接读取物化的 agg_tdx_sentiment
+        sentiment = {} if selected_indices else load_tdx_sentiment(idx_type_filter)
+        render_sentiment_tab(df_daily, df_index, sentiment)
     
     # --- Tab 4-6: Placeholders ---
     with tab4:
@@ -328,7 +330,7 @@ def render_capital_tab(df_daily: pd.DataFrame, df_index: pd.DataFrame):
         st.caption("💡 The more linear the scatter plot, the stronger the capital-driven effect on returns")
 
 
-def render_sentiment_tab(df_daily: pd.DataFrame, df_index: pd.DataFrame):
+def render_sentiment_tab(df_daily: pd.DataFrame, df_index: pd.DataFrame, sentiment: dict = None):
     """Render Sentiment Analysis tab"""
     
     st.header("🎭 Market Sentiment Analysis")
@@ -336,7 +338,7 @@ def render_sentiment_tab(df_daily: pd.DataFrame, df_index: pd.DataFrame):
     
     # Sentiment Gauges
     st.subheader("1. Market Sentiment Dashboard")
-    fig_gauges = plot_sentiment_gauges(df_daily)
+    fig_gauges = plot_sentiment_gauges(df_daily, sentiment)
     if fig_gauges:
         st.plotly_chart(fig_gauges, use_container_width=True)
     
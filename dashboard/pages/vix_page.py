@@ -12,7 +12,7 @@ from dashboard.components.headers import render_header
 
 # ... (inside render_vix_page function, at the end)
 
-from dashboard.vix_data_loader import get_available_underlyings, calculate_vix_series, get_default_date_range
+from dashboard.vix_data_loader import get_available_underlyings, calculate_vix_multi, get_default_date_range
 from dashboard.vix_charts import (
     plot_vix_trend, plot_vix_components, plot_vix_distribution,
     plot_forward_prices, plot_weight_trend
@@ -93,9 +93,11 @@ def render_vix_page(subcategory_key):
                     df_near_all = pd.DataFrame()
                     df_next_all = pd.DataFrame()
                     
+                    # All selected underlyings in one call (shared data loading)
+                    multi_results = calculate_vix_multi(start_str, end_str, tuple(selected_underlyings))
                     for code in selected_underlyings:
-                         s_df, n_df, nx_df = calculate_vix_series(start_str, end_str, code)
-                         if not s_df.empty:
+                         if code in multi_results:
+                             s_df, n_df, nx_df = multi_results[code]
                              s_df['underlying'] = code
                              results_map[code] = s_df
                              df_summary = pd.concat([df_summary, s_df])
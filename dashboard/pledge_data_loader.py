@@ -1,59 +1,50 @@
-import duckdb
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 
+from dashboard.db import connect, db_path, get_catalog_connection
+
 # Database paths
 # Note: From settings.yaml, pledge data is in tushare_duck_ref.db
-REF_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_ref.db'
-STOCK_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_stock.db'
+REF_DB_PATH = db_path('reference')
+STOCK_DB_PATH = db_path('stock')
 
 def get_ref_db_connection():
     """Establish connection to reference DuckDB."""
-    try:
-        conn = duckdb.connect(REF_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to reference database: {e}")
-        return None
+    return connect(REF_DB_PATH)
 
 def get_stock_db_connection():
     """Establish connection to stock DuckDB (for names)."""
-    try:
-        conn = duckdb.connect(STOCK_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to stock database: {e}")
-        return None
+    return connect(STOCK_DB_PATH)
 
 @st.cache_data
 def get_pledge_stat_top(limit=50):
     """Fetch top stocks by pledge ratio."""
-    conn = get_ref_db_connection()
+    conn = get_catalog_connection('reference', 'stock')
     if not conn:
         return pd.DataFrame()
     
     try:
-        # Get latest data for each stock
+        # Get latest data for each stock, with names from stock_basic
         query = f"""
-            SELECT p1.ts_code, p1.end_date, p1.pledge_count, p1.unrest_pledge, 
-                   p1.rest_pledge, p1.total_share, p1.pledge_ratio
-            FROM pledge_stat p1
-            INNER JOIN (
-                SELECT ts_code, MAX(end_date) as max_date
-                FROM pledge_stat
-                GROUP BY ts_code
-            ) p2 ON p1.ts_code = p2.ts_code AND p1.end_date = p2.max_date
-            ORDER BY p1.pledge_ratio DESC
-            LIMIT {limit}
+            WITH top AS (
+                SELECT p1.ts_code, p1.end_date, p1.pledge_count, p1.unrest_pledge, 
+                       p1.rest_pledge, p1.total_share, p1.pledge_ratio
+                FROM reference.pledge_stat p1
+                INNER JOIN (
+                    SELECT ts_code, MAX(end_date) as max_date
+                    FROM reference.pledge_stat
+                    GROUP BY ts_code
+                ) p2 ON p1.ts_code = p2.ts_code AND p1.end_date = p2.max_date
+                ORDER BY p1.pledge_ratio DESC
+                LIMIT {int(limit)}
+            )
+            SELECT top.*, s.name
+            FROM top
+            LEFT JOIN stock.stock_basic s ON top.ts_code = s.ts_code
+            ORDER BY top.pledge_ratio DESC
         """
         df = conn.execute(query).fetchdf()
-        
-        # Merge with stock names
-        names_df = get_stock_names()
-        if not names_df.empty:
-            df = df.merge(names_df, on='ts_code', how='left')
-            
         return df
     except Exception as e:
         st.error(f"Error fetching pledge stats: {e}")
@@ -99,32 +90,34 @@ def get_stock_pledge_history(ts_code):
 @st.cache_data
 def get_pledge_details(ts_code=None, limit=100):
     """Fetch pledge details."""
-    conn = get_ref_db_connection()
+    conn = get_catalog_connection('reference', 'stock')
     if not conn:
         return pd.DataFrame()
     try:
-        where_clause = f"WHERE ts_code = '{ts_code}'" if ts_code else ""
+        where_clause = "WHERE ts_code = ?" if ts_code else ""
         query = f"""
             SELECT ts_code, ann_date, holder_name, pledge_amount, 
                    start_date, end_date, is_release, release_date, 
                    pledgor, holding_amount, pledged_amount, 
                    p_total_ratio, h_total_ratio, is_buyback
-            FROM pledge_detail
+            FROM reference.pledge_detail
             {where_clause}
             ORDER BY ann_date DESC
-            LIMIT {limit}
+            LIMIT {int(limit)}
         """
-        df = conn.execute(query).fetchdf()
+        # Names only for the global list (not stock-specific)
+        if not ts_code:
+            query = f"""
+                WITH d AS ({query})
+                SELECT d.*, s.name
+                FROM d LEFT JOIN stock.stock_basic s ON d.ts_code = s.ts_code
+                ORDER BY d.ann_date DESC
+            """
+        df = conn.execute(query, [ts_code] if ts_code else []).fetchdf()
         
         # Convert dates
         for col in ['ann_date', 'start_date', 'end_date', 'release_date']:
             df[col] = pd.to_datetime(df[col], errors='coerce')
-            
-        # Merge names if not stock-specific (optional, for global list)
-        if not ts_code:
-            names_df = get_stock_names()
-            if not names_df.empty:
-                df = df.merge(names_df, on='ts_code', how='left')
                 
         return df
     except Exception as e:
@@ -136,20 +129,18 @@ def get_pledge_details(ts_code=None, limit=100):
 @st.cache_data
 def get_pledge_industry_distribution():
     """Aggregated industry view (needs industry from stock_basic)."""
-    # This involves joining across two databases
-    # DuckDB can ATTACH databases
-    conn = get_ref_db_connection()
+    # Joins across two databases in the catalog session
+    conn = get_catalog_connection('reference', 'stock')
     if not conn:
         return pd.DataFrame()
     try:
-        conn.execute(f"ATTACH '{STOCK_DB_PATH}' AS stock_db")
         query = """
             WITH latest_stat AS (
                 SELECT p1.ts_code, p1.pledge_ratio, p1.unrest_pledge, p1.rest_pledge
-                FROM pledge_stat p1
+                FROM reference.pledge_stat p1
                 INNER JOIN (
                     SELECT ts_code, MAX(end_date) as max_date
-                    FROM pledge_stat
+                    FROM reference.pledge_stat
                     GROUP BY ts_code
                 ) p2 ON p1.ts_code = p2.ts_code AND p1.end_date = p2.max_date
             )
@@ -158,7 +149,7 @@ def get_pledge_industry_distribution():
                    AVG(s.pledge_ratio) as avg_pledge_ratio,
                    SUM(s.unrest_pledge + s.rest_pledge) as total_pledged_shares
             FROM latest_stat s
-            JOIN stock_db.stock_basic b ON s.ts_code = b.ts_code
+            JOIN stock.stock_basic b ON s.ts_code = b.ts_code
             WHERE b.industry IS NOT NULL
             GROUP BY b.industry
             ORDER BY avg_pledge_ratio DESC
@@ -4,22 +4,18 @@ Price Index Data Loader
 Load CPI (Consumer Price Index) and PPI (Producer Price Index) data 
 from DuckDB for dashboard visualization.
 """
-import duckdb
 import pandas as pd
 import streamlit as st
 
+from dashboard.db import connect, db_path
+
 # Database path
-MACRO_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_macro.db'
+MACRO_DB_PATH = db_path('macro')
 
 
 def get_db_connection():
     """Establish connection to DuckDB."""
-    try:
-        conn = duckdb.connect(MACRO_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to database: {e}")
-        return None
+    return connect(MACRO_DB_PATH)
 
 
 @st.cache_data
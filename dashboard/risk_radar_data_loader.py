@@ -1,29 +1,20 @@
-import duckdb
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 
+from dashboard.db import connect, db_path, get_catalog_connection
+
 # Database paths
-REF_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_ref.db'
-STOCK_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_stock.db'
+REF_DB_PATH = db_path('reference')
+STOCK_DB_PATH = db_path('stock')
 
 def get_ref_db_connection():
     """Establish connection to reference DuckDB."""
-    try:
-        conn = duckdb.connect(REF_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to reference database: {e}")
-        return None
+    return connect(REF_DB_PATH)
 
 def get_stock_db_connection():
     """Establish connection to stock DuckDB."""
-    try:
-        conn = duckdb.connect(STOCK_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to stock database: {e}")
-        return None
+    return connect(STOCK_DB_PATH)
 
 @st.cache_data
 def get_combined_risk_data(start_date: str, end_date: str):
@@ -36,39 +27,37 @@ def get_combined_risk_data(start_date: str, end_date: str):
     - block_trade_vol, block_trade_amount, avg_discount, trade_count
     - risk_score (calculated)
     """
-    ref_conn = get_ref_db_connection()
-    if not ref_conn:
+    # pledge_stat / block_trade (reference) × stock_basic (stock) in one catalog query
+    conn = get_catalog_connection('reference', 'stock')
+    if not conn:
         return pd.DataFrame()
         
     try:
-        # 1. Get Stock Basic Info (attach stock db)
-        ref_conn.execute(f"ATTACH '{STOCK_DB_PATH}' AS stock_db")
-        
-        # 2. Get Latest Pledge Stats
+        # 1. Get Latest Pledge Stats
         # Use subquery to get latest date per stock
         pledge_query = """
             SELECT p1.ts_code, p1.pledge_ratio, p1.pledge_count, p1.unrest_pledge
-            FROM pledge_stat p1
+            FROM reference.pledge_stat p1
             INNER JOIN (
                 SELECT ts_code, MAX(end_date) as max_date
-                FROM pledge_stat
+                FROM reference.pledge_stat
                 GROUP BY ts_code
             ) p2 ON p1.ts_code = p2.ts_code AND p1.end_date = p2.max_date
         """
         
-        # 3. Get Aggregated Block Trade Stats for the period
-        block_query = f"""
+        # 2. Get Aggregated Block Trade Stats for the period
+        block_query = """
             SELECT ts_code, 
                    SUM(vol) as block_vol,
                    SUM(amount) as block_amount,
                    COUNT(*) as block_count,
                    AVG(price) as avg_block_price
-            FROM block_trade
-            WHERE trade_date BETWEEN '{start_date}' AND '{end_date}'
+            FROM reference.block_trade
+            WHERE trade_date BETWEEN ? AND ?
             GROUP BY ts_code
         """
         
-        # 4. Combine Everything
+        # 3. Combine Everything
         combined_query = f"""
             WITH 
             latest_pledge AS ({pledge_query}),
@@ -85,11 +74,11 @@ def get_combined_risk_data(start_date: str, end_date: str):
                 COALESCE(b.block_count, 0) as block_count
             FROM latest_pledge p
             FULL OUTER JOIN period_block b ON p.ts_code = b.ts_code
-            LEFT JOIN stock_db.stock_basic s ON COALESCE(p.ts_code, b.ts_code) = s.ts_code
+            LEFT JOIN stock.stock_basic s ON COALESCE(p.ts_code, b.ts_code) = s.ts_code
             WHERE p.pledge_ratio > 0 OR b.block_amount > 0
         """
         
-        df = ref_conn.execute(combined_query).fetchdf()
+        df = conn.execute(combined_query, [start_date, end_date]).fetchdf()
         
         return df
         
@@ -97,7 +86,7 @@ def get_combined_risk_data(start_date: str, end_date: str):
         st.error(f"Error fetching combined risk data: {e}")
         return pd.DataFrame()
     finally:
-        ref_conn.close()
+        conn.close()
 
 def calculate_risk_score(df: pd.DataFrame):
     """
@@ -1,18 +1,14 @@
-import duckdb
 import pandas as pd
 import streamlit as st
 
+from dashboard.db import connect, db_path
+
 # Database paths
-STOCK_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_stock.db'
+STOCK_DB_PATH = db_path('stock')
 
 def get_stock_db_connection():
     """Establish connection to stock basic info DuckDB."""
-    try:
-        conn = duckdb.connect(STOCK_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to stock database at {STOCK_DB_PATH}: {e}")
-        return None
+    return connect(STOCK_DB_PATH)
 
 @st.cache_data
 def get_listing_delisting_stats():
@@ -4,15 +4,16 @@ AA-Share Market Education Data Loading Module
 Provide data loading functions for stock basic info and market data。
 Connect tushare_duck_basic.db 和 tushare_duck_stock.db。
 """
-import duckdb
 import pandas as pd
 import numpy as np
 import streamlit as st
 from datetime import datetime, timedelta
 
+from dashboard.db import connect, db_path
+
 # Database Paths
-BASIC_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_stock.db'
-STOCK_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_stock.db'
+BASIC_DB_PATH = db_path('stock')
+STOCK_DB_PATH = db_path('stock')
 
 # Default stock list (popular targets)
 DEFAULT_STOCKS = [
@@ -42,22 +43,12 @@ STATUS_NAMES = {
 
 def get_basic_db_connection():
     """Connect basic Database"""
-    try:
-        conn = duckdb.connect(BASIC_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Connect basic Database Connection Failed: {e}")
-        return None
+    return connect(BASIC_DB_PATH)
 
 
 def get_stock_db_connection():
     """Connect stock Database"""
-    try:
-        conn = duckdb.connect(STOCK_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Connect stock Database Connection Failed: {e}")
-        return None
+    return connect(STOCK_DB_PATH)
 
 
 # ============================================================================
@@ -1,31 +1,23 @@
-import duckdb
 import pandas as pd
 import streamlit as st
 
+from dashboard.cache import persistent_cache
+from dashboard.db import connect, db_path, get_catalog_connection, has_table
+
 # Database paths
-INDEX_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_index.db'
-STOCK_DB_PATH = '/Users/robert/Developer/DuckDB/tushare_duck_stock.db'
+INDEX_DB_PATH = db_path('index')
+STOCK_DB_PATH = db_path('stock')
 
 def get_db_connection():
     """Establish connection to index DuckDB."""
-    try:
-        conn = duckdb.connect(INDEX_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to database at {INDEX_DB_PATH}: {e}")
-        return None
+    return connect(INDEX_DB_PATH)
 
 def get_stock_db_connection():
     """Establish connection to stock DuckDB."""
-    try:
-        conn = duckdb.connect(STOCK_DB_PATH, read_only=True)
-        return conn
-    except Exception as e:
-        st.error(f"Error connecting to database at {STOCK_DB_PATH}: {e}")
-        return None
+    return connect(STOCK_DB_PATH)
 
 
-@st.cache_data
+@persistent_cache('index.sw_daily')
 def get_latest_sw_trade_date():
     """获取申万行情的最近交易日。"""
     conn = get_db_connection()
@@ -44,7 +36,7 @@ def get_latest_sw_trade_date():
     return trade_date
 
 
-@st.cache_data
+@persistent_cache('stock.daily')
 def get_latest_stock_trade_date():
     """获取个股行情的最近交易日。"""
     conn = get_stock_db_connection()
@@ -62,7 +54,7 @@ def get_latest_stock_trade_date():
 
     return trade_date
 
-@st.cache_data
+@persistent_cache('index.sw_index_member_all')
 def get_sw_hierarchy():
     """
     Fetch Shenwan Index Hierarchy (L1 -> L2 -> L3) mapping.
@@ -94,7 +86,7 @@ def get_sw_hierarchy():
         
     return df_all
 
-@st.cache_data
+@persistent_cache('index.sw_index_member_all')
 def get_sw_members():
     """
     Fetch Shenwan Index Member All data (L3 -> Stock mapping).
@@ -121,7 +113,7 @@ def get_sw_members():
         
     return df
 
-@st.cache_data
+@persistent_cache('index.sw_daily')
 def load_sw_daily_data(date_str: str, codes: list):
     """
     Fetch daily data (pct_change, amount) for specific index codes on a specific date.
@@ -161,7 +153,7 @@ def load_sw_daily_data(date_str: str, codes: list):
     return df
 
 
-@st.cache_data
+@persistent_cache('index.sw_daily', 'index.sw_index_member_all')
 def get_top_l1_gainers(trade_date: str, top_n: int = 5):
     """
     获取指定交易日涨幅居前的申万一级行业。
@@ -200,7 +192,7 @@ def get_top_l1_gainers(trade_date: str, top_n: int = 5):
     return df
 
 
-@st.cache_data
+@persistent_cache('stock.daily')
 def load_stock_daily_data(date_str: str, codes: list):
     """
     Fetch daily data for stocks.
@@ -243,7 +235,31 @@ def load_stock_daily_data(date_str: str, codes: list):
     return df
 
 
-@st.cache_data
+def _load_member_stocks_daily(date_str: str, level_col: str, code: str, member_cols: list):
+    """
+    One catalog query: current SW members of an industry ("index".sw_index_member_all)
+    joined with their daily quotes (stock.daily) on date_str.
+    Returns ts_code, pct_change, amount followed by member_cols.
+    """
+    conn = get_catalog_connection('stock', 'index')
+    if not conn:
+        return pd.DataFrame()
+    
+    try:
+        member_select = ", ".join(f"m.{c}" for c in member_cols)
+        query = f"""
+            SELECT d.ts_code, d.pct_chg AS pct_change, d.amount, {member_select}
+            FROM stock.daily d
+            JOIN "index".sw_index_member_all m
+              ON m.ts_code = d.ts_code AND m.{level_col} = ? AND m.is_new = 'Y'
+            WHERE d.trade_date = ?
+        """
+        return conn.execute(query, [code, date_str]).fetchdf()
+    finally:
+        conn.close()
+
+
+@persistent_cache('index.sw_index_member_all')
 def get_stocks_for_l3(l3_code: str):
     """
     Get the list of stock codes that belong to a specific L3 industry.
@@ -266,68 +282,45 @@ def get_stocks_for_l3(l3_code: str):
         conn.close()
 
 
-@st.cache_data
+@persistent_cache('stock.daily', 'index.sw_index_member_all')
 def load_stocks_by_l3(date_str: str, l3_code: str):
     """
     Fetch daily stock data for stocks belonging to a specific L3 industry.
     This is much faster than loading all stocks since L3 typically has 15-50 stocks.
     """
-    # First get the stock codes for this L3
-    df_stocks = get_stocks_for_l3(l3_code)
-    if df_stocks.empty:
-        return pd.DataFrame()
-    
-    stock_codes = df_stocks['ts_code'].tolist()
-    
-    # Now fetch daily data for just these stocks
-    conn = get_stock_db_connection()
-    if not conn:
-        return pd.DataFrame()
-    
-    codes_placeholder = ",".join([f"'{c}'" for c in stock_codes])
-    
     try:
-        query = f"""
-            SELECT ts_code, pct_chg, amount
-            FROM daily
-            WHERE trade_date = '{date_str}'
-              AND ts_code IN ({codes_placeholder})
-        """
-        df_daily = conn.execute(query).fetchdf()
-        df_daily = df_daily.rename(columns={'pct_chg': 'pct_change'})
-        
-        # Merge with stock names from the member table
-        df_result = df_daily.merge(df_stocks, on='ts_code', how='left')
-        
+        return _load_member_stocks_daily(date_str, 'l3_code', l3_code, ['name'])
     except Exception as e:
         st.error(f"Error fetching stock daily data for L3 {l3_code}: {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
-    
-    return df_result
 
 
-@st.cache_data
+@persistent_cache('stock.daily', 'index.sw_index_member_all')
 def load_top_stocks(date_str: str, top_n: int = 100):
     """
     D1 Optimization: Load only top N stocks by transaction amount.
     Much faster than loading all stocks.
     """
-    conn = get_stock_db_connection()
+    conn = get_catalog_connection('stock', 'index')
     if not conn:
         return pd.DataFrame()
     
     try:
+        # Names and L3 industry from sw_index_member_all in the same query
         query = f"""
-            SELECT ts_code, pct_chg, amount
-            FROM daily
-            WHERE trade_date = '{date_str}'
-            ORDER BY amount DESC
-            LIMIT {top_n}
+            WITH top AS (
+                SELECT ts_code, pct_chg AS pct_change, amount
+                FROM stock.daily
+                WHERE trade_date = ?
+                ORDER BY amount DESC
+                LIMIT {int(top_n)}
+            )
+            SELECT top.*, m.name, m.l3_name
+            FROM top
+            LEFT JOIN "index".sw_index_member_all m ON m.ts_code = top.ts_code AND m.is_new = 'Y'
+            ORDER BY top.amount DESC
         """
-        df = conn.execute(query).fetchdf()
-        df = df.rename(columns={'pct_chg': 'pct_change'})
+        df = conn.execute(query, [date_str]).fetchdf()
         
     except Exception as e:
         st.error(f"Error fetching top stocks: {e}")
@@ -335,18 +328,10 @@ def load_top_stocks(date_str: str, top_n: int = 100):
     finally:
         conn.close()
     
-    # Get stock names from sw_index_member_all
-    df_members = get_sw_members()
-    if not df_members.empty:
-        name_map = dict(zip(df_members['ts_code'], df_members['name']))
-        l3_map = dict(zip(df_members['ts_code'], df_members['l3_name']))
-        df['name'] = df['ts_code'].map(name_map)
-        df['l3_name'] = df['ts_code'].map(l3_map)
-    
     return df
 
 
-@st.cache_data
+@persistent_cache('index.sw_index_member_all')
 def get_stocks_for_l2(l2_code: str):
     """
     Get the list of stock codes that belong to a specific L2 industry (all L3s under it).
@@ -369,48 +354,21 @@ def get_stocks_for_l2(l2_code: str):
         conn.close()
 
 
-@st.cache_data
+@persistent_cache('stock.daily', 'index.sw_index_member_all')
 def load_stocks_by_l2(date_str: str, l2_code: str):
     """
     D2 Optimization: Load all stocks under a specific L2 industry.
     When user selects L2, auto-load all stocks in all L3s under it.
     L2 typically has ~100-300 stocks, much faster than all 5000.
     """
-    df_stocks = get_stocks_for_l2(l2_code)
-    if df_stocks.empty:
-        return pd.DataFrame()
-    
-    stock_codes = df_stocks['ts_code'].tolist()
-    
-    conn = get_stock_db_connection()
-    if not conn:
-        return pd.DataFrame()
-    
-    codes_placeholder = ",".join([f"'{c}'" for c in stock_codes])
-    
     try:
-        query = f"""
-            SELECT ts_code, pct_chg, amount
-            FROM daily
-            WHERE trade_date = '{date_str}'
-              AND ts_code IN ({codes_placeholder})
-        """
-        df_daily = conn.execute(query).fetchdf()
-        df_daily = df_daily.rename(columns={'pct_chg': 'pct_change'})
-        
-        # Merge with stock names and L3 info
-        df_result = df_daily.merge(df_stocks, on='ts_code', how='left')
-        
+        return _load_member_stocks_daily(date_str, 'l2_code', l2_code, ['name', 'l3_code', 'l3_name'])
     except Exception as e:
         st.error(f"Error fetching stock data for L2 {l2_code}: {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
-    
-    return df_result
 
 
-@st.cache_data
+@persistent_cache('index.sw_index_member_all')
 def get_stocks_for_l1(l1_code: str):
     """
     Get the list of stock codes that belong to a specific L1 industry.
@@ -433,51 +391,79 @@ def get_stocks_for_l1(l1_code: str):
         conn.close()
 
 
-@st.cache_data
+@persistent_cache('stock.daily', 'index.sw_index_member_all')
 def load_stocks_by_l1(date_str: str, l1_code: str):
     """
     Load all stocks under a specific L1 industry.
     L1 typically has ~300-500 stocks, much faster than all 5000.
     """
-    df_stocks = get_stocks_for_l1(l1_code)
-    if df_stocks.empty:
-        return pd.DataFrame()
-    
-    stock_codes = df_stocks['ts_code'].tolist()
-    
-    conn = get_stock_db_connection()
-    if not conn:
-        return pd.DataFrame()
-    
-    codes_placeholder = ",".join([f"'{c}'" for c in stock_codes])
-    
     try:
-        query = f"""
-            SELECT ts_code, pct_chg, amount
-            FROM daily
-            WHERE trade_date = '{date_str}'
-              AND ts_code IN ({codes_placeholder})
-        """
-        df_daily = conn.execute(query).fetchdf()
-        df_daily = df_daily.rename(columns={'pct_chg': 'pct_change'})
-        
-        # Merge with stock info (name, L2, L3)
-        df_result = df_daily.merge(df_stocks, on='ts_code', how='left')
-        
+        return _load_member_stocks_daily(date_str, 'l1_code', l1_code, ['name', 'l2_code', 'l2_name', 'l3_code', 'l3_name'])
     except Exception as e:
         st.error(f"Error fetching stock data for L1 {l1_code}: {e}")
         return pd.DataFrame()
-    finally:
-        conn.close()
-    
-    return df_result
 
 
-@st.cache_data(ttl=3600)
+def _width_start_date(conn, end_date_str: str, n_dates: int):
+    """
+    截至 end_date_str 的最近 n_dates 个交易日中最早的一天（stock.trade_cal；
+    无交易日历时取 daily 中出现过的日期）。数据不足 n_dates 天时返回 None（不设下界）。
+    """
+    if has_table(conn, 'stock', 'trade_cal'):
+        query = """
+            SELECT cal_date FROM stock.trade_cal
+            WHERE exchange = 'SSE' AND CAST(is_open AS INTEGER) = 1 AND cal_date <= ?
+            ORDER BY cal_date DESC
+            LIMIT 1 OFFSET ?
+        """
+    else:
+        query = """
+            SELECT trade_date FROM (SELECT DISTINCT trade_date FROM stock.daily WHERE trade_date <= ?)
+            ORDER BY trade_date DESC
+            LIMIT 1 OFFSET ?
+        """
+    row = conn.execute(query, [end_date_str, n_dates - 1]).fetchone()
+    return row[0] if row else None
+
+
+def _market_width_from_agg(conn, end_date_str: str, days: int, ma_period: int, level: str):
+    """
+    从聚合表 agg.agg_breadth 读取各行业 total_stocks / above_ma_count。
+    聚合表不存在、没有该均线周期、最新日期不是 end_date_str 或不足 days 个交易日时返回 None。
+    """
+    if not has_table(conn, 'agg', 'agg_breadth'):
+        return None
+    metric = f'above_ma{ma_period}'
+    dates = [r[0] for r in conn.execute("""
+        SELECT DISTINCT trade_date FROM agg.agg_breadth
+        WHERE level = 'MKT' AND metric = ? AND trade_date <= ?
+        ORDER BY trade_date DESC
+        LIMIT ?
+    """, [metric, end_date_str, days]).fetchall()]
+    if len(dates) < days or dates[0] != end_date_str:
+        return None
+    return conn.execute("""
+        SELECT trade_date, index_code, index_name,
+               MAX(value) FILTER (WHERE metric = 'total') AS total_stocks,
+               MAX(value) FILTER (WHERE metric = ?) AS above_ma_count
+        FROM agg.agg_breadth
+        WHERE level = ? AND trade_date BETWEEN ? AND ? AND metric IN ('total', ?)
+        GROUP BY trade_date, index_code, index_name
+        ORDER BY trade_date, index_code, index_name
+    """, [metric, level, dates[-1], end_date_str, metric]).fetchdf()
+
+
+@persistent_cache('stock.daily', 'stock.trade_cal', 'index.sw_index_member_all', 'agg.agg_breadth', ttl=3600)
 def calculate_market_width(end_date_str: str = None, days: int = 30, ma_period: int = 20, level: str = 'L1'):
     """
     Calculate market width for each industry over a date range.
     Market width = % of stocks with close > MA(ma_period)
+
+    Read from the materialized agg.agg_breadth (total / above_ma{N}) when it covers the
+    last `days` trading dates up to end_date for this ma_period; otherwise computed in one
+    catalog query: daily closes from a trading-calendar lower bound, per-stock MA as a
+    window function, joined to current SW members and aggregated per industry and date.
+    Stocks with fewer than ma_period closes in the window count as not above MA.
     
     Args:
         end_date_str: End date in YYYYMMDD format
@@ -488,20 +474,12 @@ def calculate_market_width(end_date_str: str = None, days: int = 30, ma_period:
     Returns:
         DataFrame with columns: trade_date, index_code, index_name, width_ratio
     """
-    # 1. Get industry member mapping
-    df_members = get_sw_members()
-    if df_members.empty:
-        return pd.DataFrame()
-
     # 自动取最近交易日
     if not end_date_str:
         end_date_str = get_latest_stock_trade_date()
     if not end_date_str:
         return pd.DataFrame()
     
-    # Get unique stock codes
-    stock_codes = df_members['ts_code'].unique().tolist()
-    
     # Determine which level column to use
     if level == 'L1':
         code_col, name_col = 'l1_code', 'l1_name'
@@ -510,59 +488,63 @@ def calculate_market_width(end_date_str: str = None, days: int = 30, ma_period:
     else:
         code_col, name_col = 'l3_code', 'l3_name'
     
-    # 2. Fetch historical stock data (need ma_period + days of data)
-    conn = get_stock_db_connection()
+    days, ma_period = int(days), int(ma_period)
+    conn = get_catalog_connection('stock', 'index', 'agg')
     if not conn:
         return pd.DataFrame()
-    
-    codes_placeholder = ",".join([f"'{c}'" for c in stock_codes])
 
     try:
+        grouped = _market_width_from_agg(conn, end_date_str, days, ma_period, code_col[:2].upper())
+        if grouped is not None:
+            grouped['width_ratio'] = (grouped['above_ma_count'] / grouped['total_stocks'] * 100).round(1)
+            return grouped[['trade_date', 'index_code', 'index_name', 'width_ratio']]
+
+        # MA 需要 days + ma_period - 1 个交易日，再多取 ma_period 天给窗口内停牌过的股票
+        start_date = _width_start_date(conn, end_date_str, days + 2 * ma_period) or '00000000'
         query = f"""
-            SELECT ts_code, trade_date, close
-            FROM daily
-            WHERE trade_date <= '{end_date_str}'
-            ORDER BY trade_date DESC
-            LIMIT {len(stock_codes) * (days + ma_period + 10)}
+            WITH members AS (
+                SELECT ts_code, {code_col} AS index_code, {name_col} AS index_name
+                FROM "index".sw_index_member_all
+                WHERE is_new = 'Y' AND {code_col} IS NOT NULL AND {name_col} IS NOT NULL
+            ),
+            px AS (
+                SELECT ts_code, trade_date, close,
+                       AVG(close) OVER w AS ma,
+                       COUNT(close) OVER w AS n
+                FROM stock.daily
+                WHERE trade_date BETWEEN ? AND ?
+                  AND ts_code IN (SELECT ts_code FROM members)
+                WINDOW w AS (PARTITION BY ts_code ORDER BY trade_date
+                             ROWS BETWEEN {ma_period - 1} PRECEDING AND CURRENT ROW)
+            ),
+            dates AS (
+                SELECT DISTINCT trade_date FROM px ORDER BY trade_date DESC LIMIT {days}
+            )
+            SELECT p.trade_date, m.index_code, m.index_name,
+                   COUNT(*) AS total_stocks,
+                   COUNT(*) FILTER (WHERE p.n = {ma_period} AND p.close > p.ma) AS above_ma_count
+            FROM px p
+            JOIN members m ON m.ts_code = p.ts_code
+            WHERE p.trade_date IN (SELECT trade_date FROM dates)
+            GROUP BY p.trade_date, m.index_code, m.index_name
+            ORDER BY p.trade_date, m.index_code, m.index_name
         """
-        df_daily = conn.execute(query).fetchdf()
+        grouped = conn.execute(query, [start_date, end_date_str]).fetchdf()
     except Exception as e:
-        st.error(f"Error fetching stock data: {e}")
+        st.error(f"Error calculating market width: {e}")
         return pd.DataFrame()
     finally:
         conn.close()
     
-    if df_daily.empty:
+    if grouped.empty:
         return pd.DataFrame()
     
-    # 3. Calculate MA for each stock
-    df_daily = df_daily.sort_values(['ts_code', 'trade_date'])
-    df_daily['ma'] = df_daily.groupby('ts_code')['close'].transform(
-        lambda x: x.rolling(window=ma_period, min_periods=ma_period).mean()
-    )
-    df_daily['above_ma'] = (df_daily['close'] > df_daily['ma']).astype(int)
-    
-    # 4. Get the target date range
-    trade_dates = df_daily['trade_date'].drop_duplicates().sort_values(ascending=False).head(days).tolist()
-    df_daily = df_daily[df_daily['trade_date'].isin(trade_dates)]
-    
-    # 5. Merge with industry info
-    df_merged = df_daily.merge(df_members[['ts_code', code_col, name_col]], on='ts_code', how='left')
-    df_merged = df_merged.dropna(subset=[code_col])
-    
-    # 6. Calculate width ratio for each industry on each date
-    grouped = df_merged.groupby(['trade_date', code_col, name_col]).agg(
-        total_stocks=('above_ma', 'count'),
-        above_ma_count=('above_ma', 'sum')
-    ).reset_index()
-    
     grouped['width_ratio'] = (grouped['above_ma_count'] / grouped['total_stocks'] * 100).round(1)
-    grouped = grouped.rename(columns={code_col: 'index_code', name_col: 'index_name'})
     
     return grouped[['trade_date', 'index_code', 'index_name', 'width_ratio']]
 
 
-@st.cache_data
+@persistent_cache('index.sw_daily')
 def load_sw_l1_daily_history(l1_codes: list, start_date: str, end_date: str):
     """
     Fetch historical daily data for specific SW Level 1 indices.
@@ -331,12 +331,13 @@ def plot_capital_vs_return_scatter(df_daily: pd.DataFrame, df_index: pd.DataFram
 
 # ==================== 3. Sentiment ====================
 
-def plot_sentiment_gauges(df_daily: pd.DataFrame) -> go.Figure:
+def plot_sentiment_gauges(df_daily: pd.DataFrame, sentiment: Optional[dict] = None) -> go.Figure:
     """
     Market Sentiment Dashboard (Up ratio + Avg swing)
     
     Args:
         df_daily: tdx_daily DataFrame
+        sentiment: Precomputed latest-day metrics (load_tdx_sentiment); computed from df_daily when empty
         
     Returns:
         Plotly figure with gauges
@@ -344,14 +345,19 @@ def plot_sentiment_gauges(df_daily: pd.DataFrame) -> go.Figure:
     if df_daily.empty:
         return None
     
-    # Get latest data
-    latest_date = df_daily['trade_date'].max()
-    latest_data = df_daily[df_daily['trade_date'] == latest_date]
-    
-    # Calculate metrics
-    up_ratio = (latest_data['up_num'].sum() / (latest_data['up_num'].sum() + latest_data['down_num'].sum())) * 100 if latest_data['up_num'].notna().any() else 50
-    avg_swing = latest_data['swing'].mean() if 'swing' in latest_data.columns else 0
-    avg_turnover = latest_data['turnover_rate'].mean() if 'turnover_rate' in latest_data.columns else 0
+    if sentiment:
+        up_ratio = sentiment['up_ratio']
+        avg_swing = sentiment.get('avg_swing') or 0
+        avg_turnover = sentiment.get('avg_turnover') or 0
+    else:
+        # Get latest data
+        latest_date = df_daily['trade_date'].max()
+        latest_data = df_daily[df_daily['trade_date'] == latest_date]
+        
+        # Calculate metrics
+        up_ratio = (latest_data['up_num'].sum() / (latest_data['up_num'].sum() + latest_data['down_num'].sum())) * 100 if latest_data['up_num'].notna().any() else 50
+        avg_swing = latest_data['swing'].mean() if 'swing' in latest_data.columns else 0
+        avg_turnover = latest_data['turnover_rate'].mean() if 'turnover_rate' in latest_data.columns else 0
     
     # Create gauges
     fig = go.Figure()
@@ -5,16 +5,18 @@ Handles data loading from TDX DuckDB database containing:
 - tdx_daily: 板块行情 (sector quotes)
 - tdx_index: 板块信息 (sector metadata)  
 - tdx_member: 成分股 (constituents)
+- agg.agg_tdx_sentiment: 板块情绪指标（daily_fetcher 后增量物化，见 src/tushare_duckdb/aggregates.py）
 """
 
-import duckdb
 import pandas as pd
 import streamlit as st
-from pathlib import Path
 from datetime import datetime, timedelta
 
+from dashboard.cache import persistent_cache
+from dashboard.db import connect, db_path, get_catalog_connection, has_table
+
 # Database path
-TDX_DB_PATH = "/Users/robert/Developer/DuckDB/tushare_duck_index.db"
+TDX_DB_PATH = db_path('index')
 
 
 def get_tdx_db_connection():
@@ -24,15 +26,7 @@ def get_tdx_db_connection():
     Returns:
         duckdb.DuckDBPyConnection or None
     """
-    try:
-        db_path = Path(TDX_DB_PATH)
-        if not db_path.exists():
-            st.error(f"TDX database not found at {TDX_DB_PATH}")
-            return None
-        return duckdb.connect(str(db_path), read_only=True)
-    except Exception as e:
-        st.error(f"Failed to connect to TDX database: {e}")
-        return None
+    return connect(TDX_DB_PATH)
 
 
 @st.cache_data(ttl=1800)
@@ -98,7 +92,7 @@ def load_tdx_daily(limit_days: int = 252, idx_type_filter: str = None) -> pd.Dat
         conn.close()
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.tdx_index', ttl=3600)
 def load_tdx_index() -> pd.DataFrame:
     """
     Load tdx_index (板块信息) metadata.
@@ -141,7 +135,7 @@ def load_tdx_index() -> pd.DataFrame:
         conn.close()
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.tdx_member', ttl=3600)
 def load_tdx_member(ts_code: str = None, trade_date: str = None, limit: int = 5000) -> pd.DataFrame:
     """
     Load tdx_member (成分股) data.
@@ -228,7 +222,7 @@ def preprocess_tdx_daily(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-@st.cache_data(ttl=3600)
+@persistent_cache('index.tdx_index', ttl=3600)
 def get_idx_type_stats() -> dict:
     """
     Get statistics for each idx_type.
@@ -244,7 +238,44 @@ def get_idx_type_stats() -> dict:
     return stats
 
 
-@st.cache_data(ttl=1800)
+@persistent_cache('agg.agg_tdx_sentiment', 'index.tdx_daily', ttl=1800)
+def load_tdx_sentiment(idx_type_filter: str = None) -> dict:
+    """
+    Load the latest-day sentiment metrics from the materialized agg_tdx_sentiment table.
+    
+    Args:
+        idx_type_filter: idx_type as in load_tdx_daily (None for all sectors)
+        
+    Returns:
+        Dict {metric: value} (up_ratio, avg_swing, avg_turnover, up_num, down_num, ...);
+        empty when the aggregate table is missing or behind tdx_daily
+    """
+    conn = get_catalog_connection('agg', 'index')
+    if not conn:
+        return {}
+    
+    try:
+        if not has_table(conn, 'agg', 'agg_tdx_sentiment'):
+            return {}
+        query = """
+            SELECT metric, value
+            FROM agg.agg_tdx_sentiment
+            WHERE idx_type = ?
+            AND trade_date = (SELECT MAX(trade_date) FROM "index".tdx_daily WHERE trade_date <= ?)
+        """
+        rows = conn.execute(query, [idx_type_filter or 'ALL', datetime.now().strftime("%Y%m%d")]).fetchall()
+        sentiment = dict(rows)
+        if sentiment and sentiment.get('up_ratio') is None:
+            sentiment['up_ratio'] = 50
+        return sentiment
+    except Exception as e:
+        st.error(f"Failed to load tdx sentiment: {e}")
+        return {}
+    finally:
+        conn.close()
+
+
+@persistent_cache('index.tdx_daily', ttl=1800)
 def get_latest_trade_date() -> str:
     """
     Get the latest trade_date from tdx_daily.
@@ -15,8 +15,8 @@ src_dir = os.path.join(os.path.dirname(current_dir), 'src')
 if src_dir not in sys.path:
     sys.path.insert(0, src_dir)
 
-from vix.data_loader import fetch_option_data, get_shibor_interpolated
-from vix.calculator import calculate_vix_for_date
+from vix.batch import compute_vix_many
+from vix.store import load_vix
 from vix.config import ETF_OPTIONS, INDEX_OPTIONS
 
 
@@ -33,83 +33,70 @@ def get_available_underlyings():
     return result
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def calculate_vix_series(start_date: str, end_date: str, underlying: str = '510050.SH'):
+def _split_details(df_summary, df_details):
+    df_summary.insert(1, 'date_str', df_summary['date'].dt.strftime('%Y%m%d'))
+    
+    # Process details
+    df_details_near = df_details[df_details['term_type'] == 'near'].copy()
+    df_details_next = df_details[df_details['term_type'] == 'next'].copy()
+    
+    return df_summary, df_details_near, df_details_next
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def calculate_vix_multi(start_date: str, end_date: str, underlyings: tuple):
     """
-    Calculate VIX for a date range.
+    Load VIX for several underlyings over a date range.
+    
+    Reads the persisted VIX store (vix_daily / vix_details, kept up to date after each
+    option update). Underlyings with no stored rows for the range (e.g. before the first
+    `python -m src.vix.store`) are calculated together: option chains and Shibor are
+    loaded once for all of them.
     
     Args:
         start_date: Start date in YYYYMMDD format
         end_date: End date in YYYYMMDD format
-        underlying: Underlying ETF/Index code
+        underlyings: Underlying ETF/Index codes
         
     Returns:
-        Tuple of (df_summary, df_details_near, df_details_next)
+        Dict of {underlying: (df_summary, df_details_near, df_details_next)}, only
+        underlyings with results
     """
-    try:
-        # Load option data
-        options_all = fetch_option_data(start_date, end_date, underlying)
-        if options_all.empty:
-            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-        
-        # Load Shibor data
-        shibor_interp = get_shibor_interpolated(start_date, end_date)
-        if shibor_interp.empty:
-            return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-        
-    except Exception as e:
-        st.error(f"Data loading failed: {e}")
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-    
-    # Calculate VIX for each trading day
-    dates = sorted(options_all['date'].unique())
-    
-    results = []
-    all_details = []
-    
-    for current_date in dates:
-        # Filter options for this date
-        daily_opts = options_all[options_all['date'] == current_date]
-        
-        # Get Shibor rate for this date
+    results = {}
+    missing = []
+    for underlying in underlyings:
         try:
-            daily_shibor = shibor_interp.loc[current_date]
-        except KeyError:
-            continue
-        
-        # Calculate VIX
-        result_dict = calculate_vix_for_date(current_date, daily_opts, daily_shibor)
-        
-        if result_dict is not None:
-            # Extract details
-            details_df = result_dict.pop('details')
-            
-            # Summary Record
-            result_record = {
-                'date': current_date,
-                'date_str': current_date.strftime('%Y%m%d')
-            }
-            result_record.update(result_dict)
-            results.append(result_record)
-            
-            # Details Record
-            all_details.append(details_df)
-    
-    if not results:
-        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
-    
-    df_summary = pd.DataFrame(results)
+            df_summary, df_details = load_vix(start_date, end_date, underlying)
+        except Exception:
+            df_summary = pd.DataFrame()
+        if df_summary.empty:
+            missing.append(underlying)
+        else:
+            results[underlying] = _split_details(df_summary, df_details)
     
-    # Process details
-    df_details_near = pd.DataFrame()
-    df_details_next = pd.DataFrame()
+    if missing:
+        try:
+            # Calculated in this process: a process pool is not worth it inside Streamlit
+            computed = compute_vix_many(start_date, end_date, missing, workers=1)
+        except Exception as e:
+            st.error(f"Data loading failed: {e}")
+            computed = {}
+        for underlying, (df_summary, df_details) in computed.items():
+            if not df_summary.empty:
+                results[underlying] = _split_details(df_summary, df_details)
     
-    if all_details:
-        df_details = pd.concat(all_details)
-        df_details_near = df_details[df_details['term_type'] == 'near'].copy()
-        df_details_next = df_details[df_details['term_type'] == 'next'].copy()
+    return results
+
+
+def calculate_vix_series(start_date: str, end_date: str, underlying: str = '510050.SH'):
+    """
+    Load VIX for a date range (see calculate_vix_multi).
     
-    return df_summary, df_details_near, df_details_next
+    Returns:
+        Tuple of (df_summary, df_details_near, df_details_next)
+    """
+    empty = (pd.DataFrame(), pd.DataFrame(), pd.DataFrame())
+    return calculate_vix_multi(start_date, end_date, (underlying,)).get(underlying, empty)
 
 
 def get_default_date_range():
@@ -11,6 +11,9 @@ moneyflow_hsgt 沪深港通资金流向历史数据补全脚本
     
     # 仅显示计划(不实际获取)
     python scripts/backfill_moneyflow_hsgt.py --dry-run
+    
+    # 可续跑模式：记录已确认无数据的交易日，中断后以同一命令重跑时跳过
+    python scripts/backfill_moneyflow_hsgt.py --start 20240101 --end 20240131 --resume
 """
 import os
 import sys
@@ -23,6 +26,7 @@ import pandas as pd
 from src.tushare_duckdb.config import PRO_API, API_CONFIG
 from src.tushare_duckdb.utils import get_connection, init_table, table_exists
 from src.tushare_duckdb.storage import DuckDBStorage
+from src.tushare_duckdb.checkpoint import NullCheckpoint, open_checkpoint
 from src.tushare_duckdb.logger import logger
 
 
@@ -43,7 +47,7 @@ def get_trade_dates_from_calendar(basic_db_path, start_date, end_date):
 
 
 def fetch_data_for_range(start_date, end_date, fields):
-    """获取指定日期范围的数据"""
+    """获取指定日期范围的数据，API 失败时返回 None"""
     try:
         df = PRO_API.moneyflow_hsgt(
             start_date=start_date,
@@ -54,10 +58,11 @@ def fetch_data_for_range(start_date, end_date, fields):
             return df
     except Exception as e:
         logger.error(f"API 请求失败 ({start_date} ~ {end_date}): {e}")
+        return None
     return pd.DataFrame()
 
 
-def backfill_moneyflow_hsgt(start_date=None, end_date=None, dry_run=False):
+def backfill_moneyflow_hsgt(start_date=None, end_date=None, dry_run=False, resume=False):
     """补全 moneyflow_hsgt 数据"""
     
     config = API_CONFIG['moneyflow']['tables']['moneyflow_hsgt']
@@ -89,6 +94,10 @@ def backfill_moneyflow_hsgt(start_date=None, end_date=None, dry_run=False):
             init_table(conn, table_name, config)
         
         storage = DuckDBStorage(conn)
+        # 断点只在 --resume 时启用，dry-run 不读写 fetch_jobs；
+        # end_date 默认为今天，不放入任务标识，续跑时仍能找到上次的任务
+        job_id = f"{table_name}:backfill"
+        checkpoint = NullCheckpoint(conn, job_id) if dry_run else open_checkpoint(conn, job_id, resume)
         
         # 获取本地已有日期
         try:
@@ -104,10 +113,14 @@ def backfill_moneyflow_hsgt(start_date=None, end_date=None, dry_run=False):
         logger.info(f"交易日历中共 {len(all_trade_dates)} 个交易日")
         
         # 找出缺失的日期
-        missing_dates = [d for d in all_trade_dates if d not in local_dates]
+        missing_dates = [
+            d for d in all_trade_dates
+            if d not in local_dates and not checkpoint.is_done(table_name, d)
+        ]
         logger.info(f"缺失 {len(missing_dates)} 个交易日的数据")
         
         if not missing_dates:
+            checkpoint.finish()
             logger.info("无缺失数据，补全完成！")
             return
         
@@ -122,6 +135,7 @@ def backfill_moneyflow_hsgt(start_date=None, end_date=None, dry_run=False):
         batch_size_days = 30
         total_stored = 0
         failed_ranges = []
+        pending = 0  # 获取或写入失败、未记录完成的交易日数
         
         # 按时间顺序处理
         missing_dates.sort()
@@ -153,18 +167,26 @@ def backfill_moneyflow_hsgt(start_date=None, end_date=None, dry_run=False):
             
             df = fetch_data_for_range(actual_start, actual_end, fields)
             
-            if df.empty:
+            if df is None:
+                failed_ranges.append((actual_start, actual_end))
+                pending += len(batch_dates)
+            elif df.empty:
                 logger.warning(f"  {actual_start} ~ {actual_end}: 无数据")
                 failed_ranges.append((actual_start, actual_end))
+                checkpoint.store_unit(storage, table_name, batch_dates, df)
             else:
                 df = df.drop_duplicates(subset=['trade_date'])
                 
-                stored = storage.store_data(
-                    table_name, df, unique_keys,
+                # 以交易日为工作单元，与数据同事务记录（重跑时窗口会按缺失日期重新切分）
+                stored = checkpoint.store_unit(
+                    storage, table_name, batch_dates, df,
+                    unique_keys=unique_keys,
                     date_column='trade_date',
                     storage_mode='insert_new',
                     api_config_entry=config
                 )
+                if stored < 0:
+                    pending += len(batch_dates)
                 
                 new_stored = stored if stored > 0 else 0
                 total_stored += new_stored
@@ -172,6 +194,12 @@ def backfill_moneyflow_hsgt(start_date=None, end_date=None, dry_run=False):
             
             i = j  # 跳到下一个未处理的日期
         
+        if pending:
+            # 保留已完成的交易日，--resume 重跑只处理未完成部分
+            logger.warning(f"{pending} 个交易日获取或写入失败，保留断点，可以 --resume 重新运行")
+        else:
+            checkpoint.finish()
+        
         # 最终统计
         try:
             stats = conn.execute(f"""
@@ -217,12 +245,19 @@ def main():
         help='仅显示计划，不实际获取数据'
     )
     
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='断点续传：跳过上次中断前已确认的交易日（需与上次使用相同的 --start/--end）'
+    )
+    
     args = parser.parse_args()
     
     backfill_moneyflow_hsgt(
         start_date=args.start,
         end_date=args.end,
-        dry_run=args.dry_run
+        dry_run=args.dry_run,
+        resume=args.resume
     )
 
 
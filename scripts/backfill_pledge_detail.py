@@ -4,11 +4,13 @@ pledge_detail 数据补全脚本
   默认模式：只获取新增股票的数据
   --force：强制重新获取所有股票数据
   --smart：智能模式，只获取质押次数有变化的股票
+  --resume：断点续传，跳过上次中断前（同一模式）已完成的股票
 
 使用方法:
   python scripts/backfill_pledge_detail.py           # 默认：只获取新股票
   python scripts/backfill_pledge_detail.py --force   # 强制全量更新
   python scripts/backfill_pledge_detail.py --smart   # 智能更新（质押次数变化）
+  python scripts/backfill_pledge_detail.py --force --resume  # 全量更新中断后续跑
 """
 import os
 import sys
@@ -20,11 +22,12 @@ import pandas as pd
 from src.tushare_duckdb.config import PRO_API, API_CONFIG
 from src.tushare_duckdb.utils import get_connection, init_table, table_exists
 from src.tushare_duckdb.storage import DuckDBStorage
+from src.tushare_duckdb.checkpoint import open_checkpoint
 from src.tushare_duckdb.logger import logger
 
 
 def fetch_detail_for_stock(ts_code, fields, limit=1000):
-    """获取单个股票的质押明细（分页）"""
+    """获取单个股票的质押明细（分页），API 失败时返回 None"""
     all_dfs = []
     offset = 0
     
@@ -33,7 +36,7 @@ def fetch_detail_for_stock(ts_code, fields, limit=1000):
             df = PRO_API.pledge_detail(ts_code=ts_code, fields=fields, limit=limit, offset=offset)
         except Exception as e:
             logger.error(f"API 失败 ({ts_code}, offset={offset}): {e}")
-            return pd.DataFrame()
+            return None
         
         if df is None or df.empty:
             break
@@ -103,7 +106,7 @@ def get_stocks_to_update(conn, mode='default'):
         return missing_codes, 'insert_new'
 
 
-def backfill_pledge_detail(mode='default'):
+def backfill_pledge_detail(mode='default', resume=False):
     """补全 pledge_detail 数据"""
     
     config = API_CONFIG['reference']['tables']['pledge_detail']
@@ -124,11 +127,17 @@ def backfill_pledge_detail(mode='default'):
         if not table_exists(conn, table_name):
             init_table(conn, table_name, config)
         storage = DuckDBStorage(conn)
+        checkpoint = open_checkpoint(conn, f"{table_name}:{mode}", resume=resume)
         
         # 根据模式获取需要更新的股票
         stocks_to_update, storage_mode = get_stocks_to_update(conn, mode)
+        if resume:
+            # 已完成的股票在强制模式下也不会被再次删除
+            stocks_to_update = [c for c in stocks_to_update if not checkpoint.is_done(table_name, c)]
+            logger.info(f"[resume] 剩余 {len(stocks_to_update)} 个股票待处理")
         
         if not stocks_to_update:
+            checkpoint.finish()
             logger.info("无需更新，补全完成！")
             return
         
@@ -146,6 +155,8 @@ def backfill_pledge_detail(mode='default'):
         total_stored = 0
         batch_size = 50
         batch_dfs = []
+        batch_codes = []  # 本批次中成功获取（含无数据）的股票，与数据同事务记录 checkpoint
+        pending = 0       # 获取或写入失败、未记录完成的股票数
         api_call_count = 0
         
         for i, ts_code in enumerate(stocks_to_update):
@@ -158,39 +169,54 @@ def backfill_pledge_detail(mode='default'):
             
             df = fetch_detail_for_stock(ts_code, fields, limit)
             
-            if not df.empty:
+            if df is not None:
+                batch_codes.append(ts_code)
+            else:
+                pending += 1
+            if df is not None and not df.empty:
                 batch_dfs.append(df)
                 if (i + 1) % 100 == 0:
                     logger.info(f"[{i+1}/{len(stocks_to_update)}] {ts_code}: {len(df)} 条")
             
             # 批量存储
-            if len(batch_dfs) >= batch_size or (i == len(stocks_to_update) - 1 and batch_dfs):
-                combined = pd.concat(batch_dfs, ignore_index=True)
-                combined = combined.drop_duplicates(subset=unique_keys)
+            if len(batch_dfs) >= batch_size or (i == len(stocks_to_update) - 1 and batch_codes):
+                combined = pd.concat(batch_dfs, ignore_index=True) if batch_dfs else pd.DataFrame()
                 
-                # 过滤掉主键字段为空的记录
-                original_len = len(combined)
-                combined = combined.dropna(subset=['ts_code', 'ann_date', 'holder_name', 'pledge_amount'])
-                if len(combined) < original_len:
-                    logger.warning(f"过滤掉 {original_len - len(combined)} 条主键字段为空的记录")
+                if not combined.empty:
+                    combined = combined.drop_duplicates(subset=unique_keys)
+                    # 过滤掉主键字段为空的记录
+                    original_len = len(combined)
+                    combined = combined.dropna(subset=['ts_code', 'ann_date', 'holder_name', 'pledge_amount'])
+                    if len(combined) < original_len:
+                        logger.warning(f"过滤掉 {original_len - len(combined)} 条主键字段为空的记录")
                 
+                stored = checkpoint.store_unit(
+                    storage, table_name, batch_codes, combined,
+                    unique_keys=unique_keys,
+                    date_column='ann_date',
+                    storage_mode='insert_new',
+                    api_config_entry=config
+                )
+                if stored < 0:
+                    pending += len(batch_codes)
                 if not combined.empty:
-                    stored = storage.store_data(
-                        table_name, combined, unique_keys,
-                        date_column='ann_date',
-                        storage_mode='insert_new',
-                        api_config_entry=config
-                    )
                     new_stored = stored if stored > 0 else 0
                     total_stored += new_stored
                     logger.info(f"=== 批量存储: {len(batch_dfs)} 股, {len(combined)} 条, 新增 {new_stored} 条 ===")
                 
                 batch_dfs = []
+                batch_codes = []
             
             # 进度
             if (i + 1) % 500 == 0:
                 logger.info(f"--- 进度: {i+1}/{len(stocks_to_update)}, 累计新增 {total_stored} 条 ---")
         
+        if pending:
+            # 保留已完成的股票，--resume 重跑只处理未完成部分
+            logger.warning(f"{pending} 只股票获取或写入失败，保留断点，可以 --resume 重新运行")
+        else:
+            checkpoint.finish()
+        
         # 最终统计
         stats = conn.execute(f"""
             SELECT COUNT(*), MIN(ann_date), MAX(ann_date), COUNT(DISTINCT ts_code)
@@ -211,6 +237,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='pledge_detail 数据补全脚本')
     parser.add_argument('--force', action='store_true', help='强制全量更新所有股票')
     parser.add_argument('--smart', action='store_true', help='智能更新质押次数变化的股票')
+    parser.add_argument('--resume', action='store_true', help='断点续传：跳过上次中断前已完成的股票')
     args = parser.parse_args()
     
     if args.force:
@@ -220,4 +247,4 @@ if __name__ == '__main__':
     else:
         mode = 'default'
     
-    backfill_pledge_detail(mode)
+    backfill_pledge_detail(mode, resume=args.resume)
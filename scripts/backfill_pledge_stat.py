@@ -3,16 +3,20 @@ pledge_stat 数据补全脚本
 1. 填补中间缺失的周五
 2. 补全更早的历史数据
 
-使用方法: python scripts/backfill_pledge_stat.py
+使用方法:
+  python scripts/backfill_pledge_stat.py            # 补全缺失周五
+  python scripts/backfill_pledge_stat.py --resume   # 中断后续跑，跳过已确认的周五
 """
 import os
 import sys
+import argparse
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pandas as pd
 from src.tushare_duckdb.config import PRO_API, API_CONFIG
 from src.tushare_duckdb.utils import get_connection, init_table, table_exists
 from src.tushare_duckdb.storage import DuckDBStorage
+from src.tushare_duckdb.checkpoint import open_checkpoint
 from src.tushare_duckdb.logger import logger
 
 
@@ -38,7 +42,7 @@ def get_all_fridays_from_calendar(basic_db_path, start_date='20180101', end_date
 
 
 def fetch_for_date(end_date, fields, limit=3000):
-    """获取指定日期的完整数据（分页）"""
+    """获取指定日期的完整数据（分页），API 失败时返回 None"""
     all_dfs = []
     offset = 0
     
@@ -47,7 +51,7 @@ def fetch_for_date(end_date, fields, limit=3000):
             df = PRO_API.pledge_stat(end_date=end_date, fields=fields, limit=limit, offset=offset)
         except Exception as e:
             logger.error(f"API 失败 ({end_date}, offset={offset}): {e}")
-            break
+            return None
         
         if df is None or df.empty:
             break
@@ -70,7 +74,7 @@ def fetch_for_date(end_date, fields, limit=3000):
     return pd.concat(all_dfs, ignore_index=True).drop_duplicates(subset=['ts_code', 'end_date'])
 
 
-def backfill_pledge_stat():
+def backfill_pledge_stat(resume=False):
     """补全 pledge_stat 数据：填补缺失 + 补全历史"""
     
     config = API_CONFIG['reference']['tables']['pledge_stat']
@@ -95,6 +99,7 @@ def backfill_pledge_stat():
         if not table_exists(conn, table_name):
             init_table(conn, table_name, config)
         storage = DuckDBStorage(conn)
+        checkpoint = open_checkpoint(conn, f"{table_name}:backfill", resume=resume)
         
         # 获取本地已有的周五
         result = conn.execute(f"SELECT DISTINCT end_date FROM {table_name} ORDER BY end_date").fetchall()
@@ -102,10 +107,14 @@ def backfill_pledge_stat():
         logger.info(f"本地已有 {len(local_dates)} 个周五的数据")
         
         # 找出缺失的周五
-        missing_fridays = [f for f in all_fridays if f not in local_dates]
+        missing_fridays = [
+            f for f in all_fridays
+            if f not in local_dates and not checkpoint.is_done(table_name, f)
+        ]
         logger.info(f"缺失 {len(missing_fridays)} 个周五")
         
         if not missing_fridays:
+            checkpoint.finish()
             logger.info("无缺失数据，补全完成！")
             return
         
@@ -116,35 +125,53 @@ def backfill_pledge_stat():
         failed_dates = []
         batch_size = 20  # 每 20 个周五批量存储一次
         batch_dfs = []
+        batch_fridays = []  # 本批次中成功获取（含无数据）的周五，与数据同事务记录 checkpoint
+        pending = 0         # 获取或写入失败、未记录完成的周五数
         
         for i, friday in enumerate(missing_fridays):
             logger.info(f"[{i+1}/{len(missing_fridays)}] 获取 {friday} ...")
             
             df = fetch_for_date(friday, fields, limit)
             
-            if df.empty:
+            if df is None:
+                failed_dates.append(friday)
+                pending += 1
+            elif df.empty:
                 logger.warning(f"{friday}: 无数据")
                 failed_dates.append(friday)
+                batch_fridays.append(friday)
             else:
                 batch_dfs.append(df)
+                batch_fridays.append(friday)
                 logger.info(f"{friday}: 获取 {len(df)} 条")
             
             # 批量存储
-            if len(batch_dfs) >= batch_size or (i == len(missing_fridays) - 1 and batch_dfs):
-                combined = pd.concat(batch_dfs, ignore_index=True)
-                combined = combined.drop_duplicates(subset=['ts_code', 'end_date'])
+            if len(batch_dfs) >= batch_size or (i == len(missing_fridays) - 1 and batch_fridays):
+                combined = pd.concat(batch_dfs, ignore_index=True) if batch_dfs else pd.DataFrame()
+                if not combined.empty:
+                    combined = combined.drop_duplicates(subset=['ts_code', 'end_date'])
                 
-                stored = storage.store_data(
-                    table_name, combined, unique_keys,
+                stored = checkpoint.store_unit(
+                    storage, table_name, batch_fridays, combined,
+                    unique_keys=unique_keys,
                     date_column='end_date',
                     storage_mode='insert_new',
                     api_config_entry=config
                 )
+                if stored < 0:
+                    pending += len(batch_fridays)
                 
                 new_stored = stored if stored > 0 else 0
                 total_stored += new_stored
                 logger.info(f"=== 批量存储: {len(batch_dfs)} 周, {len(combined)} 条, 新增 {new_stored} 条 ===")
                 batch_dfs = []
+                batch_fridays = []
+        
+        if pending:
+            # 保留已完成的周五，--resume 重跑只处理未完成部分
+            logger.warning(f"{pending} 个周五获取或写入失败，保留断点，可以 --resume 重新运行")
+        else:
+            checkpoint.finish()
         
         # 最终统计
         stats = conn.execute(f"""
@@ -164,4 +191,8 @@ def backfill_pledge_stat():
 
 
 if __name__ == '__main__':
-    backfill_pledge_stat()
+    parser = argparse.ArgumentParser(description='pledge_stat 数据补全脚本')
+    parser.add_argument('--resume', action='store_true', help='断点续传：跳过上次中断前已确认的周五')
+    args = parser.parse_args()
+    
+    backfill_pledge_stat(resume=args.resume)
@@ -8,7 +8,7 @@ Daily Tushare Data Fetcher (每日数据自动更新脚本)
 - 连续服务器错误时中断，单表失败时继续
 
 Usage:
-    python -m scripts.daily_fetcher [--date YYYYMMDD] [--categories cat1,cat2] [--dry-run]
+    python -m scripts.daily_fetcher [--date YYYYMMDD] [--categories cat1,cat2] [--dry-run] [--plan]
 
 Examples:
     # 获取最近交易日的所有日频数据
@@ -22,11 +22,30 @@ Examples:
 
     # 模拟运行（不实际获取）
     python -m scripts.daily_fetcher --dry-run
+
+    # 估算调用量与耗时（按 4 并发）
+    python -m scripts.daily_fetcher --plan --concurrency 4
+
+    # 可续跑模式：记录已完成的日期，中断后以同一命令重跑时跳过
+    python -m scripts.daily_fetcher --date 20260110 --resume
+
+    # 按数据库文件并行获取（每个文件一个写者，共享 API 配额）
+    python -m scripts.daily_fetcher --workers 4
+
+    # 获取完成后增量校验（只复查本次写入的日期）
+    python -m scripts.daily_fetcher --validate
+
+    # 期权行情更新后默认增量计算 VIX（写入 vix_daily / vix_details），可跳过
+    python -m scripts.daily_fetcher --skip-vix
+
+    # 个股 / 通达信板块行情更新后默认增量物化横截面聚合表 agg_*，可跳过
+    python -m scripts.daily_fetcher --skip-agg
 """
 
 import argparse
 import sys
 import os
+import threading
 from datetime import datetime, timedelta
 from pathlib import Path
 
@@ -35,8 +54,11 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from src.tushare_duckdb.config import API_CONFIG, BASIC_DB_PATH
-from src.tushare_duckdb.utils import get_connection
+from src.tushare_duckdb.utils import get_connection, preload_trade_calendar, clear_trade_calendar_cache
 from src.tushare_duckdb.main import fetch_and_store_data
+from src.tushare_duckdb.planner import plan_category, print_plan
+from src.tushare_duckdb.scheduler import DagTask, run_dag, topological_order
+from src.tushare_duckdb.validation_runner import run_validation
 from src.tushare_duckdb.logger import logger
 
 try:
@@ -273,12 +295,56 @@ DELAYED_TABLES = {
     'bond_blk_detail': 5,
 }
 
+# ==================== 并行调度配置 (--workers) ====================
+# 表依赖：下游表在上游表完成后才会被调度；上下游都必须是 DAILY_TABLES 中的表
+# （见 check_table_dependencies）。只通过 --categories 选中下游时，上游视为已满足。
+# 串行模式按 topological_order 排序，与并行模式一致。
+# trade_cal 不在 DAILY_TABLES 中（年度维护），不是调度节点：并行模式启动前预加载到内存。
+TABLE_DEPENDENCIES = {
+    'opt_daily': ['opt_basic'],    # VIX（src/vix/data_loader.py）与 validate_options 按 ts_code 关联
+                                   # opt_basic，新挂牌合约须先有合约信息
+    'tdx_daily': ['tdx_index'],    # agg_tdx_sentiment 与 dashboard 按 tdx_index.idx_type 分组
+}
+
+def check_table_dependencies(dependencies=None):
+    """
+    检查依赖中的表都在 DAILY_TABLES 中（否则该依赖永远不会生效）。
+
+    Raises:
+        ValueError: 存在未知表
+    """
+    dependencies = TABLE_DEPENDENCIES if dependencies is None else dependencies
+    known = {t for tables in DAILY_TABLES.values() for t in tables}
+    unknown = sorted({t for name, deps in dependencies.items() for t in [name, *deps]} - known)
+    if unknown:
+        raise ValueError(f"TABLE_DEPENDENCIES 中的表不在 DAILY_TABLES 中: {unknown}")
+
+
+# 调度优先级（数值越小越先执行），未列出的表使用 DEFAULT_PRIORITY
+TABLE_PRIORITY = {
+    'daily': 10,
+    'adj_factor': 10,
+    'daily_basic': 10,
+    'index_daily': 20,
+    'moneyflow': 20,
+    'margin_detail': 30,
+    'opt_daily': 30,
+    'fut_daily': 30,
+}
+DEFAULT_PRIORITY = 50
+
+# 连续服务器错误阈值（达到后中断执行）
+MAX_CONSECUTIVE_SERVER_ERRORS = 3
+
 # 默认回溯天数（用于普通增量更新，用户可通过 --lookback 覆盖）
 DEFAULT_LOOKBACK_DAYS = 1
 
 # 全局回溯天数覆盖（用于长时间未更新的情况）
 _GLOBAL_LOOKBACK_OVERRIDE = None
 
+# 获取后校验（--validate）覆盖的自然日窗口
+POST_LOAD_VALIDATION_DAYS = 90
+
 
 def set_global_lookback(days: int):
     """设置全局回溯天数覆盖"""
@@ -403,8 +469,147 @@ def calculate_start_date(last_date: str, lookback_days: int, end_date: str) -> s
     return start_dt.strftime('%Y%m%d')
 
 
+def resolve_table_range(category: str, table_name: str, end_date: str, auto_range: bool = True) -> dict:
+    """
+    计算单个表本次获取的日期范围。
+    
+    Returns:
+        dict: last_date / start_date / end_date / lookback
+    """
+    config_group = API_CONFIG.get(category, {})
+    db_path = config_group.get('db_path', '')
+    table_config = config_group.get('tables', {}).get(table_name, {})
+    date_column = table_config.get('date_column', 'trade_date')
+    lookback = get_lookback_days(table_name)
+    
+    if auto_range:
+        last_date = get_table_last_date(db_path, table_name, date_column)
+        start_date = calculate_start_date(last_date, lookback, end_date)
+    else:
+        last_date = None
+        start_date = end_date
+    
+    return {
+        'last_date': last_date,
+        'start_date': start_date,
+        'end_date': end_date,
+        'lookback': lookback,
+    }
+
+
+def fetch_single_table(category: str, table_name: str, range_info: dict, resume: bool = False) -> int:
+    """获取并存储单个表，返回存储条数（异常向上抛出）"""
+    start_date, end_date = range_info['start_date'], range_info['end_date']
+    lookback = range_info['lookback']
+    
+    range_str = f"{start_date}~{end_date}" if start_date != end_date else end_date
+    lookback_hint = f" [回溯{lookback}天]" if lookback > 1 else ""
+    logger.info(f"  → {table_name}{lookback_hint}: {range_str} (本地最新: {range_info['last_date'] or '无'})")
+    
+    return fetch_and_store_data(
+        category=category,
+        start_date=start_date,
+        end_date=end_date,
+        selected_tables=table_name,
+        batch_size=50,
+        force_fetch=False,
+        overwrite=False,
+        resume=resume
+    )
+
+
+def run_parallel_fetch(target_categories: list, end_date: str, auto_range: bool = True,
+                       resume: bool = False, workers: int = 4) -> dict:
+    """
+    并行获取：按数据库文件分组，不同文件的表并行，同一文件内串行（每个文件一个写者）。
+    表之间的依赖见 TABLE_DEPENDENCIES，优先级见 TABLE_PRIORITY，
+    所有线程共享 TushareFetcher 的 API 限流器。
+    
+    Returns:
+        dict: 与串行模式相同结构的各类别结果
+    """
+    results = {
+        category: {
+            'tables': DAILY_TABLES[category],
+            'success': [],
+            'failed': [],
+            'skipped': [],
+            'stored_count': 0,
+            'date_ranges': {},
+        }
+        for category in target_categories
+    }
+    lock = threading.Lock()
+    state = {'consecutive_errors': 0, 'aborted': False}
+    
+    # trade_cal 先行：预加载交易日历，工作线程不再打开 stock 库读取日历
+    cal_days = preload_trade_calendar(BASIC_DB_PATH)
+    if cal_days:
+        logger.info(f"  已预加载交易日历: {cal_days} 个交易日")
+    else:
+        logger.warning("  未能预加载交易日历 (trade_cal 为空或不存在)")
+    
+    def make_task_func(category, table_name):
+        def run():
+            range_info = resolve_table_range(category, table_name, end_date, auto_range)
+            with lock:
+                results[category]['date_ranges'][table_name] = range_info
+            try:
+                stored = fetch_single_table(category, table_name, range_info, resume)
+            except ConnectionError:
+                with lock:
+                    state['consecutive_errors'] += 1
+                    if state['consecutive_errors'] >= MAX_CONSECUTIVE_SERVER_ERRORS:
+                        state['aborted'] = True
+                        logger.error(f"\n连续 {MAX_CONSECUTIVE_SERVER_ERRORS} 次服务器错误，停止调度新任务")
+                raise
+            with lock:
+                state['consecutive_errors'] = 0
+            return stored
+        return run
+    
+    tasks = []
+    table_category = {}
+    for category in target_categories:
+        db_path = API_CONFIG.get(category, {}).get('db_path', '')
+        for table_name in DAILY_TABLES[category]:
+            table_category[table_name] = category
+            tasks.append(DagTask(
+                name=table_name,
+                group=db_path,
+                func=make_task_func(category, table_name),
+                priority=TABLE_PRIORITY.get(table_name, DEFAULT_PRIORITY),
+                order=len(tasks),
+            ))
+    
+    try:
+        outcomes = run_dag(tasks, TABLE_DEPENDENCIES, max_workers=workers,
+                           should_stop=lambda: state['aborted'])
+    finally:
+        clear_trade_calendar_cache()
+    
+    for table_name, (status, value) in outcomes.items():
+        category_result = results[table_category[table_name]]
+        if status == 'success':
+            category_result['success'].append(table_name)
+            category_result['stored_count'] += value
+        elif status == 'failed':
+            category_result['failed'].append(table_name)
+            category_result['error'] = str(value)
+            logger.error(f"    ✗ {table_name} 获取失败: {value}")
+        else:
+            category_result['skipped'].append(table_name)
+    
+    for category, category_result in results.items():
+        logger.info(f"  ✓ {category} 完成: {len(category_result['success'])}个成功, "
+                    f"{len(category_result['failed'])}个失败, 存储{category_result['stored_count']}条")
+    
+    return results
+
+
 def run_daily_fetch(end_date: str, categories: list = None, dry_run: bool = False, 
-                    auto_range: bool = True, show_comparison: bool = True) -> dict:
+                    auto_range: bool = True, show_comparison: bool = True, resume: bool = False,
+                    workers: int = 1) -> dict:
     """
     执行日频数据获取。
     
@@ -414,14 +619,17 @@ def run_daily_fetch(end_date: str, categories: list = None, dry_run: bool = Fals
         dry_run: 是否仅模拟运行
         auto_range: 是否自动根据表数据确定开始日期
         show_comparison: 是否显示前后数据对比
+        resume: 是否跳过上次中断任务中已完成的工作单元
+        workers: 并行度；大于 1 时按数据库文件并行调度（见 run_parallel_fetch）
         
     Returns:
         dict: 各类别的获取结果统计
     """
     results = {}
     consecutive_server_errors = 0
-    max_consecutive_errors = 3  # 连续服务器错误阈值
+    max_consecutive_errors = MAX_CONSECUTIVE_SERVER_ERRORS
     
+    check_table_dependencies()
     target_categories = categories or list(DAILY_TABLES.keys())
     target_categories = validate_categories(target_categories)
     
@@ -430,6 +638,8 @@ def run_daily_fetch(end_date: str, categories: list = None, dry_run: bool = Fals
         return results
     
     mode_desc = '模拟运行 (DRY RUN)' if dry_run else ('自动增量' if auto_range else '指定日期')
+    if not dry_run and workers > 1:
+        mode_desc += f' | 并行 {workers}'
     
     logger.info("=" * 70)
     logger.info(f"  Tushare 日频数据自动更新")
@@ -478,8 +688,14 @@ def run_daily_fetch(end_date: str, categories: list = None, dry_run: bool = Fals
         logger.info("  [阶段2] 执行数据获取...")
         logger.info("─" * 70)
     
-    for category in target_categories:
-        tables = DAILY_TABLES[category]
+    if not dry_run and workers > 1:
+        results = run_parallel_fetch(target_categories, end_date, auto_range, resume, workers)
+        target_categories_serial = []
+    else:
+        target_categories_serial = target_categories
+    
+    for category in target_categories_serial:
+        tables = topological_order(DAILY_TABLES[category], TABLE_DEPENDENCIES)
         config_group = API_CONFIG.get(category, {})
         db_path = config_group.get('db_path', '')
         
@@ -523,38 +739,11 @@ def run_daily_fetch(end_date: str, categories: list = None, dry_run: bool = Fals
         
         # 正式获取：逐表处理
         for table_name in tables:
-            table_config = config_group.get('tables', {}).get(table_name, {})
-            date_column = table_config.get('date_column', 'trade_date')
-            lookback = get_lookback_days(table_name)
-            
-            # 获取表的最新日期
-            if auto_range:
-                last_date = get_table_last_date(db_path, table_name, date_column)
-                start_date = calculate_start_date(last_date, lookback, end_date)
-            else:
-                last_date = None
-                start_date = end_date
-            
-            category_result['date_ranges'][table_name] = {
-                'last_date': last_date,
-                'start_date': start_date,
-                'end_date': end_date,
-            }
-            
-            range_info = f"{start_date}~{end_date}" if start_date != end_date else end_date
-            lookback_hint = f" [回溯{lookback}天]" if lookback > 1 else ""
-            logger.info(f"  → {table_name}{lookback_hint}: {range_info} (本地最新: {last_date or '无'})")
+            range_info = resolve_table_range(category, table_name, end_date, auto_range)
+            category_result['date_ranges'][table_name] = range_info
             
             try:
-                stored = fetch_and_store_data(
-                    category=category,
-                    start_date=start_date,
-                    end_date=end_date,
-                    selected_tables=table_name,
-                    batch_size=50,
-                    force_fetch=False,
-                    overwrite=False
-                )
+                stored = fetch_single_table(category, table_name, range_info, resume)
                 
                 category_result['success'].append(table_name)
                 category_result['stored_count'] += stored
@@ -627,6 +816,96 @@ def run_daily_fetch(end_date: str, categories: list = None, dry_run: bool = Fals
     return results
 
 
+def run_fetch_plan(end_date: str, categories: list = None, auto_range: bool = True,
+                   concurrency: int = 1) -> list:
+    """
+    生成执行计划（--plan）：按与正式获取相同的日期范围规则，
+    估算每个表的请求数、页数、行数以及整体耗时，不调用 API。
+    
+    Args:
+        end_date: 目标结束日期 (YYYYMMDD)
+        categories: 要估算的类别列表，None 表示全部
+        auto_range: 是否自动根据表数据确定开始日期
+        concurrency: 估算耗时时采用的并发数
+        
+    Returns:
+        list: 每个表的计划字典
+    """
+    target_categories = validate_categories(categories or list(DAILY_TABLES.keys()))
+    plans = []
+    
+    for category in target_categories:
+        config_group = API_CONFIG.get(category, {})
+        table_ranges = {}
+        
+        for table_name in DAILY_TABLES[category]:
+            range_info = resolve_table_range(category, table_name, end_date, auto_range)
+            table_ranges[table_name] = (range_info['start_date'], end_date)
+        
+        plans.extend(plan_category(category, table_ranges, config_group.get('list_exchange', 'SSE')))
+    
+    logger.info("=" * 70)
+    logger.info(f"  执行计划 (PLAN) - 目标日期: {end_date}")
+    logger.info("=" * 70)
+    print_plan(plans, concurrency=concurrency)
+    return plans
+
+
+def run_post_load_validation(categories: list, end_date: str, days: int = POST_LOAD_VALIDATION_DAYS) -> list:
+    """
+    获取完成后的增量校验（--validate）：只重新统计上次校验后有写入的日期，
+    其余日期使用 validation_state 中保存的结果。
+    
+    Returns:
+        list: 表状态列表
+    """
+    start_date = (datetime.strptime(end_date, '%Y%m%d') - timedelta(days=days)).strftime('%Y%m%d')
+    logger.info(f"\n[校验] 增量校验 {start_date} ~ {end_date}: {', '.join(categories)}")
+    table_status, _, _ = run_validation(categories, start_date, end_date, detailed=False, incremental=True)
+    if table_status:
+        if HAS_TABULATE:
+            print(tabulate(table_status, headers='keys', tablefmt='psql', stralign='right'))
+        else:
+            for status in table_status:
+                print(status)
+    return table_status
+
+
+def run_vix_update(end_date: str) -> dict:
+    """
+    期权行情更新后增量计算 VIX：各标的只计算库中最新日期之后的交易日，
+    结果写入期权库的 vix_daily / vix_details（见 src/vix/store.py）。
+    
+    Returns:
+        dict: {标的: 写入日期数}，失败为 -1
+    """
+    from src.vix.store import update_all
+    
+    logger.info(f"\n[VIX] 增量更新 VIX 序列至 {end_date}")
+    results = update_all(end_date)
+    failed = [u for u, n in results.items() if n < 0]
+    logger.info(f"[VIX] 写入 {sum(n for n in results.values() if n > 0)} 个标的日，失败 {len(failed)} 个"
+                + (f": {', '.join(failed)}" if failed else ""))
+    return results
+
+
+def run_aggregate_update(end_date: str) -> dict:
+    """
+    个股 / 板块行情更新后增量物化横截面聚合表（agg_breadth / agg_tdx_sentiment），
+    重算源表行数有变化的日期（含迟到的 stk_limit、缺口修复补入的数据）及最近
+    AGG_REFRESH_DAYS 个交易日（见 src/tushare_duckdb/aggregates.py）。
+    
+    Returns:
+        dict: {表名: 写入交易日数}
+    """
+    from src.tushare_duckdb.aggregates import update_aggregates
+    
+    logger.info(f"\n[AGG] 增量更新横截面聚合表至 {end_date}")
+    results = update_aggregates(end_date)
+    logger.info("[AGG] " + ", ".join(f"{t}: {n} 个交易日" for t, n in results.items()))
+    return results
+
+
 def print_summary(results: dict, target_date: str, dry_run: bool, auto_range: bool = True):
     """打印执行汇总"""
     logger.info("\n" + "=" * 70)
@@ -669,6 +948,10 @@ def main():
   %(prog)s --no-auto-range          # 仅获取最近交易日当天数据
   %(prog)s --categories stock,index # 仅获取股票和指数数据
   %(prog)s --dry-run                # 模拟运行（显示每表日期范围）
+  %(prog)s --plan --concurrency 4   # 估算调用量、行数与耗时
+  %(prog)s --date 20260110 --resume # 可续跑模式（中断后同一命令重跑跳过已完成的日期）
+  %(prog)s --workers 4              # 按数据库文件并行获取
+  %(prog)s --validate               # 获取完成后增量校验
   %(prog)s --list-categories        # 显示所有可用类别
         """
     )
@@ -693,6 +976,50 @@ def main():
         help='模拟运行，只显示将要获取的数据，不实际执行'
     )
     
+    parser.add_argument(
+        '--plan',
+        action='store_true',
+        help='生成执行计划：估算 API 调用数、页数、行数与耗时，不实际执行'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=1,
+        help='估算耗时采用的并发数（配合 --plan 使用，默认 1）'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='断点续传：记录已完成的工作单元，并跳过此前同样以 --resume 运行且中断的任务中已完成的部分'
+    )
+    
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=1,
+        help='并行度：大于 1 时不同数据库文件的表并行获取（每个文件一个写者，共享 API 配额）'
+    )
+    
+    parser.add_argument(
+        '--validate',
+        action='store_true',
+        help=f'获取完成后增量校验最近 {POST_LOAD_VALIDATION_DAYS} 天（只复查上次校验后写入的日期）'
+    )
+    
+    parser.add_argument(
+        '--skip-vix',
+        action='store_true',
+        help='期权行情更新后不增量计算 VIX（默认计算并写入 vix_daily）'
+    )
+    
+    parser.add_argument(
+        '--skip-agg',
+        action='store_true',
+        help='行情更新后不增量物化横截面聚合表（默认更新 agg_breadth / agg_tdx_sentiment）'
+    )
+    
     parser.add_argument(
         '--list-categories',
         action='store_true',
@@ -739,8 +1066,31 @@ def main():
     categories = args.categories.split(',') if args.categories else None
     auto_range = not args.no_auto_range
     
+    # 仅生成执行计划
+    if args.plan:
+        run_fetch_plan(target_date, categories, auto_range, args.concurrency)
+        return
+    
     # 执行获取
-    results = run_daily_fetch(target_date, categories, args.dry_run, auto_range)
+    results = run_daily_fetch(target_date, categories, args.dry_run, auto_range,
+                              resume=args.resume, workers=args.workers)
+    
+    if args.validate and not args.dry_run and results:
+        run_post_load_validation(list(results), target_date)
+    
+    option_result = results.get('option', {})
+    if not args.dry_run and not args.skip_vix and 'opt_daily' in option_result.get('success', []):
+        try:
+            run_vix_update(target_date)
+        except Exception as e:
+            logger.error(f"[VIX] 增量更新失败: {e}")
+    
+    agg_sources = set(results.get('stock', {}).get('success', [])) | set(results.get('index', {}).get('success', []))
+    if not args.dry_run and not args.skip_agg and agg_sources & {'daily', 'stk_limit', 'tdx_daily'}:
+        try:
+            run_aggregate_update(target_date)
+        except Exception as e:
+            logger.error(f"[AGG] 增量更新失败: {e}")
     
     # 返回状态码
     total_failed = sum(len(r.get('failed', [])) for r in results.values())
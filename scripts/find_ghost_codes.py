@@ -1,34 +1,21 @@
 
 import sys
 sys.path.insert(0, '.')
-from src.tushare_duckdb.config import API_CONFIG
-from src.tushare_duckdb.utils import get_connection
-
-stock_db = API_CONFIG.get('stock', {}).get('db_path', '')
+from src.tushare_duckdb.consistency import load_rules, fetch_violations
 
 def find_ghost_codes():
     print("正在查找幽灵代码 (存在于数据表但不在 stock_basic)...")
     
-    with get_connection(stock_db, read_only=True) as conn:
-        # 1. 基准: stock_basic
-        basic_codes = set(r[0] for r in conn.execute("SELECT DISTINCT ts_code FROM stock_basic").fetchall())
-        print(f"Stock Basic Count: {len(basic_codes)}")
-        
-        # 2. 数据表
-        tables = ['daily', 'daily_basic', 'bak_daily', 'bak_basic']
-        ghost_map = {}
-        
-        for table in tables:
-            print(f"Scanning {table}...")
-            try:
-                codes = set(r[0] for r in conn.execute(f"SELECT DISTINCT ts_code FROM {table}").fetchall())
-                ghosts = codes - basic_codes
-                for g in ghosts:
-                    if g not in ghost_map:
-                        ghost_map[g] = []
-                    ghost_map[g].append(table)
-            except Exception as e:
-                print(f"Error scanning {table}: {e}")
+    # 1. 规则: consistency_rules.yaml 中带 ghost 标签的规则（daily / daily_basic / bak_daily / bak_basic → stock_basic）
+    rules = load_rules(tags=['ghost'])
+    tables = {r['name']: r['table'] for r in rules}
+    print(f"Scanning {', '.join(tables.values())}...")
+    
+    # 2. 所有规则编译为一条查询，stock_basic 只扫描一次
+    violations = fetch_violations(rules)
+    ghost_map = {}
+    for rule, code in zip(violations['rule'], violations.get('ts_code', [])):
+        ghost_map.setdefault(code, []).append(tables[rule])
 
     import pandas as pd
     
@@ -43,7 +30,7 @@ def find_ghost_codes():
         return
 
     data = []
-    for code, sources in ghost_map.items():
+    for code, sources in sorted(ghost_map.items()):
         data.append({'ts_code': code, 'sources': ", ".join(sources)})
     
     df = pd.DataFrame(data)
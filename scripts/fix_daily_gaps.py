@@ -3,34 +3,34 @@
 股票行情数据缺口修复脚本
 
 策略：
-1. 优先：从 Tushare API 重新获取缺失日期的数据
-2. 回退：若 API 无法获取，从 bak_daily 复制
+1. 优先：从 Tushare API 重新获取缺失日期的数据（按日并发获取，批量写入，见 repair.py）
+2. 回退：若 API 无法获取，从 bak_daily 复制（一条 INSERT ... SELECT 反连接）
 
 使用方法：
     python -m scripts.fix_daily_gaps --export           # 导出缺失清单
     python -m scripts.fix_daily_gaps --mode api         # 从API获取
     python -m scripts.fix_daily_gaps --mode bak         # 从bak_daily补充
     python -m scripts.fix_daily_gaps --mode api --dates 20250901,20250902  # 指定日期
+    python -m scripts.fix_daily_gaps --mode api --workers 8   # 8 线程并发获取（总频率仍受配额限制）
+
+补入数据后增量重算横截面聚合表 agg_*（见 src/tushare_duckdb/aggregates.py），--skip-agg 跳过。
 """
 
 import argparse
 import sys
-import time
 from datetime import datetime
 from pathlib import Path
 
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.tushare_duckdb.config import API_CONFIG, TUSHARE_TOKEN
+from src.tushare_duckdb.config import API_CONFIG, API_FETCH_WORKERS
 from src.tushare_duckdb.utils import get_connection
+from src.tushare_duckdb.metadata import update_metadata
+from src.tushare_duckdb.repair import date_requests, repair_table
+from src.tushare_duckdb.aggregates import update_aggregates
 from src.tushare_duckdb.logger import logger
 
-import tushare as ts
-
-# 初始化 Tushare
-pro = ts.pro_api(TUSHARE_TOKEN)
-
 def get_db_path():
     """获取股票数据库路径"""
     return API_CONFIG.get('stock', {}).get('db_path', '')
@@ -83,78 +83,30 @@ def export_gaps(output_file: str = None) -> dict:
     return result
 
 
-def fetch_from_api(dates: list, dry_run: bool = False) -> dict:
+def fetch_from_api(dates: list, dry_run: bool = False, workers: int = API_FETCH_WORKERS) -> dict:
     """
     从 Tushare API 获取指定日期的数据并插入 daily 表
     
+    按日并发获取，每批合并后一次写入（只插入 daily 中不存在的记录）。
+    
     Args:
         dates: 要获取的日期列表
         dry_run: 是否仅模拟
+        workers: 并发获取线程数
     
     Returns:
         统计结果
     """
     stock_db = get_db_path()
-    stats = {'fetched': 0, 'inserted': 0, 'skipped': 0, 'errors': []}
     
     logger.info(f"开始从 API 获取 {len(dates)} 个交易日的数据")
     
-    for i, trade_date in enumerate(dates):
-        try:
-            logger.info(f"[{i+1}/{len(dates)}] 获取 {trade_date}...")
-            
-            if dry_run:
-                logger.info(f"  [DRY-RUN] 跳过实际获取")
-                continue
-            
-            # 调用 API
-            df = pro.daily(trade_date=trade_date)
-            time.sleep(0.15)  # 防止频率限制
-            
-            if df is None or len(df) == 0:
-                logger.warning(f"  API 返回空数据")
-                stats['skipped'] += 1
-                continue
-            
-            stats['fetched'] += len(df)
-            
-            # 插入数据库（使用 INSERT OR IGNORE 避免重复）
-            with get_connection(stock_db) as conn:
-                # 先检查已存在的记录
-                existing = conn.execute(f"""
-                    SELECT ts_code FROM daily WHERE trade_date = '{trade_date}'
-                """).fetchall()
-                existing_codes = {r[0] for r in existing}
-                
-                # 过滤出需要插入的
-                new_df = df[~df['ts_code'].isin(existing_codes)]
-                
-                if len(new_df) > 0:
-                    # 插入新数据
-                    conn.execute("BEGIN TRANSACTION")
-                    for _, row in new_df.iterrows():
-                        conn.execute("""
-                            INSERT INTO daily (ts_code, trade_date, open, high, low, close, 
-                                             pre_close, change, pct_chg, vol, amount)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                        """, [
-                            row['ts_code'], row['trade_date'], 
-                            row.get('open'), row.get('high'), row.get('low'), row.get('close'),
-                            row.get('pre_close'), row.get('change'), row.get('pct_chg'), 
-                            row.get('vol'), row.get('amount')
-                        ])
-                    conn.execute("COMMIT")
-                    stats['inserted'] += len(new_df)
-                    logger.info(f"  插入 {len(new_df)} 条新记录")
-                else:
-                    logger.info(f"  无新数据需要插入")
-                    
-        except Exception as e:
-            logger.error(f"  错误: {e}")
-            stats['errors'].append((trade_date, str(e)))
-            time.sleep(1)  # 出错后等待
+    if dry_run:
+        logger.info(f"  [DRY-RUN] 跳过实际获取: {', '.join(dates[:10])}{' ...' if len(dates) > 10 else ''}")
+        return {'fetched': 0, 'inserted': 0, 'skipped': 0, 'errors': []}
     
-    return stats
+    with get_connection(stock_db) as conn:
+        return repair_table(conn, 'daily', date_requests('daily', dates), workers=workers)
 
 
 def supplement_from_bak(dry_run: bool = False) -> dict:
@@ -166,36 +118,34 @@ def supplement_from_bak(dry_run: bool = False) -> dict:
     """
     stock_db = get_db_path()
     stats = {'inserted': 0}
+    missing_rows = """
+        FROM bak_daily b
+        WHERE NOT EXISTS (
+            SELECT 1 FROM daily d WHERE d.ts_code = b.ts_code AND d.trade_date = b.trade_date
+        )
+    """
     
     logger.info("从 bak_daily 补充缺失数据...")
     
     if dry_run:
         with get_connection(stock_db, read_only=True) as conn:
-            count = conn.execute("""
-                SELECT COUNT(*)
-                FROM bak_daily b
-                LEFT JOIN daily d ON b.ts_code = d.ts_code AND b.trade_date = d.trade_date
-                WHERE d.ts_code IS NULL
-            """).fetchone()[0]
+            count = conn.execute(f"SELECT COUNT(*) {missing_rows}").fetchone()[0]
         logger.info(f"[DRY-RUN] 将插入 {count} 条记录")
         stats['inserted'] = count
         return stats
     
     with get_connection(stock_db) as conn:
-        # 执行插入
-        result = conn.execute("""
+        # 执行插入（INSERT 返回插入行数）
+        inserted = conn.execute(f"""
             INSERT INTO daily (ts_code, trade_date, open, high, low, close, 
                              pre_close, change, pct_chg, vol, amount)
             SELECT b.ts_code, b.trade_date, b.open, b.high, b.low, b.close, 
                    b.pre_close, b.change, b.pct_chg, b.vol, b.amount
-            FROM bak_daily b
-            LEFT JOIN daily d ON b.ts_code = d.ts_code AND b.trade_date = d.trade_date
-            WHERE d.ts_code IS NULL
-        """)
-        
-        # 获取插入数量
-        inserted = conn.execute("SELECT changes()").fetchone()[0]
+            {missing_rows}
+        """).fetchone()[0]
         stats['inserted'] = inserted
+        if inserted:
+            update_metadata(conn, 'daily', 'trade_date')
         logger.info(f"成功插入 {inserted} 条记录")
     
     return stats
@@ -208,8 +158,12 @@ def main():
                        help='补充模式: api=从API获取, bak=从bak_daily补充')
     parser.add_argument('--dates', type=str, help='指定日期（逗号分隔）')
     parser.add_argument('--dry-run', action='store_true', help='仅模拟，不实际修改')
+    parser.add_argument('--workers', '-w', type=int, default=API_FETCH_WORKERS,
+                       help=f'API 并发获取线程数（默认 {API_FETCH_WORKERS}，总频率受配额限制）')
     parser.add_argument('--output', '-o', type=str, default='./tmp/daily_gaps.txt',
                        help='导出文件路径')
+    parser.add_argument('--skip-agg', action='store_true',
+                       help='补入数据后不重算横截面聚合表 agg_*')
     args = parser.parse_args()
     
     stock_db = get_db_path()
@@ -227,6 +181,7 @@ def main():
         print(f"\n清单已导出到: {args.output}")
         return
     
+    inserted = 0
     if args.mode == 'api':
         # 从 API 获取
         if args.dates:
@@ -235,26 +190,28 @@ def main():
             gaps = export_gaps()
             dates = gaps['dates']
         
-        stats = fetch_from_api(dates, args.dry_run)
+        stats = fetch_from_api(dates, args.dry_run, args.workers)
         print(f"\nAPI 获取结果:")
         print(f"  获取记录: {stats['fetched']}")
         print(f"  插入记录: {stats['inserted']}")
         print(f"  跳过日期: {stats['skipped']}")
         if stats['errors']:
             print(f"  错误数: {len(stats['errors'])}")
+        inserted = stats['inserted']
             
     elif args.mode == 'bak':
         # 从 bak_daily 补充
         stats = supplement_from_bak(args.dry_run)
         print(f"\nbak_daily 补充结果:")
         print(f"  插入记录: {stats['inserted']}")
+        inserted = stats['inserted']
         
     elif args.mode == 'both':
         # 先 API，再 bak
         gaps = export_gaps()
         
         print("步骤1: 从 API 获取...")
-        api_stats = fetch_from_api(gaps['dates'], args.dry_run)
+        api_stats = fetch_from_api(gaps['dates'], args.dry_run, args.workers)
         
         print("\n步骤2: 从 bak_daily 补充剩余...")
         bak_stats = supplement_from_bak(args.dry_run)
@@ -262,8 +219,15 @@ def main():
         print(f"\n总结:")
         print(f"  API 插入: {api_stats['inserted']}")
         print(f"  BAK 补充: {bak_stats['inserted']}")
+        inserted = api_stats['inserted'] + bak_stats['inserted']
     else:
         parser.print_help()
+        return
+    
+    if inserted > 0 and not args.dry_run and not args.skip_agg:
+        # agg_coverage 中这些日期的 daily 行数已变化，update_aggregates 会从最早的补入日期重算
+        results = update_aggregates()
+        print("\n聚合表重算: " + ", ".join(f"{t}: {n} 个交易日" for t, n in results.items()))
 
 
 if __name__ == '__main__':
@@ -7,6 +7,7 @@
 #   ./run_daily.sh                      # 获取最近交易日的所有日频数据
 #   ./run_daily.sh --date 20260110      # 获取指定日期
 #   ./run_daily.sh --dry-run            # 模拟运行
+#   ./run_daily.sh --workers 4          # 按数据库文件并行获取
 #   ./run_daily.sh --list-categories    # 显示可用类别
 #
 # 定时任务示例 (crontab -e):
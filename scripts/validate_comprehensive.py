@@ -12,13 +12,15 @@
    - 区分: 正常停牌 / 异常缺口 (可修复/未解释)
 
 修复策略:
-- API First: 发现缺口优先调用 API (daily & suspend_d)
+- API First: 发现缺口优先调用 API (daily & suspend_d)，按日并发获取、批量写入（见 repair.py）
 - Local Backup: API 无数据时，仅报告可用本地 bak 数据修复的缺口
 
 使用方法:
     python -m scripts.validate_comprehensive --scan            # 全量扫描
-    python -m scripts.validate_comprehensive --scan --sample 100 # 抽样扫描
+    python -m scripts.validate_comprehensive --scan --sample 100 # 抽样扫描，估计缺口率与置信区间
+    python -m scripts.validate_comprehensive --scan --sample 300 --sample-method stratified  # 按交易所与上市年份分层抽样
     python -m scripts.validate_comprehensive --fix-api         # API 自动修复
+    python -m scripts.validate_comprehensive --fix-api --workers 8  # 8 线程并发获取
     python -m scripts.validate_comprehensive --report-local    # 报告可本地修复缺口
 """
 
@@ -28,19 +30,25 @@ import time
 import pandas as pd
 from datetime import datetime, timedelta
 from pathlib import Path
-from collections import defaultdict
 
 project_root = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(project_root))
 
-from src.tushare_duckdb.config import API_CONFIG, TUSHARE_TOKEN
+from src.tushare_duckdb.config import API_CONFIG, API_FETCH_WORKERS
 from src.tushare_duckdb.utils import get_connection
+from src.tushare_duckdb.repair import date_requests, target_filter, repair_table
+from src.tushare_duckdb.sampling import SAMPLE_METHODS, create_sample, estimate_proportion, estimate_ratio, format_estimate
 from src.tushare_duckdb.logger import logger
-import tushare as ts
 
-# 初始化 Tushare
-pro = ts.pro_api(TUSHARE_TOKEN)
 TODAY = datetime.now().strftime('%Y%m%d')
+GAP_MATRIX_PATH = './tmp/validation_matrix.csv'
+
+def _arrow_reader(result, batch_size=100_000):
+    """兼容不同 DuckDB 版本的流式 Arrow 读取接口"""
+    if hasattr(result, 'to_arrow_reader'):
+        return result.to_arrow_reader(batch_size)
+    return result.fetch_record_batch(batch_size)
+
 
 def get_db_paths():
     stock_db = API_CONFIG.get('stock', {}).get('db_path', '')
@@ -48,13 +56,14 @@ def get_db_paths():
     return stock_db, events_db
 
 class DataValidator:
-    def __init__(self, sample_size=None):
+    def __init__(self, sample_size=None, sample_method='reservoir', seed=None):
         self.stock_db, self.events_db = get_db_paths()
         self.sample_size = sample_size
+        self.sample_method = sample_method
+        self.seed = seed
         self.report = {
             'universe_count': 0,
-            'gaps_found': 0,
-            'gaps_details': [], # (ts_code, date, type)
+            'gaps_found': 0,    # 明细在 scan_gaps 临时表，并导出到 GAP_MATRIX_PATH
             'recoverable_local': 0,
             'unexplained': 0
         }
@@ -101,13 +110,7 @@ class DataValidator:
         for code, data in universe.items():
             if data['list_date']: # 必须有上市日期才校验
                 uni_list.append({'ts_code': code, **data})
-        
-        # 抽样
-        if self.sample_size:
-            import random
-            uni_list = random.sample(uni_list, min(self.sample_size, len(uni_list)))
-            
-        self.report['universe_count'] = len(uni_list)
+
         return uni_list
 
     def _is_valid_date(self, date_str):
@@ -117,429 +120,280 @@ class DataValidator:
         return True
 
     def scan_gaps(self):
-        """执行全量缺口扫描"""
+        """
+        执行全量缺口扫描。
+
+        整个扫描是一个 DuckDB 作业：股票上市区间 × 交易日历（扣除停牌），
+        与 daily / adj_factor / daily_basic / bak_daily 逐表反连接，
+        缺口分类与 recoverable 标记均在 SQL 中完成，结果物化为临时表 scan_gaps。
+
+        指定 sample_size 时先在 DuckDB 中抽样股票池（蓄水池或按交易所、上市年份分层），
+        只扫描样本，并估计全市场的缺口股票占比与缺口交易日占比。
+        """
         logger.info("开始全量缺口扫描...")
         universe = self._get_universe()
-        
+        if not universe:
+            logger.warning("股票池为空，跳过扫描")
+            return
+
         # 截止日期：昨天 (避免误报今天)
-        CHECK_END = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-        
-        # 获取交易日历 (SSE 为准)
-        with get_connection(self.events_db, read_only=True) as conn:
-            cal = conn.execute(f"SELECT cal_date FROM trade_cal WHERE is_open='1' AND exchange='SSE' AND cal_date<='{CHECK_END}' ORDER BY cal_date").fetchall()
-            trade_days = [r[0] for r in cal]
-            trade_days_set = set(trade_days)
-
-        # 逐个股票检查 (由于全量加载 daily 太大，这里采用循环查询或优化 SQL)
-        # 优化方案：使用 SQL 直接找出缺口，避免 Python 循环
-        # 但需要复杂的 SQL 生成预期序列。
-        # 折中方案：按 500 只股票一批处理
-        
-        batch_size = 500
-        total_batches = (len(universe) + batch_size - 1) // batch_size
-        
-        for i in range(total_batches):
-            batch = universe[i*batch_size : (i+1)*batch_size]
-            logger.info(f"处理批次 {i+1}/{total_batches} ({len(batch)} 只股票)...")
-            self._process_batch(batch, trade_days_set)
-            
-        self._print_scan_summary()
+        check_end = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
+        universe_df = pd.DataFrame(universe, columns=['ts_code', 'list_date', 'delist_date'])
 
-    def _process_batch(self, batch, trade_days_set):
-        codes = [item['ts_code'] for item in batch]
-        codes_str = "'" + "','".join(codes) + "'"
-        
-        # 批量获取各表数据
         with get_connection(self.stock_db, read_only=True) as conn:
-            # 1. daily
-            daily_recs = conn.execute(f"SELECT ts_code, trade_date FROM daily WHERE ts_code IN ({codes_str})").fetchall()
-            daily_map = defaultdict(set)
-            for c, d in daily_recs: daily_map[c].add(d)
-                
-            # 2. adj_factor
-            adj_recs = conn.execute(f"SELECT ts_code, trade_date FROM adj_factor WHERE ts_code IN ({codes_str})").fetchall()
-            adj_map = defaultdict(set)
-            for c, d in adj_recs: adj_map[c].add(d)
-
-            # 3. daily_basic
-            basic_recs = conn.execute(f"SELECT ts_code, trade_date FROM daily_basic WHERE ts_code IN ({codes_str})").fetchall()
-            basic_map = defaultdict(set)
-            for c, d in basic_recs: basic_map[c].add(d)
-
-            # 4. bak_daily
-            bak_recs = conn.execute(f"SELECT ts_code, trade_date FROM bak_daily WHERE ts_code IN ({codes_str})").fetchall()
-            bak_map = defaultdict(set)
-            for c, d in bak_recs: bak_map[c].add(d)
-
-        with get_connection(self.events_db, read_only=True) as conn:
-            # 5. suspend_d
-            susp_recs = conn.execute(f"SELECT ts_code, trade_date FROM suspend_d WHERE ts_code IN ({codes_str})").fetchall()
-            susp_map = defaultdict(set)
-            for c, d in susp_recs: susp_map[c].add(d)
-                
-        # 分析矩阵
-        for item in batch:
-            ts_code = item['ts_code']
-            list_date = item['list_date']
-            delist_date = item['delist_date']
-            
-            if not list_date: continue
-            
-            # 截止日期：昨天
-            CHECK_END = (datetime.now() - timedelta(days=1)).strftime('%Y%m%d')
-            end_date = min(delist_date, CHECK_END) if delist_date else CHECK_END
-            
-            # 理论交易日
-            expected = [d for d in trade_days_set if list_date <= d <= end_date]
-            
-            for date in expected:
-                has_daily = date in daily_map[ts_code]
-                has_adj = date in adj_map[ts_code]
-                has_basic = date in basic_map[ts_code]
-                has_susp = date in susp_map[ts_code]
-                has_bak = date in bak_map[ts_code]
-                
-                # 判定逻辑
-                # 1. 正常: 有daily 且（有adj 或 无需adj? 通常每一天都该有adj）
-                #    这里简化：只要 daily/adj/basic 全有，或者 susp 有，就算正常？
-                #    用户想要看 adj 是否缺失。
-                
-                # 如果停牌，通常其他表都没有（除了 possible daily_basic?）
-                if has_susp:
-                    # 停牌日，不再追究 gap，除非用户想看停牌日是否有 daily_basic?
-                    # 按照之前逻辑，停牌日视为正常
-                    continue
-                
-                is_missing = False
-                issue_types = []
-                
-                if not has_daily:
-                    issue_types.append('missing_daily')
-                    is_missing = True
-                if not has_adj:
-                    issue_types.append('missing_adj')
-                    is_missing = True
-                if not has_basic:
-                    issue_types.append('missing_basic')
-                    is_missing = True
-                    
-                if is_missing:
-                    # 聚合类型
-                    if 'missing_daily' in issue_types and 'missing_adj' in issue_types and 'missing_basic' in issue_types:
-                        main_type = 'total_gap' # 可能是停牌漏录
-                    elif 'missing_daily' in issue_types:
-                        main_type = 'missing_daily_only' # 奇怪，有指标均无行情？
-                    elif 'missing_adj' in issue_types:
-                        main_type = 'missing_adj_only' # 常见
-                    else:
-                        main_type = 'partial_gap'
-                        
-                    self.report['gaps_found'] += 1
-                    if main_type == 'total_gap' and has_bak:
-                        recoverable = True
-                    else:
-                        recoverable = False
-
-                    self.report['gaps_details'].append({
-                        'ts_code': ts_code,
-                        'trade_date': date,
-                        'daily': int(has_daily),
-                        'adj': int(has_adj),
-                        'basic': int(has_basic),
-                        'bak': int(has_bak),
-                        'type': main_type,
-                        'recoverable': int(recoverable)
-                    })
-
-    def _print_scan_summary(self):
+            events = self._attach_events(conn)
+            conn.register('scan_population', universe_df)
+            population = create_sample(
+                conn, 'scan_universe',
+                # 全为空的列（如无退市股时的 delist_date）在 pandas 中无类型，显式转换
+                "SELECT ts_code, list_date, CAST(delist_date AS VARCHAR) AS delist_date FROM scan_population",
+                self.sample_size or 0, self.sample_method,
+                strata=("split_part(ts_code, '.', 2)", "substr(list_date, 1, 4)"), seed=self.seed
+            )
+            self.report['universe_count'] = conn.execute("SELECT COUNT(*) FROM scan_universe").fetchone()[0]
+
+            start = time.time()
+            # 交易日历 (SSE 为准)，idx 用于按交易日判断缺口是否连续
+            conn.execute(f"""
+                CREATE TEMP TABLE scan_cal AS
+                SELECT cal_date AS trade_date, row_number() OVER (ORDER BY cal_date) AS idx
+                FROM {events}trade_cal
+                WHERE is_open = '1' AND exchange = 'SSE' AND cal_date <= '{check_end}'
+            """)
+            conn.execute(f"CREATE TEMP TABLE scan_gaps AS {self._gap_scan_sql(check_end, events)}")
+            logger.info(f"缺口扫描完成 ({self.report['universe_count']} 只股票)，耗时 {time.time() - start:.1f}s")
+
+            self._print_scan_summary(conn)
+            if self.sample_size:
+                self._print_sample_estimate(conn, population, check_end, events)
+
+    def _attach_events(self, conn):
+        """events 库与 stock 库不是同一文件时以只读方式 ATTACH，返回表名前缀"""
+        if not self.events_db or Path(self.events_db).resolve() == Path(self.stock_db).resolve():
+            return ''
+        conn.execute(f"ATTACH '{self.events_db}' AS events (READ_ONLY)")
+        return 'events.'
+
+    def _expected_sql(self, check_end, events=''):
+        """期望交易日：股票池上市区间内的交易日，停牌日视为正常"""
+        return f"""
+            SELECT u.ts_code, c.trade_date
+            FROM scan_universe u
+            JOIN scan_cal c
+              ON c.trade_date >= u.list_date
+             AND c.trade_date <= COALESCE(LEAST(u.delist_date, '{check_end}'), '{check_end}')
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {events}suspend_d s
+                WHERE s.ts_code = u.ts_code AND s.trade_date = c.trade_date
+            )
+        """
+
+    def _gap_scan_sql(self, check_end, events=''):
+        """期望交易日（上市区间内、非停牌）中 daily/adj/basic 任一缺失的记录"""
+        def present(table):
+            # 只取股票池内代码的去重 (ts_code, trade_date)，作为左连接的存在性标记
+            return f"""(SELECT DISTINCT ts_code, trade_date FROM {table}
+                        WHERE ts_code IN (SELECT ts_code FROM scan_universe))"""
+
+        return f"""
+            WITH expected AS ({self._expected_sql(check_end, events)}),
+            flags AS (
+                SELECT e.ts_code, e.trade_date,
+                       d.ts_code IS NOT NULL AS has_daily,
+                       a.ts_code IS NOT NULL AS has_adj,
+                       b.ts_code IS NOT NULL AS has_basic,
+                       k.ts_code IS NOT NULL AS has_bak
+                FROM expected e
+                LEFT JOIN {present('daily')} d ON d.ts_code = e.ts_code AND d.trade_date = e.trade_date
+                LEFT JOIN {present('adj_factor')} a ON a.ts_code = e.ts_code AND a.trade_date = e.trade_date
+                LEFT JOIN {present('daily_basic')} b ON b.ts_code = e.ts_code AND b.trade_date = e.trade_date
+                LEFT JOIN {present('bak_daily')} k ON k.ts_code = e.ts_code AND k.trade_date = e.trade_date
+            )
+            SELECT ts_code, trade_date,
+                   has_daily::INT AS daily, has_adj::INT AS adj, has_basic::INT AS basic, has_bak::INT AS bak,
+                   CASE
+                       WHEN NOT has_daily AND NOT has_adj AND NOT has_basic THEN 'total_gap'   -- 可能是停牌漏录
+                       WHEN NOT has_daily THEN 'missing_daily_only'                            -- 有指标无行情
+                       WHEN NOT has_adj THEN 'missing_adj_only'                                -- 常见
+                       ELSE 'partial_gap'
+                   END AS type,
+                   (NOT has_daily AND NOT has_adj AND NOT has_basic AND has_bak)::INT AS recoverable
+            FROM flags
+            WHERE NOT (has_daily AND has_adj AND has_basic)
+        """
+
+    def _print_scan_summary(self, conn):
+        type_counts = conn.execute(
+            "SELECT type, COUNT(*) AS n FROM scan_gaps GROUP BY type ORDER BY n DESC"
+        ).fetchall()
+        self.report['gaps_found'] = sum(n for _, n in type_counts)
+        self.report['recoverable_local'] = conn.execute(
+            "SELECT COALESCE(SUM(recoverable), 0) FROM scan_gaps"
+        ).fetchone()[0]
+
         print("\n" + "="*60)
         print("  校验扫描结果 (Enhanced)")
         print("="*60)
         print(f"  检查股票: {self.report['universe_count']}")
         print(f"  发现异常日: {self.report['gaps_found']}")
-        
-        df = pd.DataFrame(self.report['gaps_details'])
-        if df.empty:
+
+        if not type_counts:
             print("  ✓ 数据完整，无异常。")
             return
 
         # 统计类型
         print("\n  [异常类型统计]")
-        print(df['type'].value_counts().to_string())
+        for issue_type, n in type_counts:
+            print(f"  {issue_type:<20} {n}")
+        print(f"  可用 bak_daily 本地修复: {self.report['recoverable_local']}")
 
-        # 导出CSV
-        csv_path = './tmp/validation_matrix.csv'
-        df.to_csv(csv_path, index=False)
-        print(f"\n  矩阵明细已导出至: {csv_path}")
-        
-        # 导出详细文本报告
-        self._generate_range_report(df)
+        # 导出CSV（由 DuckDB 直接写出，不经过 Python）
+        conn.execute(f"COPY (SELECT * FROM scan_gaps ORDER BY ts_code, trade_date) TO '{GAP_MATRIX_PATH}' (HEADER)")
+        print(f"\n  矩阵明细已导出至: {GAP_MATRIX_PATH}")
 
-    def _generate_range_report(self, df):
+        # 导出详细文本报告
+        self._generate_range_report(conn)
+
+    def _print_sample_estimate(self, conn, population, check_end, events=''):
+        """由样本估计全市场缺口率（95% 置信区间）"""
+        units = conn.execute(f"""
+            SELECT u.ts_code, u._stratum,
+                   COALESCE(g.n, 0) > 0 AS has_gap,
+                   COALESCE(g.n, 0) AS gap_days,
+                   COALESCE(e.n, 0) AS expected_days
+            FROM scan_universe u
+            LEFT JOIN (SELECT ts_code, COUNT(*) AS n FROM ({self._expected_sql(check_end, events)}) GROUP BY ts_code) e
+              USING (ts_code)
+            LEFT JOIN (SELECT ts_code, COUNT(*) AS n FROM scan_gaps GROUP BY ts_code) g USING (ts_code)
+        """).df()
+
+        print(f"\n  [抽样估计] 样本 {len(units)} / 股票池 {sum(population.values())} ({self.sample_method})")
+        print(f"  有缺口股票占比: {format_estimate(estimate_proportion(units, population, 'has_gap'))}")
+        print(f"  缺口交易日占比: {format_estimate(estimate_ratio(units, population, 'gap_days', 'expected_days'))}")
+
+    def _generate_range_report(self, conn):
         txt_path = './tmp/validation_detail.txt'
         print(f"  正在生成详细聚合报告: {txt_path} ...")
-        
+
+        # 按交易日连续性聚合缺口区间（gaps-and-islands），按缺失总天数倒序
+        result = conn.execute("""
+            WITH g AS (
+                SELECT s.ts_code, s.type, s.trade_date,
+                       c.idx - row_number() OVER (PARTITION BY s.ts_code, s.type ORDER BY s.trade_date) AS island
+                FROM scan_gaps s JOIN scan_cal c USING (trade_date)
+            ),
+            ranges AS (
+                SELECT ts_code, type, MIN(trade_date) AS range_start, MAX(trade_date) AS range_end
+                FROM g GROUP BY ts_code, type, island
+            ),
+            totals AS (SELECT ts_code, COUNT(*) AS total FROM scan_gaps GROUP BY ts_code)
+            SELECT r.ts_code, t.total, r.type, r.range_start, r.range_end
+            FROM ranges r JOIN totals t USING (ts_code)
+            ORDER BY t.total DESC, r.ts_code, r.type, r.range_start
+        """)
+
         with open(txt_path, 'w', encoding='utf-8') as f:
             f.write("股票数据缺失详情报告 (聚合版)\n")
             f.write(f"生成时间: {datetime.now()}\n")
             f.write("="*80 + "\n\n")
-            
-            # 按股票分组
-            gb = df.groupby('ts_code')
-            # 排序：按缺失总天数倒序
-            sorted_groups = sorted(gb, key=lambda x: len(x[1]), reverse=True)
-            
-            for ts_code, group in sorted_groups:
-                f.write(f"[{ts_code}] 共 {len(group)} 天异常\n")
-                
-                # 按类型分组聚合
-                type_gb = group.groupby('type')
-                for issue_type, sub_group in type_gb:
-                    dates = sorted(sub_group['trade_date'].unique())
-                    ranges = self._dates_to_ranges(dates)
-                    range_str = ", ".join(ranges)
-                    f.write(f"  - {issue_type}: {range_str}\n")
+
+            current_code, current_type, ranges = None, None, []
+
+            def flush_type():
+                if current_type is not None:
+                    f.write(f"  - {current_type}: {', '.join(ranges)}\n")
+
+            # 流式读取，按股票逐段写出
+            for batch in _arrow_reader(result):
+                for ts_code, total, issue_type, range_start, range_end in zip(
+                        *(batch.column(i).to_pylist() for i in range(5))):
+                    if ts_code != current_code:
+                        flush_type()
+                        if current_code is not None:
+                            f.write("-" * 40 + "\n")
+                        f.write(f"[{ts_code}] 共 {total} 天异常\n")
+                        current_code, current_type, ranges = ts_code, None, []
+                    if issue_type != current_type:
+                        flush_type()
+                        current_type, ranges = issue_type, []
+                    ranges.append(range_start if range_start == range_end else f"{range_start}~{range_end}")
+            flush_type()
+            if current_code is not None:
                 f.write("-" * 40 + "\n")
-        
+
         print("  详细报告生成完成。")
 
-    def _dates_to_ranges(self, dates):
-        """将日期列表转为范围字符串列表"""
-        if not dates: return []
-        # 假设日期是 str 'YYYYMMDD' 或 int
-        # 先转 int
-        try:
-            dates = sorted([int(d) for d in dates])
-        except:
-            return dates # fallback
-            
-        ranges = []
-        if not dates: return []
-        
-        start = dates[0]
-        prev = dates[0]
-        
-        from datetime import datetime
-        
-        # 辅助：判断是否连续 (需要考虑日历，但这里简单判断数值差距不大或者直接显示区间)
-        # 简单数值判断对于跨月跨年不准，最好用 date obj
-        # 但为了性能，这里简化：如果是连续的 index? 
-        # 不，这里最好只是简单的折叠。如果中间缺几天也分开显示。
-        # 简单逻辑：如果 diff == 1 (同月日增) 或 diff < 100 (同月跨周?) 
-        # 严格连续比较麻烦，需要日历。
-        # 这里采用简化策略：只要是列表里连续的，就合并？
-        # 不，列表本身就是缺失的日期。
-        # 还是采用简单的数值连续判断吧，虽然跨月会断开，但也足够了。
-        
-        for d in dates[1:]:
-            # 简单的 +1 判断无法处理换月 (20200131 -> 20200201)
-            # 所以这里只合并真正的连续整数，或者我们容忍跨月断开
-            if d == prev + 1:
-                prev = d
-            else:
-                # 尝试用 datetime 判断是否只隔了几天（比如周末）
-                # 这里不引入复杂日历，简单断开
-                if start == prev:
-                    ranges.append(str(start))
-                else:
-                    ranges.append(f"{start}~{prev}")
-                start = d
-                prev = d
-                
-        if start == prev:
-            ranges.append(str(start))
-        else:
-            ranges.append(f"{start}~{prev}")
-            
-        return ranges
+    def fix_with_api(self, workers=API_FETCH_WORKERS):
+        """
+        执行 API 修复（基于 --scan 导出的缺口矩阵）。
 
-    def fix_with_api(self):
-        """执行 API 修复"""
-        # 读取扫描结果
+        pro.daily(trade_date=...) / pro.suspend_d(trade_date=...) 返回当日全市场数据，
+        因此按日期并发获取，只写入矩阵中列出的 (ts_code, trade_date)。
+        """
         try:
-            df = pd.read_csv('./tmp/validation_gaps.csv')
+            gaps = pd.read_csv(GAP_MATRIX_PATH, dtype={'ts_code': str, 'trade_date': str})
         except FileNotFoundError:
             logger.error("未找到扫描结果，请先运行 --scan")
             return
-            
-        logger.info(f"开始 API 修复，共 {len(df)} 个缺口任务")
-        
-        # 按日期分组，批量处理（减少API调用次数）
-        # 但 suspend_d 需要按日期获取，daily 也是
-        # 注意: pro.daily(trade_date=...) 返回当日所有股票
-        # 注意: pro.suspend_d(suspend_date=...) 返回当日所有停牌
-        
-        dates = df['trade_date'].unique()
-        dates.sort()
-        
-        for i, date in enumerate(dates):
-            logger.info(f"处理日期 {date} ({i+1}/{len(dates)})...")
-            str_date = str(date)
-            
-            # 该日期的目标股票
-            target_codes = set(df[df['trade_date'] == date]['ts_code'])
-            
-            try:
-                # 1. 获取行情
-                daily_df = pro.daily(trade_date=str_date)
-                if daily_df is not None and not daily_df.empty:
-                    # 筛选出我们缺的股票
-                    to_insert_daily = daily_df[daily_df['ts_code'].isin(target_codes)]
-                    if not to_insert_daily.empty:
-                        self._insert_daily(to_insert_daily)
-                        logger.info(f"  [Daily] 修复 {len(to_insert_daily)} 条")
-                
-                time.sleep(0.3) 
-                
-                # 2. 获取停牌
-                susp_df = pro.suspend_d(suspend_date=str_date)
-                if susp_df is not None and not susp_df.empty:
-                    to_insert_susp = susp_df[susp_df['ts_code'].isin(target_codes)]
-                    if not to_insert_susp.empty:
-                        self._insert_suspend(to_insert_susp)
-                        logger.info(f"  [Suspend] 修复 {len(to_insert_susp)} 条")
-                
-                time.sleep(0.3)
-                
-            except Exception as e:
-                logger.error(f"  处理日期 {date} 出错: {e}")
-                time.sleep(2)
-
-    def _insert_daily(self, df):
-        with get_connection(self.stock_db) as conn:
-            # 1. 查出已存在的 (ts_code, trade_date)
-            dates = df['trade_date'].unique().tolist()
-            if not dates: return
-            
-            # 构建查询条件
-            dates_str = "'" + "','".join([str(d) for d in dates]) + "'"
-            codes_str = "'" + "','".join(df['ts_code'].unique().tolist()) + "'"
-            
-            existing = conn.execute(f"""
-                SELECT ts_code, trade_date 
-                FROM daily 
-                WHERE trade_date IN ({dates_str}) AND ts_code IN ({codes_str})
-            """).fetchall()
-            existing_set = {(r[0], r[1]) for r in existing}
-            
-            # 2. 过滤
-            to_insert = []
-            for _, row in df.iterrows():
-                key = (row['ts_code'], row['trade_date'])
-                if key not in existing_set:
-                    to_insert.append([
-                        row['ts_code'], row['trade_date'], 
-                        row.get('open'), row.get('high'), row.get('low'), row.get('close'),
-                        row.get('pre_close'), row.get('change'), row.get('pct_chg'), 
-                        row.get('vol'), row.get('amount')
-                    ])
-            
-            if not to_insert: return
-
-            # 3. 批量插入
-            conn.execute("BEGIN")
-            for row in to_insert:
-                conn.execute("""
-                    INSERT INTO daily (ts_code, trade_date, open, high, low, close, 
-                                     pre_close, change, pct_chg, vol, amount)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, row)
-            conn.execute("COMMIT")
-
-    def _insert_suspend(self, df):
+
+        logger.info(f"开始 API 修复，共 {len(gaps)} 个缺口任务，{gaps['trade_date'].nunique()} 个交易日")
+
+        # 1. 行情：只请求缺 daily 的日期
+        daily_gaps = gaps[gaps['daily'] == 0]
+        if not daily_gaps.empty:
+            daily_dates = sorted(daily_gaps['trade_date'].unique())
+            with get_connection(self.stock_db) as conn:
+                stats = repair_table(conn, 'daily', date_requests('daily', daily_dates),
+                                     select=target_filter(daily_gaps), workers=workers)
+            logger.info(f"  [Daily] 修复 {stats['inserted']} 条，失败 {len(stats['errors'])} 个日期")
+
+        # 2. 停牌：缺口可能是停牌漏录
+        suspend_dates = sorted(gaps['trade_date'].unique())
         with get_connection(self.events_db) as conn:
-            # 1. 查出已存在的
-            dates = df['trade_date'].unique().tolist()
-            if not dates: return
-            
-            dates_str = "'" + "','".join([str(d) for d in dates]) + "'"
-            codes_str = "'" + "','".join(df['ts_code'].unique().tolist()) + "'"
-            
-            existing = conn.execute(f"""
-                SELECT ts_code, trade_date 
-                FROM suspend_d 
-                WHERE trade_date IN ({dates_str}) AND ts_code IN ({codes_str})
-            """).fetchall()
-            existing_set = {(r[0], r[1]) for r in existing}
-            
-            # 2. 过滤
-            to_insert = []
-            for _, row in df.iterrows():
-                key = (row['ts_code'], row['trade_date'])
-                if key not in existing_set:
-                    to_insert.append([
-                        row['ts_code'], row['trade_date'], 
-                        row.get('suspend_timing'), row.get('suspend_type')
-                    ])
-            
-            if not to_insert: return
-
-            # 3. 批量插入
-            conn.execute("BEGIN")
-            for row in to_insert:
-                conn.execute("""
-                    INSERT INTO suspend_d (ts_code, trade_date, suspend_timing, suspend_type)
-                    VALUES (?, ?, ?, ?)
-                """, row)
-            conn.execute("COMMIT")
-
-    def fix_suspend_by_range(self, start_year=1990, end_year=None):
-        """按年份批量修复停牌数据"""
+            stats = repair_table(conn, 'suspend_d', date_requests('suspend_d', suspend_dates),
+                                 select=target_filter(gaps), workers=workers)
+        logger.info(f"  [Suspend] 修复 {stats['inserted']} 条，失败 {len(stats['errors'])} 个日期")
+
+    def fix_suspend_by_range(self, start_year=1990, end_year=None, workers=API_FETCH_WORKERS):
+        """按年份批量修复停牌数据（各年份并发获取，接口分页由 fetcher 处理）"""
         if end_year is None:
             end_year = datetime.now().year
             
         logger.info(f"开始批量修复停牌数据: {start_year} - {end_year}")
         
-        for year in range(start_year, end_year + 1):
-            start_date = f"{year}0101"
-            end_date = f"{year}1231"
-            
-            logger.info(f"获取停牌数据: {start_date} ~ {end_date} ...")
-            try:
-                # 批量获取全市场停牌数据
-                # Tushare suspend_d 接口分页限制通常是 5000 或 8000
-                # 需要分页获取
-                offset = 0
-                limit = 5000
-                while True:
-                    df = pro.suspend_d(start_date=start_date, end_date=end_date, limit=limit, offset=offset)
-                    if df is None or df.empty:
-                        break
-                        
-                    self._insert_suspend(df)
-                    count = len(df)
-                    logger.info(f"  - 插入/更新 {count} 条 (Offset {offset})")
-                    
-                    if count < limit:
-                        break
-                    offset += limit
-                    time.sleep(0.5)
-                    
-            except Exception as e:
-                logger.error(f"处理年份 {year} 失败: {e}")
-                time.sleep(2)
+        requests = [(str(year), {'start_date': f"{year}0101", 'end_date': f"{year}1231"})
+                    for year in range(start_year, end_year + 1)]
+        with get_connection(self.events_db) as conn:
+            stats = repair_table(conn, 'suspend_d', requests, batch_size=5, workers=workers)
         
+        for year, reason in stats['errors']:
+            logger.error(f"处理年份 {year} 失败: {reason}")
         logger.info("批量修复完成。")
 
 def main():
     parser = argparse.ArgumentParser(description='股票数据全量校验与修复 (V2)')
     parser.add_argument('--scan', action='store_true', help='执行全量缺口扫描')
     parser.add_argument('--sample', type=int, help='扫描抽样股票数')
+    parser.add_argument('--sample-method', choices=SAMPLE_METHODS, default='reservoir',
+                        help='抽样方法：reservoir 蓄水池 / stratified 按交易所与上市年份分层')
+    parser.add_argument('--seed', type=int, default=None, help='抽样随机种子（结果可复现）')
     parser.add_argument('--fix-api', action='store_true', help='执行 API 修复 (针对 residual gaps)')
     parser.add_argument('--fix-suspend-range', action='store_true', help='按年份批量修复停牌数据 (推荐优先运行)')
     parser.add_argument('--report-local', action='store_true', help='报告可本地修复缺口')
     parser.add_argument('--start-year', type=int, default=1990, help='批量修复起始年份')
+    parser.add_argument('--workers', '-w', type=int, default=API_FETCH_WORKERS,
+                        help=f'API 并发获取线程数（默认 {API_FETCH_WORKERS}，总频率受配额限制）')
     
     args = parser.parse_args()
     
-    validator = DataValidator(sample_size=args.sample)
+    validator = DataValidator(sample_size=args.sample, sample_method=args.sample_method, seed=args.seed)
     
     if args.scan:
         validator.scan_gaps()
     elif args.fix_suspend_range:
-        validator.fix_suspend_by_range(start_year=args.start_year)
+        validator.fix_suspend_by_range(start_year=args.start_year, workers=args.workers)
     elif args.fix_api:
-        validator.fix_with_api()
+        validator.fix_with_api(workers=args.workers)
     elif args.report_local:
         validator.report_local_recoverable()
     else:
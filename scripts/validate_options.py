@@ -3,18 +3,22 @@
 期权数据验证脚本
 
 交叉验证 opt_basic 和 opt_daily 表，检查：
-1. 缺失合约：opt_daily 中有但 opt_basic 中没有的 ts_code
+1. 表间一致性：consistency_rules.yaml 中带 option 标签的规则
+   （缺失合约：opt_daily 中有但 opt_basic 中没有的 ts_code；孤立数据：在合约生命周期外的行情）
 2. 数据完整性：每个合约的日期覆盖情况
-3. 孤立数据：在合约生命周期外的数据
+3. 按交易所统计
 
 使用方法：
     python -m scripts.validate_options
     python -m scripts.validate_options --exchange SSE
     python -m scripts.validate_options --detail
+    python -m scripts.validate_options --sample 300 --sample-method stratified
+    python -m scripts.validate_options --workers 1    # 顺序执行（默认各项检查并行）
 """
 
 import argparse
 import sys
+import pandas as pd
 from datetime import datetime
 from pathlib import Path
 
@@ -24,6 +28,13 @@ sys.path.insert(0, str(project_root))
 
 from src.tushare_duckdb.config import API_CONFIG
 from src.tushare_duckdb.utils import get_connection
+from src.tushare_duckdb.validation_runner import run_checks
+from src.tushare_duckdb.consistency import (
+    load_rules, rule_tasks, collect_results, print_rule_report, fetch_violations
+)
+from src.tushare_duckdb.sampling import (
+    SAMPLE_METHODS, create_sample, estimate_proportion, estimate_ratio, format_estimate
+)
 from src.tushare_duckdb.logger import logger
 
 # 今天日期（用于完整性检查的截止日期）
@@ -42,128 +53,65 @@ def get_db_paths():
     return opt_db, basic_db
 
 
-def check_missing_contracts(opt_db: str, exchange: str = None) -> dict:
-    """
-    检查 opt_daily 中有但 opt_basic 中没有的合约。
-    
-    Returns:
-        dict: {
-            'total_basic': int,           # opt_basic 合约数
-            'total_daily': int,           # opt_daily 去重合约数
-            'missing_in_basic': list,     # 缺失的 ts_code 列表
-            'extra_in_basic': list,       # basic 中有但 daily 中没数据的
-        }
-    """
-    result = {
-        'total_basic': 0,
-        'total_daily': 0,
-        'missing_in_basic': [],
-        'extra_in_basic': [],
-    }
-    
-    try:
-        with get_connection(opt_db, read_only=True) as conn:
-            # 获取 opt_basic 中的所有合约
-            where_clause = f"WHERE exchange = '{exchange}'" if exchange else ""
-            basic_codes = conn.execute(f"""
-                SELECT DISTINCT ts_code FROM opt_basic {where_clause}
-            """).fetchall()
-            basic_set = {row[0] for row in basic_codes}
-            result['total_basic'] = len(basic_set)
-            
-            # 获取 opt_daily 中的所有合约
-            if exchange:
-                daily_codes = conn.execute(f"""
-                    SELECT DISTINCT ts_code FROM opt_daily WHERE exchange = '{exchange}'
-                """).fetchall()
-            else:
-                daily_codes = conn.execute("""
-                    SELECT DISTINCT ts_code FROM opt_daily
-                """).fetchall()
-            daily_set = {row[0] for row in daily_codes}
-            result['total_daily'] = len(daily_set)
-            
-            # 找出差异
-            result['missing_in_basic'] = sorted(daily_set - basic_set)
-            result['extra_in_basic'] = sorted(basic_set - daily_set)
-            
-            # 获取缺失合约的详细信息
-            if result['missing_in_basic']:
-                missing_details = conn.execute("""
-                    SELECT 
-                        d.ts_code, 
-                        d.exchange,
-                        MIN(d.trade_date) as first_trade,
-                        MAX(d.trade_date) as last_trade,
-                        COUNT(*) as record_count
-                    FROM opt_daily d
-                    LEFT JOIN opt_basic b ON d.ts_code = b.ts_code
-                    WHERE b.ts_code IS NULL
-                    GROUP BY d.ts_code, d.exchange
-                    ORDER BY first_trade, d.ts_code
-                """).fetchall()
-                result['missing_details'] = [
-                    {'ts_code': r[0], 'exchange': r[1], 'first_trade': r[2], 
-                     'last_trade': r[3], 'record_count': r[4]}
-                    for r in missing_details
-                ]
-            
-    except Exception as e:
-        logger.error(f"检查缺失合约时出错: {e}")
-        
-    return result
-
-
 def check_data_completeness(opt_db: str, basic_db: str, exchange: str = None,
-                           sample_size: int = 100) -> dict:
+                           sample_size: int = 100, method: str = 'reservoir', seed: int = None) -> dict:
     """
     检查每个合约的数据完整性。
     
     对比每个合约的 list_date ~ delist_date 与实际行情日期：
     - 找出有数据缺口的合约
     - 统计缺口天数
+    - 抽样时由样本估计全部合约的不完整占比与缺失交易日占比（95% 置信区间）
     
     Args:
         sample_size: 抽样检查的合约数（0表示全部）
+        method: 'reservoir' 蓄水池抽样 / 'stratified' 按交易所与上市年份分层抽样
+        seed: 随机种子（指定时结果可复现）
         
     Returns:
         dict: {
             'checked_count': int,
             'complete_count': int,
             'incomplete_contracts': list of dict,
+            'population': int,
+            'gap_rate' / 'missing_rate': (估计值, 下限, 上限) 或 None,
         }
     """
     result = {
         'checked_count': 0,
         'complete_count': 0,
         'incomplete_contracts': [],
+        'population': 0,
+        'method': method,
+        'gap_rate': None,
+        'missing_rate': None,
     }
     
     try:
         with get_connection(opt_db, read_only=True) as opt_conn:
-            # 获取需要检查的合约（有行情数据且已退市的）
-            where_clause = f"WHERE b.exchange = '{exchange}'" if exchange else ""
+            # 总体：有行情数据的合约；抽样在 DuckDB 中完成，只聚合样本合约的行情
+            population = create_sample(opt_conn, 'completeness_sample', f"""
+                SELECT b.ts_code, b.list_date, b.delist_date, b.exchange
+                FROM opt_basic b
+                WHERE EXISTS (SELECT 1 FROM opt_daily d WHERE d.ts_code = b.ts_code)
+                {"AND b.exchange = ?" if exchange else ""}
+            """, sample_size, method, strata=('exchange', 'substr(list_date, 1, 4)'), seed=seed,
+                params=[exchange] if exchange else None)
             
-            query = f"""
+            contracts = opt_conn.execute("""
                 SELECT 
-                    b.ts_code, 
-                    b.list_date, 
-                    b.delist_date,
-                    b.exchange,
-                    MIN(d.trade_date) as first_trade,
-                    MAX(d.trade_date) as last_trade,
+                    s.ts_code, 
+                    s.list_date, 
+                    s.delist_date,
+                    s.exchange,
+                    s._stratum,
                     COUNT(DISTINCT d.trade_date) as trade_days
-                FROM opt_basic b
-                INNER JOIN opt_daily d ON b.ts_code = d.ts_code
-                {where_clause}
-                GROUP BY b.ts_code, b.list_date, b.delist_date, b.exchange
-                ORDER BY b.ts_code
-            """
-            
-            if sample_size > 0:
-                query += f" LIMIT {sample_size}"
-            
-            contracts = opt_conn.execute(query).fetchall()
+                FROM completeness_sample s
+                INNER JOIN opt_daily d ON s.ts_code = d.ts_code
+                GROUP BY s.ts_code, s.list_date, s.delist_date, s.exchange, s._stratum
+                ORDER BY s.ts_code
+            """).fetchall()
+            result['population'] = sum(population.values())
             result['checked_count'] = len(contracts)
             
             # 获取交易日历
@@ -175,8 +123,9 @@ def check_data_completeness(opt_db: str, basic_db: str, exchange: str = None,
                 """).fetchall()
                 trade_days_set = {row[0] for row in trade_cal}
             
+            units = []
             for row in contracts:
-                ts_code, list_date, delist_date, exch, first_trade, last_trade, actual_days = row
+                ts_code, list_date, delist_date, exch, stratum, actual_days = row
                 
                 # 跳过信息不完整的合约
                 if not list_date or not delist_date:
@@ -195,8 +144,10 @@ def check_data_completeness(opt_db: str, basic_db: str, exchange: str = None,
                 # 对比
                 if expected_days > 0:
                     completeness = actual_days / expected_days
+                    complete = completeness >= 0.95  # 95% 以上视为完整
+                    units.append((stratum, not complete, max(0, expected_days - actual_days), expected_days))
                     
-                    if completeness >= 0.95:  # 95% 以上视为完整
+                    if complete:
                         result['complete_count'] += 1
                     else:
                         missing_days = expected_days - actual_days
@@ -210,6 +161,11 @@ def check_data_completeness(opt_db: str, basic_db: str, exchange: str = None,
                             'missing_days': missing_days,
                             'completeness': f"{completeness*100:.1f}%",
                         })
+            
+            # 由样本估计总体
+            units = pd.DataFrame(units, columns=['_stratum', 'incomplete', 'missing', 'expected'])
+            result['gap_rate'] = estimate_proportion(units, population, 'incomplete')
+            result['missing_rate'] = estimate_ratio(units, population, 'missing', 'expected')
                         
     except Exception as e:
         logger.error(f"检查数据完整性时出错: {e}")
@@ -219,64 +175,6 @@ def check_data_completeness(opt_db: str, basic_db: str, exchange: str = None,
     return result
 
 
-def check_orphan_data(opt_db: str, exchange: str = None) -> dict:
-    """
-    检查在合约生命周期外的孤立数据。
-    
-    找出 opt_daily 中 trade_date 不在 list_date ~ delist_date 范围内的记录。
-    
-    Returns:
-        dict: {
-            'before_list': list,    # 在 list_date 之前的数据
-            'after_delist': list,   # 在 delist_date 之后的数据
-        }
-    """
-    result = {
-        'before_list': [],
-        'after_delist': [],
-    }
-    
-    try:
-        with get_connection(opt_db, read_only=True) as conn:
-            where_clause = f"AND b.exchange = '{exchange}'" if exchange else ""
-            
-            # 检查 list_date 之前的数据
-            before_list = conn.execute(f"""
-                SELECT d.ts_code, d.trade_date, b.list_date, b.exchange
-                FROM opt_daily d
-                INNER JOIN opt_basic b ON d.ts_code = b.ts_code
-                WHERE d.trade_date < b.list_date {where_clause}
-                ORDER BY d.ts_code, d.trade_date
-                LIMIT 50
-            """).fetchall()
-            
-            result['before_list'] = [
-                {'ts_code': r[0], 'trade_date': r[1], 'list_date': r[2], 'exchange': r[3]}
-                for r in before_list
-            ]
-            
-            # 检查 delist_date 之后的数据
-            after_delist = conn.execute(f"""
-                SELECT d.ts_code, d.trade_date, b.delist_date, b.exchange
-                FROM opt_daily d
-                INNER JOIN opt_basic b ON d.ts_code = b.ts_code
-                WHERE b.delist_date IS NOT NULL 
-                  AND d.trade_date > b.delist_date {where_clause}
-                ORDER BY d.ts_code, d.trade_date
-                LIMIT 50
-            """).fetchall()
-            
-            result['after_delist'] = [
-                {'ts_code': r[0], 'trade_date': r[1], 'delist_date': r[2], 'exchange': r[3]}
-                for r in after_delist
-            ]
-            
-    except Exception as e:
-        logger.error(f"检查孤立数据时出错: {e}")
-        
-    return result
-
-
 def get_data_coverage_by_exchange(opt_db: str) -> dict:
     """按交易所统计数据覆盖情况"""
     result = {}
@@ -325,8 +223,8 @@ def get_data_coverage_by_exchange(opt_db: str) -> dict:
     return result
 
 
-def generate_report(missing: dict, completeness: dict, orphan: dict, 
-                   coverage: dict, exchange: str = None, show_detail: bool = False):
+def generate_report(rule_results: list, completeness: dict, coverage: dict,
+                   exchange: str = None, show_detail: bool = False):
     """生成验证报告"""
     print("\n" + "=" * 70)
     print("  期权数据验证报告")
@@ -335,25 +233,8 @@ def generate_report(missing: dict, completeness: dict, orphan: dict,
         print(f"  交易所筛选: {exchange}")
     print("=" * 70)
     
-    # 1. 合约数量对比
-    print("\n【1. 合约基础信息检查】")
-    print(f"   opt_basic 合约数: {missing['total_basic']:,}")
-    print(f"   opt_daily 合约数: {missing['total_daily']:,}")
-    
-    missing_count = len(missing['missing_in_basic'])
-    if missing_count > 0:
-        print(f"   ⚠ 缺失合约: {missing_count} (opt_daily有但opt_basic无，需要更新opt_basic)")
-        if show_detail:
-            for code in missing['missing_in_basic'][:20]:
-                print(f"      - {code}")
-            if missing_count > 20:
-                print(f"      ... 还有 {missing_count - 20} 个")
-    else:
-        print("   ✓ 无缺失合约")
-    
-    extra_count = len(missing['extra_in_basic'])
-    if extra_count > 0:
-        print(f"   ℹ 无行情合约: {extra_count} (opt_basic有但opt_daily无数据)")
+    # 1. 表间一致性（缺失合约 / 孤立数据）
+    print_rule_report(rule_results, show_detail, title='1. 表间一致性')
     
     # 2. 数据完整性
     print("\n【2. 数据完整性检查】")
@@ -363,9 +244,11 @@ def generate_report(missing: dict, completeness: dict, orphan: dict,
     
     if checked > 0:
         rate = complete / checked * 100
-        print(f"   检查合约数: {checked:,}")
+        print(f"   检查合约数: {checked:,} / {completeness['population']:,} ({completeness['method']})")
         print(f"   完整合约数: {complete:,} ({rate:.1f}%)")
         print(f"   不完整合约: {incomplete:,}")
+        print(f"   估计不完整占比: {format_estimate(completeness['gap_rate'])}")
+        print(f"   估计缺失交易日占比: {format_estimate(completeness['missing_rate'])}")
         
         if show_detail and incomplete > 0:
             print("\n   不完整合约详情 (前10个):")
@@ -376,27 +259,8 @@ def generate_report(missing: dict, completeness: dict, orphan: dict,
     else:
         print("   未检查（无合约数据）")
     
-    # 3. 孤立数据
-    print("\n【3. 孤立数据检查】")
-    before_count = len(orphan['before_list'])
-    after_count = len(orphan['after_delist'])
-    
-    if before_count == 0 and after_count == 0:
-        print("   ✓ 无孤立数据")
-    else:
-        if before_count > 0:
-            print(f"   ⚠ list_date 之前的数据: {before_count} 条")
-            if show_detail:
-                for o in orphan['before_list'][:5]:
-                    print(f"      - {o['ts_code']}: 行情{o['trade_date']} < list_date{o['list_date']}")
-        if after_count > 0:
-            print(f"   ⚠ delist_date 之后的数据: {after_count} 条")
-            if show_detail:
-                for o in orphan['after_delist'][:5]:
-                    print(f"      - {o['ts_code']}: 行情{o['trade_date']} > delist_date{o['delist_date']}")
-    
-    # 4. 按交易所统计
-    print("\n【4. 按交易所统计】")
+    # 3. 按交易所统计
+    print("\n【3. 按交易所统计】")
     for exch, stats in sorted(coverage.items()):
         basic_count = stats.get('basic_count', 0)
         daily_contracts = stats.get('daily_contracts', 0)
@@ -423,6 +287,8 @@ def main():
   %(prog)s --exchange SSE     # 仅验证上交所期权
   %(prog)s --detail           # 显示详细信息
   %(prog)s --sample 50        # 完整性检查抽样50个合约
+  %(prog)s --sample 300 --sample-method stratified   # 按交易所与上市年份分层抽样
+  %(prog)s --workers 1        # 顺序执行各项检查
         """
     )
     
@@ -446,6 +312,27 @@ def main():
         help='完整性检查抽样数量 (0=全部，默认100)'
     )
     
+    parser.add_argument(
+        '--sample-method',
+        choices=SAMPLE_METHODS,
+        default='reservoir',
+        help='抽样方法：reservoir 蓄水池 / stratified 按交易所与上市年份分层'
+    )
+    
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=None,
+        help='抽样随机种子（结果可复现）'
+    )
+    
+    parser.add_argument(
+        '--workers', '-w',
+        type=int,
+        default=None,
+        help='并行检查进程数（默认自动，1 为顺序执行）'
+    )
+    
     parser.add_argument(
         '--export-missing',
         type=str,
@@ -464,46 +351,52 @@ def main():
     
     print(f"正在验证期权数据库: {opt_db}")
     
-    # 执行检查
-    print("检查缺失合约...")
-    missing = check_missing_contracts(opt_db, args.exchange)
+    params = {'exchange': args.exchange}
+    rules = load_rules(tags=['option'])
     
     # 如果需要导出缺失合约
-    if args.export_missing and missing['missing_in_basic']:
+    if args.export_missing:
+        print("检查缺失合约...")
+        missing_rule = next(r for r in rules if r['name'] == 'opt_daily_code_in_basic')
+        missing = fetch_violations(missing_rule, params)
+        if 'ts_code' not in missing.columns:
+            # 规则涉及的表不存在时只返回 rule 列（fetch_violations 已记录警告）
+            print("期权表不存在，无法检查缺失合约")
+            return
+        if missing.empty:
+            print("无缺失合约")
+            return
+        missing = missing.sort_values('ts_code')
         export_file = args.export_missing
         with open(export_file, 'w') as f:
-            for code in missing['missing_in_basic']:
+            for code in missing['ts_code']:
                 f.write(f"{code}\n")
-        print(f"\n已导出 {len(missing['missing_in_basic'])} 个缺失合约到: {export_file}")
+        print(f"\n已导出 {len(missing)} 个缺失合约到: {export_file}")
         
         # 按交易所分组显示
-        if 'missing_details' in missing:
-            print("\n按交易所分组:")
-            by_exchange = {}
-            for d in missing['missing_details']:
-                exch = d['exchange']
-                if exch not in by_exchange:
-                    by_exchange[exch] = []
-                by_exchange[exch].append(d)
-            
-            for exch in sorted(by_exchange.keys()):
-                items = by_exchange[exch]
-                print(f"  {exch}: {len(items)} 个")
+        with get_connection(opt_db, read_only=True) as conn:
+            conn.register('missing_codes', missing)
+            by_exchange = conn.execute("""
+                SELECT d.exchange, COUNT(DISTINCT d.ts_code)
+                FROM opt_daily d JOIN missing_codes m ON d.ts_code = m.ts_code
+                GROUP BY d.exchange ORDER BY d.exchange
+            """).fetchall()
+        print("\n按交易所分组:")
+        for exch, count in by_exchange:
+            print(f"  {exch}: {count} 个")
         return
     
-    print("检查数据完整性...")
-    completeness = check_data_completeness(opt_db, basic_db, args.exchange, args.sample)
-    
-    print("检查孤立数据...")
-    orphan = check_orphan_data(opt_db, args.exchange)
-    
-    print("统计数据覆盖...")
-    coverage = get_data_coverage_by_exchange(opt_db)
+    # 一致性规则与其余检查均为只读，互不依赖，并行执行
+    print("检查表间一致性 / 数据完整性 / 数据覆盖...")
+    tasks = rule_tasks(rules, params)
+    tasks['completeness'] = (check_data_completeness,
+                             (opt_db, basic_db, args.exchange, args.sample, args.sample_method, args.seed))
+    tasks['coverage'] = (get_data_coverage_by_exchange, (opt_db,))
+    results = run_checks(tasks, max_workers=args.workers)
     
     # 生成报告
-    generate_report(missing, completeness, orphan, coverage, 
-                   args.exchange, args.detail)
-
+    generate_report(collect_results(rules, results), results['completeness'], results['coverage'],
+                    args.exchange, args.detail)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,368 @@
+"""
+横截面聚合表 (Aggregates)
+
+Dashboard 多个页面每次访问都从原始表重算同样的横截面统计（均线上方占比、涨跌家数、
+涨跌停家数、行业平均涨跌幅、通达信板块情绪）。这里把它们物化为独立数据库
+AGG_DB_PATH 中的 agg_* 长表（日期 × 行业层级 × 指标），每晚 daily_fetcher 完成后
+增量计算：
+
+- agg_breadth        : 个股日线（stock.daily、stk_limit）按全市场（level='MKT'）与申万
+                       L1/L2/L3 当前成分聚合；指标 total / up / down / flat / ret_mean /
+                       amount / limit_up / limit_down / above_ma{N}（N 取 AGG_MA_PERIODS）
+- agg_tdx_sentiment  : 通达信板块行情（tdx_daily）按板块类型（idx_type，'ALL' 为全部）
+                       聚合；指标 sectors / up_num / down_num / up_ratio / avg_swing /
+                       avg_turnover / avg_pct_change / limit_up_num / limit_down_num
+
+增量范围不按聚合表的最新日期判断：agg_coverage 记录每次计算时各源表逐日的行数，
+本次从“源表逐日行数与记录不一致”的最早日期（新增日期、迟到的 stk_limit、缺口修复补入的
+daily 都会改变行数）重算至截止日；此外最近 AGG_REFRESH_DAYS 个交易日每次都重算，兜底行数不变的修订。
+
+源库以只读方式 ATTACH（stock、"index"），计算在 DuckDB 中完成；每表每次更新一个事务，
+先删除再写入重算区间并同步 agg_coverage，可重复执行；写入后同其他库一样更新 metadata。
+均线需要历史数据，计算时向前多取 2 × max(AGG_MA_PERIODS) 个交易日。
+"""
+import argparse
+import os
+from datetime import datetime
+
+from .config import API_CONFIG, AGG_DB_PATH, AGG_MA_PERIODS, AGG_REFRESH_DAYS, AGG_START_DATE
+from .utils import get_connection, table_exists
+from .metadata import init_metadata, update_metadata
+from .logger import logger
+
+AGG_BREADTH_TABLE = 'agg_breadth'
+AGG_TDX_TABLE = 'agg_tdx_sentiment'
+AGG_COVERAGE_TABLE = 'agg_coverage'
+
+# 申万层级 → sw_index_member_all 中的代码 / 名称列
+SW_LEVELS = {
+    'L1': ('l1_code', 'l1_name'),
+    'L2': ('l2_code', 'l2_name'),
+    'L3': ('l3_code', 'l3_name'),
+}
+
+
+def init_agg_tables(conn):
+    """初始化 agg_* 表 (如果不存在)"""
+    if not table_exists(conn, AGG_BREADTH_TABLE):
+        conn.execute(f'''
+            CREATE TABLE {AGG_BREADTH_TABLE} (
+                trade_date VARCHAR,
+                level VARCHAR,        -- MKT / L1 / L2 / L3
+                index_code VARCHAR,   -- 全市场为 ALL
+                index_name VARCHAR,
+                metric VARCHAR,
+                value DOUBLE,
+                PRIMARY KEY (trade_date, level, index_code, metric)
+            );
+        ''')
+        logger.info(f"创建 {AGG_BREADTH_TABLE} 聚合表")
+    if not table_exists(conn, AGG_TDX_TABLE):
+        conn.execute(f'''
+            CREATE TABLE {AGG_TDX_TABLE} (
+                trade_date VARCHAR,
+                idx_type VARCHAR,     -- 板块类型，全部板块为 ALL
+                metric VARCHAR,
+                value DOUBLE,
+                PRIMARY KEY (trade_date, idx_type, metric)
+            );
+        ''')
+        logger.info(f"创建 {AGG_TDX_TABLE} 聚合表")
+    if not table_exists(conn, AGG_COVERAGE_TABLE):
+        conn.execute(f'''
+            CREATE TABLE {AGG_COVERAGE_TABLE} (
+                table_name VARCHAR,   -- agg_* 表名
+                source VARCHAR,       -- 源表，如 stock.daily
+                trade_date VARCHAR,
+                row_count BIGINT,     -- 计算该日聚合时源表的行数
+                PRIMARY KEY (table_name, source, trade_date)
+            );
+        ''')
+        logger.info(f"创建 {AGG_COVERAGE_TABLE} 覆盖记录表")
+
+
+def _has_source(conn, database, table_name):
+    return conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_catalog = ? AND table_name = ?",
+        [database, table_name]
+    ).fetchone()[0] > 0
+
+
+def _source_counts(conn, sources, end_date):
+    """各源表 [AGG_START_DATE, end_date] 内逐日行数，写入临时表 agg_src_counts(source, trade_date, row_count)"""
+    union = " UNION ALL ".join(
+        f"SELECT '{source}' AS source, trade_date, COUNT(*) AS row_count FROM {source} "
+        f"WHERE trade_date BETWEEN ? AND ? GROUP BY trade_date"
+        for source in sources
+    )
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE agg_src_counts AS {union}", [AGG_START_DATE, end_date] * len(sources))
+
+
+def _first_stale_date(conn, table_name, end_date, rebuild):
+    """
+    需要重算的起始日期：源表逐日行数与 agg_coverage 不一致的最早日期，与 table_name
+    最近 AGG_REFRESH_DAYS 个交易日的起点取较早者；都没有时返回 None。
+    需先调用 _source_counts。
+    """
+    if rebuild:
+        return AGG_START_DATE
+    stale = conn.execute(f"""
+        SELECT MIN(COALESCE(s.trade_date, c.trade_date))
+        FROM agg_src_counts s
+        FULL OUTER JOIN (
+            SELECT source, trade_date, row_count FROM {AGG_COVERAGE_TABLE}
+            WHERE table_name = ? AND trade_date BETWEEN ? AND ?
+        ) c ON s.source = c.source AND s.trade_date = c.trade_date
+        WHERE s.row_count IS DISTINCT FROM c.row_count
+    """, [table_name, AGG_START_DATE, end_date]).fetchone()[0]
+    recent = conn.execute(f"""
+        SELECT MIN(trade_date) FROM (
+            SELECT DISTINCT trade_date FROM {table_name} WHERE trade_date <= ?
+            ORDER BY trade_date DESC LIMIT ?
+        )
+    """, [end_date, AGG_REFRESH_DAYS]).fetchone()[0] if AGG_REFRESH_DAYS > 0 else None
+    candidates = [d for d in (stale, recent) if d]
+    return min(candidates) if candidates else None
+
+
+def _dates_between(conn, source, first_date, end_date):
+    """源表中 [first_date, end_date] 的交易日"""
+    rows = conn.execute(
+        f"SELECT DISTINCT trade_date FROM {source} WHERE trade_date BETWEEN ? AND ? ORDER BY trade_date",
+        [first_date, end_date]
+    ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _lookback_date(conn, first_date, n_dates):
+    """first_date 之前第 n_dates 个交易日（daily 中出现过的日期），不足时返回 '00000000'"""
+    row = conn.execute("""
+        SELECT trade_date FROM (SELECT DISTINCT trade_date FROM stock.daily WHERE trade_date < ?)
+        ORDER BY trade_date DESC
+        LIMIT 1 OFFSET ?
+    """, [first_date, n_dates - 1]).fetchone()
+    return row[0] if row else '00000000'
+
+
+def _replace_range(conn, table_name, select_sql, params, first_date, end_date):
+    """
+    删除 [first_date, end_date] 后写入 select_sql 的结果（长表），并以 agg_src_counts
+    替换该区间的 agg_coverage 记录，一个事务
+    """
+    conn.execute("BEGIN TRANSACTION")
+    try:
+        conn.execute(f"DELETE FROM {table_name} WHERE trade_date BETWEEN ? AND ?", [first_date, end_date])
+        conn.execute(f"INSERT INTO {table_name} BY NAME {select_sql}", params)
+        conn.execute(f"DELETE FROM {AGG_COVERAGE_TABLE} WHERE table_name = ? AND trade_date BETWEEN ? AND ?",
+                     [table_name, first_date, end_date])
+        conn.execute(f"""
+            INSERT INTO {AGG_COVERAGE_TABLE}
+            SELECT ?, source, trade_date, row_count FROM agg_src_counts WHERE trade_date BETWEEN ? AND ?
+        """, [table_name, first_date, end_date])
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def update_breadth(conn, end_date, rebuild=False):
+    """
+    增量计算 agg_breadth（源表 stock.daily、stock.stk_limit）。
+
+    Returns:
+        int: 写入的交易日数
+    """
+    if not _has_source(conn, 'stock', 'daily'):
+        logger.warning("stock.daily 不存在，跳过 agg_breadth")
+        return 0
+    has_limit = _has_source(conn, 'stock', 'stk_limit')
+    has_members = _has_source(conn, 'index', 'sw_index_member_all')
+
+    _source_counts(conn, ['stock.daily'] + (['stock.stk_limit'] if has_limit else []), end_date)
+    first_date = _first_stale_date(conn, AGG_BREADTH_TABLE, end_date, rebuild)
+    dates = _dates_between(conn, 'stock.daily', first_date, end_date) if first_date else []
+    if not dates:
+        logger.info(f"{AGG_BREADTH_TABLE}: 已是最新")
+        return 0
+    lookback = _lookback_date(conn, first_date, 2 * max(AGG_MA_PERIODS))
+
+    ma_cols = ",\n                   ".join(
+        f"COALESCE(COUNT(d.close) OVER w{n} = {n} AND d.close > AVG(d.close) OVER w{n}, FALSE) AS above_ma{n}"
+        for n in AGG_MA_PERIODS
+    )
+    windows = ",\n                   ".join(
+        f"w{n} AS (PARTITION BY d.ts_code ORDER BY d.trade_date ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW)"
+        for n in AGG_MA_PERIODS
+    )
+    if has_limit:
+        limit_cols = "d.close >= l.up_limit AS is_limit_up, d.close <= l.down_limit AS is_limit_down"
+        limit_join = "LEFT JOIN stock.stk_limit l ON l.ts_code = d.ts_code AND l.trade_date = d.trade_date"
+    else:
+        limit_cols = "NULL::BOOLEAN AS is_limit_up, NULL::BOOLEAN AS is_limit_down"
+        limit_join = ""
+    conn.execute(f"""
+        CREATE OR REPLACE TEMP TABLE agg_px AS
+        SELECT * FROM (
+            SELECT d.ts_code, d.trade_date, d.close, d.pct_chg, d.amount,
+                   {limit_cols},
+                   {ma_cols}
+            FROM stock.daily d
+            {limit_join}
+            WHERE d.trade_date BETWEEN ? AND ?
+            WINDOW {windows}
+        ) WHERE trade_date >= ?
+    """, [lookback, end_date, first_date])
+
+    metrics = [
+        "COUNT(*)::DOUBLE AS total",
+        "COUNT(*) FILTER (WHERE pct_chg > 0)::DOUBLE AS up",
+        "COUNT(*) FILTER (WHERE pct_chg < 0)::DOUBLE AS down",
+        "COUNT(*) FILTER (WHERE pct_chg = 0)::DOUBLE AS flat",
+        "AVG(pct_chg)::DOUBLE AS ret_mean",
+        "SUM(amount)::DOUBLE AS amount",
+    ]
+    if has_limit:
+        metrics += [
+            "COUNT(*) FILTER (WHERE is_limit_up)::DOUBLE AS limit_up",
+            "COUNT(*) FILTER (WHERE is_limit_down)::DOUBLE AS limit_down",
+        ]
+    metrics += [f"COUNT(*) FILTER (WHERE above_ma{n})::DOUBLE AS above_ma{n}" for n in AGG_MA_PERIODS]
+    metric_sql = ", ".join(metrics)
+
+    groups = [f"""
+        SELECT trade_date, 'MKT' AS level, 'ALL' AS index_code, '全市场' AS index_name, {metric_sql}
+        FROM agg_px GROUP BY trade_date
+    """]
+    if has_members:
+        for level, (code_col, name_col) in SW_LEVELS.items():
+            groups.append(f"""
+                SELECT p.trade_date, '{level}' AS level, m.index_code, m.index_name, {metric_sql}
+                FROM agg_px p
+                JOIN (
+                    SELECT ts_code, {code_col} AS index_code, {name_col} AS index_name
+                    FROM "index".sw_index_member_all
+                    WHERE is_new = 'Y' AND {code_col} IS NOT NULL AND {name_col} IS NOT NULL
+                ) m ON m.ts_code = p.ts_code
+                GROUP BY p.trade_date, m.index_code, m.index_name
+            """)
+    else:
+        logger.warning("sw_index_member_all 不存在，agg_breadth 只计算全市场")
+
+    select_sql = f"""
+        UNPIVOT ({' UNION ALL '.join(groups)})
+        ON COLUMNS(* EXCLUDE (trade_date, level, index_code, index_name))
+        INTO NAME metric VALUE value
+    """
+    try:
+        _replace_range(conn, AGG_BREADTH_TABLE, select_sql, [], first_date, end_date)
+    finally:
+        conn.execute("DROP TABLE IF EXISTS agg_px")
+        conn.execute("DROP TABLE IF EXISTS agg_src_counts")
+    logger.info(f"{AGG_BREADTH_TABLE}: 写入 {len(dates)} 个交易日 ({dates[0]} ~ {dates[-1]})")
+    return len(dates)
+
+
+def update_tdx_sentiment(conn, end_date, rebuild=False):
+    """
+    增量计算 agg_tdx_sentiment（源表 "index".tdx_daily）。
+
+    Returns:
+        int: 写入的交易日数
+    """
+    if not _has_source(conn, 'index', 'tdx_daily'):
+        logger.warning("tdx_daily 不存在，跳过 agg_tdx_sentiment")
+        return 0
+    _source_counts(conn, ['"index".tdx_daily'], end_date)
+    first_date = _first_stale_date(conn, AGG_TDX_TABLE, end_date, rebuild)
+    dates = _dates_between(conn, '"index".tdx_daily', first_date, end_date) if first_date else []
+    if not dates:
+        logger.info(f"{AGG_TDX_TABLE}: 已是最新")
+        return 0
+
+    metric_sql = """
+        COUNT(*)::DOUBLE AS sectors,
+        SUM(d.up_num)::DOUBLE AS up_num,
+        SUM(d.down_num)::DOUBLE AS down_num,
+        (SUM(d.up_num) * 100.0 / NULLIF(SUM(d.up_num) + SUM(d.down_num), 0))::DOUBLE AS up_ratio,
+        AVG(d.swing)::DOUBLE AS avg_swing,
+        AVG(d.turnover_rate)::DOUBLE AS avg_turnover,
+        AVG(d.pct_change)::DOUBLE AS avg_pct_change,
+        SUM(d.limit_up_num)::DOUBLE AS limit_up_num,
+        SUM(d.limit_down_num)::DOUBLE AS limit_down_num
+    """
+    groups = [f"""
+        SELECT d.trade_date, 'ALL' AS idx_type, {metric_sql}
+        FROM "index".tdx_daily d
+        WHERE d.trade_date BETWEEN ? AND ?
+        GROUP BY d.trade_date
+    """]
+    params = [first_date, end_date]
+    if _has_source(conn, 'index', 'tdx_index'):
+        groups.append(f"""
+            SELECT d.trade_date, i.idx_type, {metric_sql}
+            FROM "index".tdx_daily d
+            JOIN (SELECT DISTINCT ts_code, idx_type FROM "index".tdx_index WHERE idx_type IS NOT NULL) i
+              ON d.ts_code = i.ts_code
+            WHERE d.trade_date BETWEEN ? AND ?
+            GROUP BY d.trade_date, i.idx_type
+        """)
+        params += [first_date, end_date]
+
+    select_sql = f"""
+        UNPIVOT ({' UNION ALL '.join(groups)})
+        ON COLUMNS(* EXCLUDE (trade_date, idx_type))
+        INTO NAME metric VALUE value
+    """
+    try:
+        _replace_range(conn, AGG_TDX_TABLE, select_sql, params, first_date, end_date)
+    finally:
+        conn.execute("DROP TABLE IF EXISTS agg_src_counts")
+    logger.info(f"{AGG_TDX_TABLE}: 写入 {len(dates)} 个交易日 ({dates[0]} ~ {dates[-1]})")
+    return len(dates)
+
+
+def update_aggregates(end_date=None, rebuild=False):
+    """
+    增量更新全部 agg_* 表（daily_fetcher 完成后调用）。
+
+    Args:
+        end_date: 截止日期 YYYYMMDD（默认今天）
+        rebuild: 从 AGG_START_DATE 重新计算
+
+    Returns:
+        dict: {表名: 写入的交易日数}
+    """
+    end_date = end_date or datetime.now().strftime('%Y%m%d')
+    stock_db = API_CONFIG['stock']['db_path']
+    index_db = API_CONFIG['index']['db_path']
+    results = {}
+    with get_connection(AGG_DB_PATH) as conn:
+        # 建表须在 ATTACH 之前：table_exists 查询 information_schema 时不区分数据库
+        init_agg_tables(conn)
+        init_metadata(conn, 'agg')
+        for alias, db_path in (('stock', stock_db), ('index', index_db)):
+            if os.path.exists(db_path):
+                conn.execute(f"ATTACH '{db_path}' AS \"{alias}\" (READ_ONLY)")
+        results[AGG_BREADTH_TABLE] = update_breadth(conn, end_date, rebuild)
+        results[AGG_TDX_TABLE] = update_tdx_sentiment(conn, end_date, rebuild)
+        # 登记到 metadata，dashboard 持久化缓存据此判断聚合表是否变化
+        for table_name, n in results.items():
+            if n:
+                update_metadata(conn, table_name, 'trade_date')
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="增量更新横截面聚合表 agg_*")
+    parser.add_argument('--end_date', type=str, default=None, help='截止日期 YYYYMMDD（默认今天）')
+    parser.add_argument('--rebuild', action='store_true',
+                        help=f'从 AGG_START_DATE ({AGG_START_DATE}) 重新计算')
+    args = parser.parse_args()
+
+    results = update_aggregates(args.end_date, args.rebuild)
+    for table_name, n in results.items():
+        print(f"{table_name}: {n} 个交易日")
+
+
+if __name__ == "__main__":
+    main()
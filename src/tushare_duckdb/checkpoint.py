@@ -0,0 +1,158 @@
+"""
+断点续传 (Checkpoint / --resume)
+
+fetch_jobs 表记录一次任务中已完成的工作单元（表、参数、日期或窗口、offset），
+并与数据写入在同一事务中提交：数据落库与 checkpoint 要么同时成功，要么同时回滚。
+
+只有以 --resume 运行时才使用 fetch_jobs（open_checkpoint）：长任务带 --resume 启动，
+中断后以同一命令再次运行，已完成的工作单元会被跳过；任务正常结束后清理该任务的 checkpoint。
+不带 --resume（包括 dry-run）时使用 NullCheckpoint，不创建、不读写 fetch_jobs。
+
+job_id 只由稳定的输入构成（表名、存储模式等），不含按库中最新日期自动推算的起始日期，
+否则续跑时起始日期已前移，找不到上次的任务。
+"""
+import json
+from datetime import datetime
+
+from .utils import table_exists
+from .logger import logger
+
+
+def init_fetch_jobs(conn):
+    """初始化 fetch_jobs 表 (如果不存在)"""
+    if not table_exists(conn, 'fetch_jobs'):
+        conn.execute('''
+            CREATE TABLE fetch_jobs (
+                job_id VARCHAR,
+                table_name VARCHAR,
+                params VARCHAR,       -- 参数组合（JSON，按键排序）
+                unit VARCHAR,         -- 日期、日期窗口（start~end）或代码
+                page_offset BIGINT,   -- 单元内的分页偏移，整单元完成时为 0
+                rows_stored BIGINT,
+                completed_at TIMESTAMP,
+                PRIMARY KEY (job_id, table_name, params, unit, page_offset)
+            );
+        ''')
+        logger.info("创建 fetch_jobs 断点表")
+
+
+def make_params_key(params):
+    """参数组合 → 稳定的字符串键（忽略内部使用的 config 字段）"""
+    if not params:
+        return '{}'
+    clean = {k: v for k, v in params.items() if k != 'config'}
+    return json.dumps(clean, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class FetchCheckpoint:
+    def __init__(self, conn, job_id, resume=False):
+        """
+        Args:
+            conn: 可写的 DuckDB 连接（与数据写入使用同一连接）
+            job_id: 任务标识，同一命令重跑时应保持一致
+            resume: True 时加载已完成单元用于跳过；False 时清空该任务的旧 checkpoint
+        """
+        self.conn = conn
+        self.job_id = job_id
+        self.resume = resume
+        init_fetch_jobs(conn)
+
+        if resume:
+            rows = conn.execute(
+                "SELECT table_name, params, unit, page_offset FROM fetch_jobs WHERE job_id = ?", [job_id]
+            ).fetchall()
+            self.completed = set(tuple(r) for r in rows)
+            if self.completed:
+                logger.info(f"[resume] 任务 {job_id}: 已完成 {len(self.completed)} 个工作单元，将跳过")
+        else:
+            self.clear()
+            self.completed = set()
+
+    def is_done(self, table_name, unit, params=None, offset=0):
+        return (table_name, make_params_key(params), str(unit), offset) in self.completed
+
+    def _record(self, table_name, unit, params, offset, rows):
+        key = (table_name, make_params_key(params), str(unit), offset)
+        self.conn.execute('''
+            INSERT INTO fetch_jobs (job_id, table_name, params, unit, page_offset, rows_stored, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (job_id, table_name, params, unit, page_offset) DO UPDATE SET
+                rows_stored = excluded.rows_stored,
+                completed_at = excluded.completed_at;
+        ''', (self.job_id, key[0], key[1], key[2], offset, rows, datetime.now()))
+        self.completed.add(key)
+
+    def mark_done(self, table_name, unit, params=None, offset=0, rows=0):
+        """记录无需写入数据的单元（如 API 返回空）为已完成"""
+        self._record(table_name, unit, params, offset, rows)
+
+    def store_unit(self, storage, table_name, unit, df, params=None, offset=0, **store_kwargs):
+        """
+        在同一事务中写入数据并记录工作单元完成。
+
+        Args:
+            unit: 单个工作单元；批量写入多个单元的数据时可传入列表
+
+        Returns:
+            int: store_data 的返回值；写入失败 (-1) 时整体回滚，不记录 checkpoint
+        """
+        units = unit if isinstance(unit, (list, tuple, set)) else [unit]
+        return self.store_batch(storage, table_name, [(u, params) for u in units], df, offset, **store_kwargs)
+
+    def store_batch(self, storage, table_name, done_units, df, offset=0, **store_kwargs):
+        """
+        与 store_unit 相同，但每个单元可带各自的参数组合：
+        多个参数组合并发拉取、合并后一次写入时使用。
+
+        Args:
+            done_units: [(unit, params), ...]
+        """
+        self.conn.execute("BEGIN TRANSACTION")
+        try:
+            stored = 0
+            if df is not None and not df.empty:
+                stored = storage.store_data(table_name, df, **store_kwargs)
+            if stored < 0:
+                self.conn.execute("ROLLBACK")
+                return stored
+            for unit, params in done_units:
+                self._record(table_name, unit, params, offset, stored)
+            self.conn.execute("COMMIT")
+            return stored
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        self.conn.execute("DELETE FROM fetch_jobs WHERE job_id = ?", [self.job_id])
+
+    def finish(self):
+        """任务完整结束：清理 checkpoint，下次运行从头开始"""
+        self.clear()
+        self.completed = set()
+
+
+class NullCheckpoint(FetchCheckpoint):
+    """不记录断点：接口与 FetchCheckpoint 相同，写入仍在事务中完成"""
+
+    def __init__(self, conn, job_id=None):
+        self.conn = conn
+        self.job_id = job_id
+        self.resume = False
+        self.completed = set()
+
+    def is_done(self, table_name, unit, params=None, offset=0):
+        return False
+
+    def _record(self, table_name, unit, params, offset, rows):
+        pass
+
+    def clear(self):
+        pass
+
+
+def open_checkpoint(conn, job_id, resume=False):
+    """resume=True 时返回读写 fetch_jobs 的 FetchCheckpoint，否则返回 NullCheckpoint"""
+    if resume:
+        return FetchCheckpoint(conn, job_id, resume=True)
+    return NullCheckpoint(conn, job_id)
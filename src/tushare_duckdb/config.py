@@ -21,6 +21,30 @@ else:
 # Database Root Path
 DB_ROOT = os.getenv('DB_ROOT', '/Users/robert/Developer/DuckDB')
 
+# Tushare 每分钟调用配额（按账户积分调整，用于执行计划估算与限频）
+API_RATE_LIMIT = int(os.getenv('TUSHARE_RATE_LIMIT', '500'))
+
+# 多参数组合（ts_code、交易所等）并发拉取的线程数，总频率仍受 API_RATE_LIMIT 约束
+API_FETCH_WORKERS = int(os.getenv('TUSHARE_FETCH_WORKERS', '4'))
+
+# 增量校验时每表随机复查的历史期间数（审计抽样）
+VALIDATION_AUDIT_SAMPLE = int(os.getenv('TUSHARE_VALIDATION_AUDIT', '20'))
+
+# 入库异常检测（见 ingest_monitor.py）：off / flag（告警并标记）/ quarantine（异常日期转入 <表>_quarantine）
+INGEST_MONITOR_MODE = os.getenv('TUSHARE_INGEST_MONITOR', 'flag')
+INGEST_BASELINE_WINDOW = int(os.getenv('TUSHARE_INGEST_WINDOW', '20'))   # 基线取最近多少个正常日期
+INGEST_MIN_HISTORY = 5                                                     # 基线至少需要的日期数
+INGEST_ROW_TOLERANCE = float(os.getenv('TUSHARE_INGEST_ROW_TOL', '0.3'))   # 行数相对偏离阈值
+INGEST_Z_THRESHOLD = 4.0                                                   # 行数稳健 z 分数阈值
+INGEST_NULL_TOLERANCE = float(os.getenv('TUSHARE_INGEST_NULL_TOL', '0.01'))  # 主键空值率高于基线的阈值
+
+# 横截面聚合表 agg_*（见 aggregates.py）：独立数据库文件、均线周期、首次构建的起始日期、
+# 每次更新无条件重算的最近交易日数（兜底同日期行数不变的源数据修订）
+AGG_DB_PATH = os.getenv('AGG_DB_PATH', os.path.join(DB_ROOT, 'tushare_duck_agg.db'))
+AGG_MA_PERIODS = (5, 10, 20, 60, 120, 250)
+AGG_START_DATE = os.getenv('AGG_START_DATE', '20200101')
+AGG_REFRESH_DAYS = int(os.getenv('AGG_REFRESH_DAYS', '5'))
+
 def load_config():
     """Load configuration from settings.yaml"""
     # Find settings.yaml relative to project root or this file
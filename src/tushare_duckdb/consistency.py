@@ -0,0 +1,328 @@
+"""
+表间一致性规则引擎 (Consistency Rules)
+
+规则在 consistency_rules.yaml 中声明（字段说明见该文件），例如
+「每条 daily 都有同日 adj_factor」「每个 opt_daily 合约都在 opt_basic 中」。
+
+同一数据库文件中的规则编译为**一条** SQL：
+- src_* : 被检查表的去重键（同表、同列、同过滤条件的规则共享一次扫描）
+- ref_* : 参照表的键（同表、同列的规则共享）
+- v_*   : 每条规则的违规记录（exists 为反连接，within 为区间比较）
+
+各数据库在进程池中并行检查（见 validation_runner.run_checks），结果合并为一张报告。
+"""
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+from .config import API_CONFIG
+from .validation_runner import run_checks
+from .utils import get_connection
+from .logger import logger
+
+try:
+    from tabulate import tabulate
+except ImportError:
+    tabulate = None
+
+RULES_PATH = Path(__file__).resolve().parent.parent.parent / 'consistency_rules.yaml'
+RULE_TYPES = ('exists', 'within')
+SEVERITY_MARKS = {'error': '✗', 'warning': '⚠', 'info': 'ℹ'}
+
+
+def _normalize_rule(raw):
+    """校验并补全单条规则，附加数据库路径"""
+    rule = dict(raw)
+    for field in ('name', 'category', 'table', 'ref', 'keys'):
+        if not rule.get(field):
+            raise ValueError(f"一致性规则缺少字段 {field}: {raw}")
+    rule.setdefault('type', 'exists')
+    if rule['type'] not in RULE_TYPES:
+        raise ValueError(f"规则 {rule['name']}: 未知类型 {rule['type']}")
+    if rule['type'] == 'within' and not (rule.get('column') and (rule.get('start') or rule.get('end'))):
+        raise ValueError(f"规则 {rule['name']}: within 规则需要 column 以及 start/end")
+    rule.setdefault('ref_category', rule['category'])
+    rule.setdefault('filter', {})
+    rule.setdefault('severity', 'warning')
+    rule.setdefault('tags', [])
+    rule.setdefault('description', '')
+    for key, category in (('db_path', rule['category']), ('ref_db_path', rule['ref_category'])):
+        db_path = API_CONFIG.get(category, {}).get('db_path')
+        if not db_path:
+            raise ValueError(f"规则 {rule['name']}: 类别 {category} 未配置 db_path")
+        rule[key] = db_path
+    return rule
+
+
+def load_rules(path=RULES_PATH, tags=None, names=None):
+    """
+    读取一致性规则。
+
+    Args:
+        tags: 只保留带有任一标签的规则
+        names: 只保留指定名称的规则
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        raw_rules = (yaml.safe_load(f) or {}).get('rules', [])
+    rules = [_normalize_rule(r) for r in raw_rules]
+    if tags:
+        rules = [r for r in rules if set(r['tags']) & set(tags)]
+    if names:
+        rules = [r for r in rules if r['name'] in names]
+    return rules
+
+
+def _cols(columns):
+    return ", ".join(f'"{c}"' for c in columns)
+
+
+def _filter_clauses(filters, params):
+    """过滤条件 → (SQL 条件列表, 绑定参数)；未提供的运行参数不生效"""
+    clauses, bound = [], {}
+    for column, param in filters.items():
+        if params.get(param) is not None:
+            clauses.append(f'"{column}" = ${param}')
+            bound[param] = params[param]
+    return clauses, bound
+
+
+def _where(clauses):
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def _relation(rule, side):
+    """被检查表 / 参照表的限定名（参照表在其他数据库文件时使用 ATTACH 别名）"""
+    if side == 'table':
+        return f'"{rule["table"]}"'
+    schema = 'ref_db.' if rule['ref_db_path'] != rule['db_path'] else ''
+    return f'{schema}"{rule["ref"]}"'
+
+
+def _compile(rules, params=None, sample_size=10):
+    """规则 → (CTE 列表, 每条规则的汇总 SELECT 列表, 绑定参数)"""
+    params = params or {}
+    bound = {}
+    ctes, sources, refs = [], {}, {}
+
+    def shared(cache, prefix, key, select_sql):
+        if key not in cache:
+            cache[key] = f"{prefix}_{len(cache)}"
+            ctes.append(f"{cache[key]} AS MATERIALIZED ({select_sql})")
+        return cache[key]
+
+    selects = []
+    for i, rule in enumerate(rules):
+        keys = list(rule['keys'])
+        src_cols = keys + ([rule['column']] if rule['type'] == 'within' else [])
+        clauses, used = _filter_clauses(rule['filter'], params)
+        bound.update(used)
+        relation = _relation(rule, 'table')
+        src = shared(sources, 'src', (relation, tuple(src_cols), tuple(clauses)),
+                     f"SELECT DISTINCT {_cols(src_cols)} FROM {relation}{_where(clauses)}")
+
+        ref_relation = _relation(rule, 'ref')
+        join_on = " AND ".join(f's."{k}" = r."{k}"' for k in keys)
+        if rule['type'] == 'exists':
+            ref = shared(refs, 'ref', (ref_relation, tuple(keys)),
+                         f"SELECT DISTINCT {_cols(keys)} FROM {ref_relation}")
+            violation_sql = f"SELECT s.* FROM {src} s WHERE NOT EXISTS (SELECT 1 FROM {ref} r WHERE {join_on})"
+        else:
+            bounds = [c for c in (rule.get('start'), rule.get('end')) if c]
+            ref = shared(refs, 'ref', (ref_relation, tuple(keys + bounds)),
+                         f"SELECT {_cols(keys + bounds)} FROM {ref_relation}")
+            outside = []
+            if rule.get('start'):
+                outside.append(f's."{rule["column"]}" < r."{rule["start"]}"')
+            if rule.get('end'):
+                outside.append(f's."{rule["column"]}" > r."{rule["end"]}"')
+            violation_sql = f"SELECT DISTINCT s.* FROM {src} s JOIN {ref} r ON {join_on} WHERE {' OR '.join(outside)}"
+
+        ctes.append(f"v_{i} AS MATERIALIZED ({violation_sql})")
+        sample_expr = "concat_ws(' ', " + ", ".join(f'CAST("{c}" AS VARCHAR)' for c in src_cols) + ")"
+        selects.append(
+            f"SELECT {i} AS ord, (SELECT COUNT(*) FROM {src}) AS checked, "
+            f"(SELECT COUNT(*) FROM v_{i}) AS violations, "
+            f"(SELECT list({sample_expr}) FROM (SELECT * FROM v_{i} ORDER BY {_cols(src_cols)} LIMIT {int(sample_size)})) AS samples"
+        )
+
+    return ctes, selects, bound
+
+
+def compile_rules(rules, params=None, sample_size=10):
+    """
+    把同一数据库中的规则编译为一条查询。
+
+    Returns:
+        (sql, bound_params)；结果每条规则一行：ord, checked, violations, samples
+    """
+    ctes, selects, bound = _compile(rules, params, sample_size)
+    sql = "WITH " + ",\n".join(ctes) + "\n" + "\nUNION ALL\n".join(selects) + "\nORDER BY ord"
+    return sql, bound
+
+
+def _missing_tables(conn, rules):
+    """规则涉及但不存在的表 → {规则名: [表名, ...]}"""
+    rows = conn.execute("SELECT database_name, table_name FROM duckdb_tables()").fetchall()
+    main_db = conn.execute("SELECT current_database()").fetchone()[0]
+    existing = {(db != main_db, table) for db, table in rows}
+    missing = {}
+    for rule in rules:
+        ref_external = rule['ref_db_path'] != rule['db_path']
+        absent = [t for external, t in ((False, rule['table']), (ref_external, rule['ref']))
+                  if (external, t) not in existing]
+        if absent:
+            missing[rule['name']] = absent
+    return missing
+
+
+def _result(rule, checked=None, violations=None, samples=None, error=None):
+    return {
+        'name': rule['name'],
+        'category': rule['category'],
+        'table': rule['table'],
+        'ref': rule['ref'],
+        'severity': rule['severity'],
+        'description': rule['description'],
+        'checked': checked,
+        'violations': violations,
+        'samples': samples or [],
+        'error': error,
+    }
+
+
+def _attach_ref_db(conn, rules):
+    ref_paths = {r['ref_db_path'] for r in rules if r['ref_db_path'] != r['db_path']}
+    if len(ref_paths) > 1:
+        raise ValueError(f"同一数据库的规则只支持一个外部参照库: {sorted(ref_paths)}")
+    for path in ref_paths:
+        conn.execute(f"ATTACH '{path}' AS ref_db (READ_ONLY)")
+
+
+def check_rules(db_path, rules, params=None, sample_size=10):
+    """
+    在单个数据库上执行一组规则（进程池任务，需为模块级函数）。
+
+    Returns:
+        与 rules 顺序一致的结果列表；表不存在或查询出错的规则带 error 字段
+    """
+    results = {}
+    with get_connection(db_path, read_only=True) as conn:
+        _attach_ref_db(conn, rules)
+        missing = _missing_tables(conn, rules)
+        runnable = [r for r in rules if r['name'] not in missing]
+        for name, tables in missing.items():
+            results[name] = _result(next(r for r in rules if r['name'] == name),
+                                    error=f"表不存在: {', '.join(tables)}")
+
+        def execute(batch):
+            sql, bound = compile_rules(batch, params, sample_size)
+            rows = conn.execute(sql, bound).fetchall() if bound else conn.execute(sql).fetchall()
+            for ord_, checked, violations, samples in rows:
+                results[batch[ord_]['name']] = _result(batch[ord_], checked, violations, samples)
+
+        if runnable:
+            try:
+                execute(runnable)
+            except Exception as e:
+                logger.warning(f"批量规则查询失败，改为逐条查询: {e}")
+                for rule in runnable:
+                    try:
+                        execute([rule])
+                    except Exception as rule_error:
+                        logger.error(f"规则 {rule['name']} 执行失败: {rule_error}")
+                        results[rule['name']] = _result(rule, error=str(rule_error))
+    return [results[r['name']] for r in rules]
+
+
+def rule_tasks(rules, params=None, sample_size=10):
+    """
+    按数据库文件分组生成 run_checks 任务，便于脚本与其他只读检查一起并行执行。
+
+    Returns:
+        {任务名: (check_rules, args)}，任务名形如 'rules:tushare_duck_stock.db'
+    """
+    groups = {}
+    for rule in rules:
+        groups.setdefault(rule['db_path'], []).append(rule)
+    return {f"rules:{Path(db_path).name}": (check_rules, (db_path, group, params, sample_size))
+            for db_path, group in groups.items()}
+
+
+def collect_results(rules, outcomes):
+    """把 run_checks 的结果按 rules 顺序展开；整库失败的规则标记为错误"""
+    by_name = {}
+    for name, (_, args) in rule_tasks(rules).items():
+        group = args[1]
+        group_results = outcomes.get(name) or [_result(r, error='数据库检查失败') for r in group]
+        by_name.update((r['name'], r) for r in group_results)
+    return [by_name[r['name']] for r in rules]
+
+
+def run_rules(rules, params=None, max_workers=None, sample_size=10):
+    """
+    按数据库文件分组并行执行规则。
+
+    Returns:
+        与 rules 顺序一致的结果列表
+    """
+    outcomes = run_checks(rule_tasks(rules, params, sample_size), max_workers)
+    return collect_results(rules, outcomes)
+
+
+def fetch_violations(rules, params=None):
+    """
+    返回同一数据库中一组规则的全部违规记录，用于导出清单（如缺失合约、幽灵代码）。
+
+    Returns:
+        DataFrame：rule 列为规则名，其余为各规则的 keys（及 within 规则的 column），按列名合并
+    """
+    rules = rules if isinstance(rules, (list, tuple)) else [rules]
+    with get_connection(rules[0]['db_path'], read_only=True) as conn:
+        _attach_ref_db(conn, rules)
+        missing = _missing_tables(conn, rules)
+        for name, tables in missing.items():
+            logger.warning(f"规则 {name} 跳过，表不存在: {', '.join(tables)}")
+        rules = [r for r in rules if r['name'] not in missing]
+        if not rules:
+            return pd.DataFrame(columns=['rule'])
+
+        ctes, _, bound = _compile(rules, params)
+        selects = "\nUNION ALL BY NAME\n".join(
+            f"SELECT '{r['name']}' AS rule, * FROM v_{i}" for i, r in enumerate(rules))
+        query = "WITH " + ",\n".join(ctes) + "\n" + selects
+        result = conn.execute(query, bound) if bound else conn.execute(query)
+        return result.df()
+
+
+def print_rule_report(results, show_detail=False, title='表间一致性检查'):
+    """打印统一的规则检查报告"""
+    rows = []
+    for r in results:
+        if r['error']:
+            status = f"? {r['error']}"
+        elif r['violations']:
+            status = f"{SEVERITY_MARKS.get(r['severity'], '⚠')} {r['violations']:,} 条违规"
+        else:
+            status = '✓'
+        row = {
+            '规则': r['name'],
+            '表': r['table'],
+            '参照表': r['ref'],
+            '检查数': f"{r['checked']:,}" if r['checked'] is not None else '-',
+            '结果': status,
+            '说明': r['description'],
+        }
+        if show_detail:
+            row['示例'] = '; '.join(r['samples'][:5])
+        rows.append(row)
+
+    print(f"\n【{title}】")
+    if not rows:
+        print("   无规则")
+    elif tabulate:
+        print(tabulate(rows, headers='keys', tablefmt='psql'))
+    else:
+        for row in rows:
+            print("   " + " | ".join(str(v) for v in row.values()))
+
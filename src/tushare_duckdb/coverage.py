@@ -0,0 +1,246 @@
+"""
+集合化覆盖率引擎 (Coverage Engine)
+
+对同一个 DuckDB 文件中的所有待校验表，生成**一条** SQL：
+
+- bounds   : 每表记录数、最早/最晚日期
+- counts   : 每表按期间（日/月/报告期）的记录数，仅统计期间列表内的数据
+- expected : 期间列表 × 表（交易日型表只取交易日，并从表内最早日期开始）
+- gaps     : 缺失期间的 gaps-and-islands（连续缺失合并为区间）
+- anomaly  : 低于 max(均值 - 2σ, 1) 的期间
+
+期间列表（含是否交易日标记）以临时关系 cov_periods 注册到连接上，
+结果以 Arrow Table 返回，每表一行。
+
+增量校验时（见 validation_state.py），表只统计 cov_recheck 中的期间，
+其余期间的计数取自 cov_cached（上次校验保存的结果），两者合并后再计算覆盖率。
+"""
+import pandas as pd
+
+from .logger import logger
+
+# 日线行情类表：按总记录数统计；其余含 ts_code 的表按 ts_code 去重计数
+ROW_COUNT_TABLES = {
+    'yc_cb', 'daily', 'adj_factor', 'daily_basic', 'fut_daily', 'fut_index_daily',
+    'index_daily', 'opt_daily', 'cb_daily', 'fund_daily'
+}
+
+PERIODS_VIEW = 'cov_periods'
+RECHECK_VIEW = 'cov_recheck'
+CACHED_VIEW = 'cov_cached'
+
+
+def make_spec(table_name, date_column=None, key=None, count_expr='COUNT(*)', distinct_expr='COUNT(*)',
+              trade_only=False, clip_to_first=False):
+    """
+    构造单表的覆盖率规格。
+
+    Args:
+        date_column: 用于最早/最晚日期的列；None 时只统计记录数
+        key: 将日期列映射为期间的 SQL 表达式；None 表示不计算覆盖率
+        count_expr / distinct_expr: 每期间的计数表达式
+        trade_only: 只要求交易日有数据（date_type=trade）
+        clip_to_first: 期望期间从表内最早日期开始（早于上市/起始日的期间不算缺失）
+    """
+    return {
+        'table_name': table_name,
+        'date_column': date_column,
+        'key': key,
+        'count_expr': count_expr,
+        'distinct_expr': distinct_expr,
+        'trade_only': trade_only,
+        'clip_to_first': clip_to_first,
+    }
+
+
+def daily_count_exprs(table_name, has_ts_code):
+    """返回 (count_expr, distinct_expr)，与原逐表校验的计数口径一致"""
+    if table_name in ROW_COUNT_TABLES or not has_ts_code:
+        return 'COUNT(*)', 'COUNT(*)'
+    return 'COUNT(DISTINCT ts_code)', 'COUNT(DISTINCT ts_code)'
+
+
+def _sql_str(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _count_sql(spec, incremental):
+    table = _sql_str(spec['table_name'])
+    live = (
+        f"SELECT {table} AS table_name, {spec['key']} AS period, "
+        f"{spec['count_expr']} AS cnt, {spec['distinct_expr']} AS distinct_cnt "
+        f"FROM \"{spec['table_name']}\" "
+    )
+    if not incremental:
+        return live + f"WHERE {spec['key']} IN (SELECT period FROM {PERIODS_VIEW}) GROUP BY 1, 2"
+    return (
+        live + f"WHERE {spec['key']} IN (SELECT period FROM {RECHECK_VIEW} WHERE table_name = {table}) GROUP BY 1, 2 "
+        f"UNION ALL SELECT table_name, period, cnt, distinct_cnt FROM {CACHED_VIEW} WHERE table_name = {table}"
+    )
+
+
+def build_coverage_sql(specs, incremental_tables=()):
+    """
+    生成覆盖率查询（依赖已注册的 cov_periods(period, is_trade) 关系）。
+
+    incremental_tables 中的表改为依赖 cov_recheck(table_name, period) 与
+    cov_cached(table_name, period, cnt, distinct_cnt)。
+    """
+    spec_rows = ", ".join(
+        f"({i}, {_sql_str(s['table_name'])}, {str(bool(s['trade_only'])).upper()}, "
+        f"{str(bool(s['clip_to_first'])).upper()}, {str(s['key'] is not None).upper()})"
+        for i, s in enumerate(specs)
+    )
+
+    bounds = " UNION ALL ".join(
+        f"SELECT {_sql_str(s['table_name'])} AS table_name, COUNT(*) AS total_records, "
+        + (f"CAST(MIN(\"{s['date_column']}\") AS VARCHAR) AS min_date, "
+           f"CAST(MAX(\"{s['date_column']}\") AS VARCHAR) AS max_date "
+           if s['date_column'] else "NULL::VARCHAR AS min_date, NULL::VARCHAR AS max_date ")
+        + f"FROM \"{s['table_name']}\""
+        for s in specs
+    )
+
+    count_parts = [
+        _count_sql(s, s['table_name'] in incremental_tables)
+        for s in specs if s['key'] is not None
+    ]
+    counts = " UNION ALL ".join(count_parts) if count_parts else (
+        "SELECT NULL::VARCHAR AS table_name, NULL::VARCHAR AS period, "
+        "0::BIGINT AS cnt, 0::BIGINT AS distinct_cnt WHERE FALSE"
+    )
+
+    return f"""
+        WITH spec(ord, table_name, trade_only, clip_to_first, has_key) AS (VALUES {spec_rows}),
+        bounds AS ({bounds}),
+        counts AS ({counts}),
+        expected AS (
+            SELECT s.table_name, p.period,
+                   row_number() OVER (PARTITION BY s.table_name ORDER BY p.period) AS pos
+            FROM spec s
+            JOIN bounds b USING (table_name)
+            JOIN {PERIODS_VIEW} p
+              ON (NOT s.trade_only OR p.is_trade)
+             AND (NOT s.clip_to_first OR p.period >= COALESCE(b.min_date, '19900101'))
+            WHERE s.has_key
+        ),
+        grid AS (
+            SELECT e.table_name, e.period, e.pos, COALESCE(c.cnt, 0) AS cnt
+            FROM expected e LEFT JOIN counts c USING (table_name, period)
+        ),
+        gaps AS (
+            -- gaps-and-islands：连续缺失期间的 pos 与缺失序号之差相同
+            SELECT table_name, MIN(period) AS gap_start, MAX(period) AS gap_end, COUNT(*) AS periods
+            FROM (
+                SELECT table_name, period,
+                       pos - row_number() OVER (PARTITION BY table_name ORDER BY period) AS island
+                FROM grid WHERE cnt = 0
+            )
+            GROUP BY table_name, island
+        ),
+        grid_agg AS (
+            SELECT table_name, COUNT(*) AS expected, COUNT(*) FILTER (WHERE cnt = 0) AS missing
+            FROM grid GROUP BY table_name
+        ),
+        gap_agg AS (
+            SELECT table_name,
+                   list({{'start': gap_start, 'end': gap_end, 'periods': periods}} ORDER BY gap_start) AS missing_ranges
+            FROM gaps GROUP BY table_name
+        ),
+        stats AS (
+            SELECT table_name, GREATEST(AVG(cnt) - 2 * COALESCE(stddev_pop(cnt), 0), 1) AS threshold
+            FROM counts GROUP BY table_name
+        ),
+        count_agg AS (
+            SELECT c.table_name,
+                   list(c.period ORDER BY c.period) FILTER (WHERE c.cnt < st.threshold) AS anomalies,
+                   list({{'period': c.period, 'cnt': c.cnt, 'distinct_cnt': c.distinct_cnt}} ORDER BY c.period) AS counts
+            FROM counts c JOIN stats st USING (table_name)
+            GROUP BY c.table_name
+        )
+        SELECT s.table_name, b.total_records, b.min_date, b.max_date,
+               COALESCE(ga.expected, 0) AS expected, COALESCE(ga.missing, 0) AS missing,
+               gp.missing_ranges, ca.anomalies, ca.counts
+        FROM spec s
+        JOIN bounds b USING (table_name)
+        LEFT JOIN grid_agg ga USING (table_name)
+        LEFT JOIN gap_agg gp USING (table_name)
+        LEFT JOIN count_agg ca USING (table_name)
+        ORDER BY s.ord
+    """
+
+
+def _fetch_arrow(result):
+    """兼容不同 DuckDB 版本的 Arrow 取数接口"""
+    if hasattr(result, 'to_arrow_table'):
+        return result.to_arrow_table()
+    return result.fetch_arrow_table()
+
+
+def compute_coverage(conn, specs, periods, recheck=None, cached=None):
+    """
+    对同一连接中的多张表执行一次覆盖率查询。
+
+    Args:
+        specs: make_spec 构造的规格列表
+        periods: [(period, is_trade), ...]，期间按字符串排序
+        recheck: 增量校验时 {table_name: 需要重新统计的期间集合}；不在其中的表完整统计
+        cached: {table_name: {period: (cnt, distinct_cnt)}}，未重新统计期间的已保存计数
+
+    Returns:
+        pyarrow.Table，每表一行；单表出错时退化为逐表查询，出错的表不出现在结果中
+    """
+    if not specs:
+        return None
+    recheck = recheck or {}
+    cached = cached or {}
+    periods_df = pd.DataFrame(list(periods), columns=['period', 'is_trade']).astype({'period': str, 'is_trade': bool})
+    conn.register(PERIODS_VIEW, periods_df)
+    registered = [PERIODS_VIEW]
+    if recheck:
+        wanted = set(periods_df['period'])
+        recheck_df = pd.DataFrame(
+            [(t, p) for t, ps in recheck.items() for p in ps if p in wanted], columns=['table_name', 'period']
+        ).astype(str)
+        cached_df = pd.DataFrame(
+            [(t, p, c[0], c[1]) for t in recheck for p, c in cached.get(t, {}).items()
+             if p in wanted and p not in recheck[t] and c[0]],
+            columns=['table_name', 'period', 'cnt', 'distinct_cnt']
+        ).astype({'table_name': str, 'period': str, 'cnt': 'int64', 'distinct_cnt': 'int64'})
+        conn.register(RECHECK_VIEW, recheck_df)
+        conn.register(CACHED_VIEW, cached_df)
+        registered += [RECHECK_VIEW, CACHED_VIEW]
+    incremental_tables = set(recheck)
+    try:
+        try:
+            return _fetch_arrow(conn.execute(build_coverage_sql(specs, incremental_tables)))
+        except Exception as e:
+            if len(specs) == 1:
+                logger.error(f"错误：表 {specs[0]['table_name']} 覆盖率查询失败: {e}")
+                return None
+            logger.warning(f"批量覆盖率查询失败，改为逐表查询: {e}")
+
+        import pyarrow as pa
+        tables = []
+        for spec in specs:
+            try:
+                tables.append(_fetch_arrow(conn.execute(build_coverage_sql([spec], incremental_tables))))
+            except Exception as e:
+                logger.error(f"错误：表 {spec['table_name']} 覆盖率查询失败: {e}")
+        return pa.concat_tables(tables) if tables else None
+    finally:
+        for view in registered:
+            try:
+                conn.unregister(view)
+            except Exception:
+                pass
+
+
+def format_missing_ranges(ranges, missing, unit, max_ranges=3):
+    """缺失区间 → '20240102~20240105; 20240301 等 5 段 (12个交易日)'"""
+    if not missing:
+        return '无缺失'
+    ranges = ranges or []
+    parts = [r['start'] if r['start'] == r['end'] else f"{r['start']}~{r['end']}" for r in ranges[:max_ranges]]
+    more = f" 等 {len(ranges)} 段" if len(ranges) > max_ranges else ''
+    return f"{'; '.join(parts)}{more} ({missing}{unit})"
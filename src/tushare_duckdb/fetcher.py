@@ -2,10 +2,15 @@ import pandas as pd
 import time
 from .config import PRO_API
 from .logger import logger
+from .rate_limiter import api_rate_limiter
 
 class TushareFetcher:
-    def __init__(self, api=None):
+    def __init__(self, api=None, rate_limiter=None):
         self.api = api or PRO_API
+        # 多线程共享同一限流器，保证总调用频率不超过账户配额
+        self.rate_limiter = rate_limiter or api_rate_limiter
+        # 最近一次 fetch_data 是否因重试耗尽而失败（区分「无数据」与「获取失败」）
+        self.last_failed = False
 
     def fetch_data(self, table_name, api_params, api_config_entry, retries=3, initial_offset=0):
         expected_fields = api_config_entry.get('fields', [])
@@ -16,6 +21,7 @@ class TushareFetcher:
         current_offset = initial_offset
         total_fetched_raw = 0
         page_count = 0
+        self.last_failed = False
         logger.info(f"开始获取 '{table_name}': 分页={requires_paging}, API参数={api_params}, 唯一键={unique_keys}")
 
         while True:
@@ -29,6 +35,7 @@ class TushareFetcher:
                 logger.info(
                     f"页 {page_count}, 尝试 {attempt + 1}/{retries}: 调用 API '{table_name}', 参数: {current_api_call_params}")
                 try:
+                    self.rate_limiter.acquire()
                     df_page = self.api.query(table_name, fields=expected_fields, **current_api_call_params)
                     page_rows = len(df_page) if df_page is not None else 0
                     total_fetched_raw += page_rows
@@ -49,6 +56,7 @@ class TushareFetcher:
                         time.sleep(1.0 * (2 ** attempt))
                     else:
                         logger.error(f"  '{table_name}' 获取失败（ts_code={current_api_call_params.get('ts_code', '无')}）: {e}")
+                        self.last_failed = True
                         return pd.DataFrame()  # 关键：失败直接返回空，不卡死
             if page_rows < api_limit:
                 break
@@ -60,3 +68,36 @@ class TushareFetcher:
             logger.info(f"{table_name} 合并完成。总行数 (去重后): {len(df_combined)}")
             return df_combined
         return pd.DataFrame()
+
+    def fetch_page(self, table_name, api_params, api_config_entry, offset=0, limit=None, retries=3):
+        """
+        获取单页数据（带重试与限流），供需要逐页判断的增量逻辑使用。
+
+        返回 API 原始页，不做清洗：调用方须以原始行数判断是否最后一页
+        （满页中含全空行时，清洗后的行数会小于 limit）。
+
+        Returns:
+            DataFrame（可能为空）；重试耗尽时返回 None
+        """
+        expected_fields = api_config_entry.get('fields', [])
+        call_params = api_params.copy()
+        call_params['limit'] = limit or api_config_entry.get('limit', 2000)
+        call_params['offset'] = offset
+        self.last_failed = False
+        for attempt in range(retries):
+            try:
+                self.rate_limiter.acquire()
+                df_page = self.api.query(table_name, fields=expected_fields, **call_params)
+                if df_page is None:
+                    return pd.DataFrame()
+                return df_page
+            except Exception as e:
+                if "每_minute最多访问" in str(e):
+                    logger.warning(f"检测到频率限制，等待 65 秒后重试...")
+                    time.sleep(65)
+                elif attempt < retries - 1:
+                    time.sleep(1.0 * (2 ** attempt))
+                else:
+                    logger.error(f"  '{table_name}' 第 offset={offset} 页获取失败: {e}")
+        self.last_failed = True
+        return None
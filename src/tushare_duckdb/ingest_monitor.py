@@ -0,0 +1,179 @@
+"""
+入库异常检测 (Ingest Monitor)
+
+半空的 daily 响应、因 ts_code 缺失被丢弃的 moneyflow_cnt_ths 记录等问题，过去只能在
+事后校验时发现。这里在 store_data 写入路径上做一次廉价的在线检查，只针对逐交易日拉取
+全市场数据的表（date_type=trade、date_param_mode=single），公告 / 财报等事件表每日行数
+本就不规则，不参与检测：
+
+- 每批数据按日期统计写入行数，以及主键列（unique_keys 中除日期外的列）在 API 原始数据中的空值率
+- 与 ingest_stats 台账中该表最近 INGEST_BASELINE_WINDOW 个正常日期的中位数比较
+  - 行数：相对偏离超过 INGEST_ROW_TOLERANCE，且稳健 z 分数（中位数 / MAD）超过 INGEST_Z_THRESHOLD
+  - 空值率：高于基线超过 INGEST_NULL_TOLERANCE
+- 检查只涉及本批数据与台账中的少量记录，不查询数据表本身
+
+处理方式由 INGEST_MONITOR_MODE（环境变量 TUSHARE_INGEST_MONITOR）决定：
+- off       : 不检查
+- flag      : 正常写入，输出警告，台账中标记为 flagged（不参与后续基线）
+- quarantine: 异常日期的数据转入 <表>_quarantine，不写入主表，台账中标记为 quarantined
+
+台账不足 INGEST_MIN_HISTORY 个正常日期时只记录、不判断（冷启动）。
+"""
+import json
+from datetime import datetime
+
+import pandas as pd
+
+from .config import (
+    INGEST_MONITOR_MODE, INGEST_BASELINE_WINDOW, INGEST_MIN_HISTORY,
+    INGEST_ROW_TOLERANCE, INGEST_Z_THRESHOLD, INGEST_NULL_TOLERANCE
+)
+from .utils import table_exists
+from .logger import logger
+
+
+def init_ingest_stats(conn):
+    """初始化 ingest_stats 台账表 (如果不存在)"""
+    if not table_exists(conn, 'ingest_stats'):
+        conn.execute('''
+            CREATE TABLE ingest_stats (
+                table_name VARCHAR,
+                period VARCHAR,       -- 日期（YYYYMMDD / YYYYMM）
+                row_count BIGINT,     -- 本日期写入的行数
+                null_rates VARCHAR,   -- 主键列空值率（JSON）
+                status VARCHAR,       -- ok / flagged / quarantined
+                reason VARCHAR,
+                recorded_at TIMESTAMP,
+                PRIMARY KEY (table_name, period)
+            );
+        ''')
+        logger.info("创建 ingest_stats 入库台账表")
+
+
+def period_keys(values):
+    """日期列 → 台账期间键（兼容 YYYY-MM-DD 与 YYYYMMDD，API 原始数据与清洗后数据一致）"""
+    return values.astype(str).str.replace('-', '', regex=False).str[:8]
+
+
+def profile_nulls(df, date_column, key_columns):
+    """
+    按日期统计主键列的空值率（在清洗前的 API 数据上调用）。
+
+    Returns:
+        {period: {列: 空值率}}
+    """
+    columns = [c for c in key_columns if c in df.columns]
+    if not columns or date_column not in df.columns or df.empty:
+        return {}
+    nulls = pd.DataFrame({c: df[c].isna() | (df[c].astype(str) == '') for c in columns})
+    nulls['_period'] = period_keys(df[date_column]).values
+    return nulls.groupby('_period')[columns].mean().to_dict(orient='index')
+
+
+def _load_baseline(conn, table_name, before):
+    """该表在 before 之前最近的正常期间 → (行数列表, {列: [空值率, ...]})"""
+    rows = conn.execute('''
+        SELECT row_count, null_rates FROM ingest_stats
+        WHERE table_name = ? AND status = 'ok' AND period < ?
+        ORDER BY period DESC LIMIT ?
+    ''', [table_name, before, INGEST_BASELINE_WINDOW]).fetchall()
+    counts = [r[0] for r in rows]
+    null_history = {}
+    for _, rates in rows:
+        for col, rate in json.loads(rates or '{}').items():
+            null_history.setdefault(col, []).append(rate)
+    return counts, null_history
+
+
+def _median(values):
+    return float(pd.Series(values).median())
+
+
+def check_batch(conn, table_name, counts, null_rates):
+    """
+    将本批各日期与台账基线比较。
+
+    基线经 conn.cursor() 读取：游标是独立连接，不在调用方（checkpoint.store_batch 等）已开启的
+    写入事务中，查询失败只影响本次检测，不会中止调用方事务。ingest_stats 须已由
+    init_ingest_stats 创建（DuckDBStorage 构造时完成）。
+
+    Args:
+        counts: {period: 行数}
+        null_rates: {period: {列: 空值率}}
+
+    Returns:
+        {period: 异常原因}，无异常时为空
+    """
+    if not counts:
+        return {}
+    with conn.cursor() as cursor:
+        row_counts, null_history = _load_baseline(cursor, table_name, min(counts))
+    if len(row_counts) < INGEST_MIN_HISTORY:
+        return {}
+
+    median = _median(row_counts)
+    mad = _median([abs(c - median) for c in row_counts])
+    scale = max(1.4826 * mad, 1.0)
+    null_baseline = {col: _median(rates) for col, rates in null_history.items()}
+
+    anomalies = {}
+    for period, n in counts.items():
+        reasons = []
+        deviation = abs(n - median) / median if median else 0
+        if deviation > INGEST_ROW_TOLERANCE and abs(n - median) / scale > INGEST_Z_THRESHOLD:
+            reasons.append(f"行数 {n}，基线 {median:.0f}（偏离 {deviation:.0%}）")
+        for col, rate in null_rates.get(period, {}).items():
+            baseline = null_baseline.get(col, 0.0)
+            if rate - baseline > INGEST_NULL_TOLERANCE:
+                reasons.append(f"{col} 空值率 {rate:.2%}，基线 {baseline:.2%}")
+        if reasons:
+            anomalies[period] = '；'.join(reasons)
+    return anomalies
+
+
+def quarantine(conn, table_name, df):
+    """将异常日期的记录转入 <表>_quarantine（首次使用时按主表结构创建，附加 quarantined_at 列）"""
+    quarantine_table = f"{table_name}_quarantine"
+    if not table_exists(conn, quarantine_table):
+        conn.execute(f'CREATE TABLE "{quarantine_table}" AS '
+                     f'SELECT *, NULL::TIMESTAMP AS quarantined_at FROM "{table_name}" LIMIT 0')
+    view_name = f"ingest_quarantine_{table_name}"
+    columns_str = ", ".join(f'"{c}"' for c in df.columns)
+    try:
+        conn.register(view_name, df)
+        conn.execute(f'''
+            INSERT INTO "{quarantine_table}" ({columns_str}, quarantined_at)
+            SELECT {columns_str}, ? FROM "{view_name}"
+        ''', [datetime.now()])
+    finally:
+        conn.unregister(view_name)
+    return quarantine_table
+
+
+def record_batch(conn, table_name, counts, null_rates, anomalies, status_if_anomalous):
+    """写入本批各日期的台账记录（与数据写入在同一连接 / 事务中）"""
+    now = datetime.now()
+    rows = [
+        (table_name, period, n, json.dumps(null_rates.get(period, {})),
+         status_if_anomalous if period in anomalies else 'ok', anomalies.get(period), now)
+        for period, n in counts.items()
+    ]
+    conn.executemany('''
+        INSERT INTO ingest_stats (table_name, period, row_count, null_rates, status, reason, recorded_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (table_name, period) DO UPDATE SET
+            row_count = excluded.row_count,
+            null_rates = excluded.null_rates,
+            status = excluded.status,
+            reason = excluded.reason,
+            recorded_at = excluded.recorded_at;
+    ''', rows)
+
+
+def monitor_mode():
+    """当前检测模式（off / flag / quarantine）"""
+    mode = (INGEST_MONITOR_MODE or 'off').lower()
+    if mode not in ('off', 'flag', 'quarantine'):
+        logger.warning(f"未知的 TUSHARE_INGEST_MONITOR={INGEST_MONITOR_MODE}，按 flag 处理")
+        return 'flag'
+    return mode
@@ -3,9 +3,11 @@ import calendar
 from tabulate import tabulate
 from .metadata import init_metadata, update_metadata
 from .data_validation import get_database_status
+from .validation_runner import run_validation
 from .config import PRO_API, BASIC_DB_PATH
 from .config import API_CONFIG
 from .processor import DataProcessor
+from .planner import build_fetch_plan, print_plan
 from .utils import (
     init_tables_for_category, get_connection, get_trade_dates,
     init_tables_for_category, get_connection, get_trade_dates,
@@ -46,7 +48,7 @@ def get_input(prompt, allow_zero=False, default=None):
 # ==================== 主函数：数据下载与存储 ====================
 def fetch_and_store_data(category, start_date=None, end_date=None, years=None, selected_tables=None,
                          ts_code=None, exchange='SSE', batch_size=50, force_fetch=False, overwrite=False,
-                         frequency='daily', fetch_type='range'):
+                         frequency='daily', fetch_type='range', plan_only=False, concurrency=1, resume=False):
     if category not in API_CONFIG:
         raise ValueError(f"无效类别: {category}")
 
@@ -61,6 +63,12 @@ def fetch_and_store_data(category, start_date=None, end_date=None, years=None, s
     logger.info(f"正在处理类别: {category.upper()} | 数据库: {db_path.split('/')[-1]}")
     logger.info(f"选择表: {', '.join(selected_tables_list)}")
 
+    # === 仅生成执行计划 (--plan)：估算调用量与耗时，不调用 API、不写库 ===
+    if plan_only:
+        plans = build_fetch_plan(category, start_date, end_date, ','.join(selected_tables_list), exchange)
+        print_plan(plans, concurrency=concurrency)
+        return 0
+
     # pledge_detail 专用提醒：优先使用脚本
     if category == 'reference' and selected_tables_list == ['pledge_detail']:
         prompt = (
@@ -188,7 +196,7 @@ def fetch_and_store_data(category, start_date=None, end_date=None, years=None, s
             logger.info(f"→ 正在更新表: {table}")
 
             # 初始化处理器
-            processor = DataProcessor(conn, pro)
+            processor = DataProcessor(conn, pro, resume=resume)
             stored = processor.process_dates(
                 table_name=table,
                 api_config_entry=table_config,
@@ -312,11 +320,14 @@ def main():
             detailed_input = get_input("是否显示逐日数据量详情？(y/n，默认 y): ", default='y')
             detailed = detailed_input.lower() in ['y', 'yes', '1', '']
 
+            incremental_input = get_input("是否增量校验（只复查上次校验后写入的日期）？(y/n，默认 n): ", default='n')
+            incremental = incremental_input.lower() in ['y', 'yes', '1']
+
             # === 第四步：执行校验（逻辑完全不变）===
             categories_to_check = API_CONFIG.keys() if target_category == 'all' else [target_category]
 
             all_status = []
-            all_daily = []
+            parallel_categories = []
 
             for cat in categories_to_check:
                 if cat not in API_CONFIG:
@@ -412,24 +423,16 @@ def main():
                     continue
                 
                 else:
-                    # Standard logic for other categories
-                    frequency = 'daily'
-                    if cat == 'finance':
-                        frequency = 'quarterly'
-
-                    status, daily = get_database_status(
-                        db_path=config['db_path'],
-                        basic_db_path=BASIC_DB_PATH,
-                        tables=tables_list,
-                        start_date=val_start,
-                        end_date=val_end,
-                        detailed=detailed,
-                        exchange='SSE',
-                        frequency=frequency
-                    )
-                all_status.extend(status)
-                if daily:
-                    all_daily = daily  # 只保留最后一个类别的逐日详情（避免混淆）
+                    # 其余类别各数据库并行校验（见 validation_runner.py）
+                    parallel_categories.append(cat)
+
+            all_daily = []
+            all_report = []
+            if parallel_categories:
+                all_status, all_daily, all_report = run_validation(
+                    parallel_categories, val_start, val_end, detailed=detailed, exchange='SSE',
+                    incremental=incremental
+                )
 
             print("\n" + "=" * 80)
             if all_status:
@@ -456,6 +459,10 @@ def main():
                 print("技巧：可使用终端上下滚动，或复制到 Excel/Notion 进一步分析缺失段")
                 print("=" * 120)
 
+            if detailed and all_report:
+                print(f"\n逐报告期数据量详情（共 {len(all_report)} 期）：")
+                print(tabulate(all_report, headers='keys', tablefmt='psql', stralign='right', numalign='right'))
+
 
         elif choice in category_map:
             category = category_map[choice]
@@ -541,12 +548,13 @@ def main():
                 batch_size = get_input("批次大小（默认 50）: ", allow_zero=True, default='50')
                 if batch_size is None: continue
                 
-                mode = get_input("模式: 1.增量插入 2.强制覆盖 3.强制去重插入 [默认1]: ", allow_zero=True, default='1')
-                if mode not in ['1','2','3']:
+                mode = get_input("模式: 1.增量插入 2.强制覆盖 3.强制去重插入 4.仅估算执行计划 [默认1]: ", allow_zero=True, default='1')
+                if mode not in ['1','2','3','4']:
                     print("无效模式")
                     continue
                 force_fetch = mode in ['2', '3']
                 overwrite = mode == '2'
+                plan_only = mode == '4'
                 
                 try:
                     # Always pass explicit table list for macro data (not 'all')
@@ -559,7 +567,8 @@ def main():
                         exchange='SSE',
                         batch_size=batch_size,
                         force_fetch=force_fetch,
-                        overwrite=overwrite
+                        overwrite=overwrite,
+                        plan_only=plan_only
                     )
                 except Exception as e:
                     logger.error(f"更新失败: {e}")
@@ -653,12 +662,13 @@ def main():
             batch_size = get_input("批次大小（默认 50）: ", allow_zero=True, default='50')
             if batch_size is None: continue
 
-            mode = get_input("模式: 1.增量插入 2.强制覆盖 3.强制去重插入 [默认1]: ", allow_zero=True, default='1')
-            if mode not in ['1','2','3']:
+            mode = get_input("模式: 1.增量插入 2.强制覆盖 3.强制去重插入 4.仅估算执行计划 [默认1]: ", allow_zero=True, default='1')
+            if mode not in ['1','2','3','4']:
                 print("无效模式")
                 continue
             force_fetch = mode in ['2', '3']
             overwrite = mode == '2'
+            plan_only = mode == '4'
 
             ts_code = get_input("特定代码（如指数TS代码，多个逗号分隔，默认留空）: ", allow_zero=True, default='')
 
@@ -672,7 +682,8 @@ def main():
                     exchange=exchange,
                     batch_size=batch_size,
                     force_fetch=force_fetch,
-                    overwrite=overwrite
+                    overwrite=overwrite,
+                    plan_only=plan_only
                 )
             except Exception as e:
                 logger.error(f"更新失败: {e}")
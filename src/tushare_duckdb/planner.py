@@ -0,0 +1,268 @@
+"""
+执行计划与成本估算 (--plan)
+
+在真正发起长时间回填前，把 param_grid、日期集合（交易日/自然日/季度/月度）
+与分页估算展开为具体的调用计划，并基于 metadata 中的历史数据量估算
+每次调用的行数、总页数（即实际 API 调用次数）以及在给定并发与配额下的耗时。
+
+与 --dry-run 的区别：dry-run 只打印日期范围，plan 会给出调用量与耗时。
+"""
+import math
+from datetime import datetime, timedelta
+
+from .config import API_CONFIG, BASIC_DB_PATH, API_RATE_LIMIT
+from .utils import (
+    get_connection, table_exists, generate_param_grid, get_all_dates,
+    get_trade_dates, get_quarterly_dates, get_monthly_dates
+)
+from .logger import logger
+
+try:
+    from tabulate import tabulate
+except ImportError:
+    tabulate = None
+
+# 单次 API 调用（一页）的平均耗时（秒），用于估算并发下的耗时下限
+DEFAULT_SECONDS_PER_CALL = 0.5
+
+
+def expand_dates(category, table_config, start_date, end_date, exchange='SSE', conn=None, db_path=None):
+    """
+    按与 fetch_and_store_data 相同的规则展开日期列表。
+
+    - finance 类别：季度末日期
+    - api_date_format=YYYYQN：直接使用 start/end
+    - api_date_format=YYYYMM：月份列表
+    - date_type=trade 且 requires_date：交易日（trade_cal）
+    - 其余：自然日
+    """
+    requires_date = table_config.get('requires_date', True)
+    date_type = table_config.get('date_type', 'trade')
+    api_date_format = table_config.get('api_date_format', 'YYYYMMDD')
+
+    if not start_date or not end_date:
+        return []
+    if category == 'finance':
+        return get_quarterly_dates(start_date, end_date)
+    if api_date_format == 'YYYYQN':
+        return [start_date, end_date] if start_date != end_date else [start_date]
+    if api_date_format == 'YYYYMM':
+        return get_monthly_dates(start_date, end_date)
+    if date_type == 'trade' and requires_date:
+        trade_conn = conn if db_path == BASIC_DB_PATH else None
+        try:
+            return get_trade_dates(BASIC_DB_PATH, start_date, end_date, exchange, conn=trade_conn)
+        except Exception as e:
+            logger.warning(f"读取交易日历失败，按自然日估算: {e}")
+    return get_all_dates(start_date, end_date)
+
+
+def resolve_param_grid(category, table_name, table_config, conn=None):
+    """展开参数矩阵，规则与 DataProcessor.process_dates 保持一致"""
+    if table_config.get('fetch_by_ts_code'):
+        if conn is not None and table_exists(conn, 'pledge_stat'):
+            rows = conn.execute("SELECT DISTINCT ts_code FROM pledge_stat").fetchall()
+            return [{'ts_code': r[0]} for r in rows if r and r[0]]
+        return []
+
+    # index_weight 的 index_codes 在运行时从库中动态提取
+    if category == 'index_member' and table_name == 'index_weight':
+        if conn is not None and table_exists(conn, 'index_weight'):
+            rows = conn.execute("SELECT DISTINCT index_code FROM index_weight ORDER BY index_code").fetchall()
+            if rows:
+                return [{'index_codes': r[0]} for r in rows]
+
+    required_params = table_config.get('required_params', {})
+    if required_params:
+        return generate_param_grid(required_params)
+    return [{}]
+
+
+def get_history_stats(conn, table_name):
+    """从 metadata 读取 (min_date, max_date, record_count)，不存在返回 None"""
+    if conn is None or not table_exists(conn, 'metadata'):
+        return None
+    row = conn.execute(
+        "SELECT min_date, max_date, record_count FROM metadata WHERE table_name = ?", [table_name]
+    ).fetchone()
+    if not row or not row[2]:
+        return None
+    return row
+
+
+def _next_day(date_str):
+    """YYYYMMDD 的下一天；其他格式原样返回"""
+    try:
+        return (datetime.strptime(str(date_str), '%Y%m%d') + timedelta(days=1)).strftime('%Y%m%d')
+    except ValueError:
+        return date_str
+
+
+def plan_table(category, table_name, start_date, end_date, exchange='SSE', conn=None, db_path=None):
+    """
+    估算单表的调用计划。
+
+    Returns:
+        dict: table / mode / grid / dates / calls / pages / rows / rows_per_call
+              rows 与 rows_per_call 在没有历史数据时为 None
+    """
+    table_config = API_CONFIG[category]['tables'][table_name]
+    requires_date = table_config.get('requires_date', True)
+    mode = table_config.get('date_param_mode', 'single')
+    limit = table_config.get('limit', 2000)
+
+    # 与 fetch_and_store_data 相同的日期裁剪逻辑
+    current_date = datetime.now().strftime('%Y%m%d')
+    if table_config.get('date_type', 'trade') == 'trade' and end_date and len(end_date) == 8:
+        end_date = min(end_date, current_date)
+    earliest_date = table_config.get('earliest_date', '19900101')
+    if len(str(earliest_date)) == 8 and len(start_date or '') == 8:
+        start_date = max(start_date, earliest_date)
+
+    grid = resolve_param_grid(category, table_name, table_config, conn)
+    n_grid = len(grid)
+    dates = expand_dates(category, table_config, start_date, end_date, exchange, conn, db_path)
+
+    # === 历史行数：record_count / 历史日期单位数 ===
+    rows_per_unit = None
+    local_max = None
+    history = get_history_stats(conn, table_name)
+    if history:
+        min_date, local_max, record_count = history
+        if not requires_date or not min_date or not local_max:
+            rows_per_unit = float(record_count)
+        else:
+            units = len(expand_dates(category, table_config, str(min_date), str(local_max), exchange, conn, db_path))
+            rows_per_unit = record_count / units if units else None
+
+    if mode == 'full_paging':
+        # 每个参数组合从 offset=0 开始翻页，遇到无新数据的页即停止
+        calls = n_grid
+        if rows_per_unit is not None and local_max:
+            new_units = len(expand_dates(category, table_config, _next_day(local_max), end_date, exchange, conn, db_path))
+            rows = rows_per_unit * new_units
+        else:
+            rows = None
+        rows_per_call = rows / calls if (rows is not None and calls) else None
+        pages = calls * ((int(rows_per_call) // limit + 1) if rows_per_call is not None else 1)
+    elif mode == 'range' and requires_date:
+        # 每个参数组合一次范围请求
+        calls = n_grid if dates else 0
+        rows = rows_per_unit * len(dates) if rows_per_unit is not None else None
+        rows_per_call = rows / calls if (rows is not None and calls) else None
+        pages = calls * ((int(rows_per_call) // limit + 1) if rows_per_call is not None else 1)
+    else:
+        # single / 快照：每个参数组合 × 每个日期一次请求
+        # 历史每日行数（或快照总行数）按参数组合平摊
+        calls = n_grid * len(dates)
+        rows_per_call = rows_per_unit / n_grid if (rows_per_unit is not None and n_grid) else None
+        rows = rows_per_call * calls if rows_per_call is not None else None
+        pages = calls * ((int(rows_per_call) // limit + 1) if rows_per_call is not None else 1)
+
+    return {
+        'category': category,
+        'table': table_name,
+        'mode': mode if requires_date else 'snapshot',
+        'start_date': start_date,
+        'end_date': end_date,
+        'grid': n_grid,
+        'dates': len(dates),
+        'calls': calls,
+        'pages': pages,
+        'rows': int(rows) if rows is not None else None,
+        'rows_per_call': int(rows_per_call) if rows_per_call is not None else None,
+        'limit': limit,
+    }
+
+
+def plan_category(category, table_ranges, exchange='SSE'):
+    """
+    为同一类别下的多个表生成执行计划（只读，不调用 API）。
+
+    Args:
+        table_ranges: {表名: (start_date, end_date)}，允许每个表有不同的日期范围
+    """
+    db_path = API_CONFIG[category]['db_path']
+    plans = []
+    try:
+        with get_connection(db_path, read_only=True) as conn:
+            for table_name, (start_date, end_date) in table_ranges.items():
+                plans.append(plan_table(category, table_name, start_date, end_date, exchange, conn, db_path))
+    except Exception as e:
+        # 数据库尚未创建时仍可估算调用次数（无历史行数）
+        logger.warning(f"{category}: 无法读取本地数据库，按无历史数据估算: {e}")
+        plans = [
+            plan_table(category, table_name, start_date, end_date, exchange, None, db_path)
+            for table_name, (start_date, end_date) in table_ranges.items()
+        ]
+    return plans
+
+
+def build_fetch_plan(category, start_date, end_date, selected_tables=None, exchange='SSE'):
+    """按 fetch_and_store_data 的参数生成整类执行计划"""
+    if category not in API_CONFIG:
+        raise ValueError(f"无效类别: {category}")
+
+    all_tables = list(API_CONFIG[category]['tables'].keys())
+    tables = [
+        t.strip() for t in (selected_tables or 'all').split(',')
+        if t.strip() in all_tables
+    ] or all_tables
+    return plan_category(category, {t: (start_date, end_date) for t in tables}, exchange)
+
+
+def estimate_wall_time(total_pages, concurrency=1, rate_limit=API_RATE_LIMIT,
+                       seconds_per_call=DEFAULT_SECONDS_PER_CALL):
+    """
+    估算耗时（秒）：取「并发延迟下限」与「每分钟配额下限」中的较大者。
+    """
+    latency_bound = total_pages * seconds_per_call / max(int(concurrency), 1)
+    quota_bound = total_pages / rate_limit * 60 if rate_limit else 0
+    return max(latency_bound, quota_bound)
+
+
+def _format_duration(seconds):
+    seconds = int(math.ceil(seconds))
+    hours, rem = divmod(seconds, 3600)
+    minutes, secs = divmod(rem, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{secs:02d}s"
+    return f"{secs}s"
+
+
+def print_plan(plans, concurrency=1, rate_limit=API_RATE_LIMIT):
+    """打印执行计划与汇总估算"""
+    if not plans:
+        logger.info("执行计划为空")
+        return
+
+    rows = []
+    for p in plans:
+        rows.append([
+            p['category'], p['table'], p['mode'],
+            f"{p['start_date']}~{p['end_date']}",
+            p['grid'], p['dates'], p['calls'], p['pages'],
+            p['rows_per_call'] if p['rows_per_call'] is not None else '未知',
+            p['rows'] if p['rows'] is not None else '未知',
+            _format_duration(estimate_wall_time(p['pages'], concurrency, rate_limit)),
+        ])
+    headers = ['类别', '表名', '模式', '日期范围', '参数组合', '日期数', '请求数', '页数(API调用)', '行/请求', '预计行数', '预计耗时']
+    if tabulate:
+        for line in tabulate(rows, headers=headers, tablefmt='psql', stralign='right').split('\n'):
+            logger.info(line)
+    else:
+        for row in rows:
+            logger.info(' | '.join(str(x) for x in row))
+
+    total_calls = sum(p['calls'] for p in plans)
+    total_pages = sum(p['pages'] for p in plans)
+    total_rows = sum(p['rows'] for p in plans if p['rows'] is not None)
+    unknown = [p['table'] for p in plans if p['rows'] is None]
+    wall = estimate_wall_time(total_pages, concurrency, rate_limit)
+
+    logger.info(f"  总请求数: {total_calls}")
+    logger.info(f"  总页数 (API 调用): {total_pages}")
+    logger.info(f"  预计行数: {total_rows}" + (f"（{len(unknown)} 个表无历史数据: {', '.join(unknown)}）" if unknown else ""))
+    logger.info(f"  预计耗时: {_format_duration(wall)} (并发={concurrency}, 配额={rate_limit}次/分钟)")
@@ -1,16 +1,26 @@
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from .utils import generate_param_grid, build_api_params
 from .metadata import update_metadata
 from .fetcher import TushareFetcher
 from .storage import DuckDBStorage
-from .config import PRO_API
+from .checkpoint import open_checkpoint, make_params_key
+from .watermark import hash_frame, load_watermarks, record_watermark, count_changed_rows
+from .config import API_FETCH_WORKERS
 from .logger import logger
 
 class DataProcessor:
-    def __init__(self, conn, api=None):
+    def __init__(self, conn, api=None, resume=False, fetch_workers=API_FETCH_WORKERS):
         self.conn = conn
         self.fetcher = TushareFetcher(api)
         self.storage = DuckDBStorage(conn)
+        # resume=True 时跳过上次中断任务中已完成的工作单元（见 checkpoint.py）
+        self.resume = resume
+        self.checkpoint = None
+        # 本轮 process_dates 中获取或写入失败、未记为完成的工作单元数
+        self.failed_units = 0
+        # 多参数组合并发拉取的线程数（只并发 API 调用，写库始终在当前线程）
+        self.fetch_workers = max(1, int(fetch_workers or 1))
 
     def process_dates(self, table_name, api_config_entry, unique_keys, date_list, batch_size,
                       date_column_in_db='trade_date', ts_codes=None, force_fetch=False, overwrite=False,
@@ -44,65 +54,61 @@ class DataProcessor:
         else:
             param_grid = [{}]
 
+        # 只拉取指定代码时各日期行数与全市场基线不可比，不做入库异常检测
+        self.storage.monitor = not (ts_codes and any(ts_codes)) and not ts_code and not api_config_entry.get('fetch_by_ts_code')
+
+        # 断点（仅 --resume）：同一表 + 存储模式视为同一任务。起始日期按库中最新日期自动推算，
+        # 续跑时会前移，不能作为任务标识；工作单元本身带日期 / 窗口，跳过已完成单元与范围无关
+        job_id = f"{table_name}:{'replace' if overwrite else 'insert_new'}"
+        self.checkpoint = open_checkpoint(self.conn, job_id, resume=self.resume)
+        self.failed_units = 0
+
+        mode = api_config_entry.get('date_param_mode', 'single')
         current_date_display = "未开始"
         try:
-            for grid_params in param_grid:
-                logger.info(f"{table_name}: 处理参数组合 {grid_params}")
-                current_ts_code = grid_params.get('ts_code') or ts_code
-                param_str = ', '.join(f"{k}={v}" for k, v in grid_params.items())
-                logger.debug(f"{table_name}: 参数组合 [{param_str or '无'}]")
-
-                extra = {**api_config_entry.get('fixed_params', {}), **grid_params, 'config': api_config_entry}
-                mode = api_config_entry.get('date_param_mode', 'single')
-
-                if mode == 'full_paging':
-                    total_stored += self._process_full_paging(table_name, api_table, api_config_entry, unique_keys, grid_params)
-                elif mode == 'range':
-                    # 针对 Overwrite 模式 + 多个参数组合（如多交易所）的特殊优化：
-                    # 不能在循环中直接 replace，否则后一个参数会把前一个参数的数据删掉。
-                    # 必须收集所有参数的数据，统一去重，然后一次性 replace。
-                    if overwrite and len(param_grid) > 1:
-                        # 延迟处理，先收集
-                        if 'range_dfs' not in locals(): range_dfs = []
-                        df = self._fetch_only_range(table_name, api_table, api_config_entry, date_list, current_ts_code, extra)
-                        if df is not None and not df.empty:
-                            range_dfs.append(df)
-                    else:
-                        # 标准流程：单次处理
+            if len(param_grid) > 1 and mode == 'range':
+                # 多参数组合（如多交易所、多 ts_code）：并发拉取后合并，一次写入。
+                # 覆盖模式下尤其必须合并后统一 replace，否则后一个参数会把前一个参数的数据删掉。
+                total_stored = self._process_range_fanout(table_name, api_table, api_config_entry, unique_keys,
+                                                          date_list, param_grid, date_column_in_db, overwrite, ts_code)
+            elif len(param_grid) > 1 and mode != 'full_paging':
+                if overwrite:
+                    # 覆盖模式：由 _process_daily 选择批量删除 + 插入策略（一次处理全部参数组合）
+                    total_stored = self._process_daily(table_name, api_table, api_config_entry, unique_keys,
+                                                       date_list, ts_code, {}, date_column_in_db, overwrite, ts_code,
+                                                       param_grid, fetch_type)
+                else:
+                    total_stored = self._process_daily_fanout(table_name, api_table, api_config_entry, unique_keys,
+                                                              date_list, param_grid, date_column_in_db, ts_code)
+            else:
+                # 单个参数组合，或 full_paging（翻页停止条件依赖逐页写入，各组合依次处理）
+                for grid_params in param_grid:
+                    logger.info(f"{table_name}: 处理参数组合 {grid_params}")
+                    current_ts_code = grid_params.get('ts_code') or ts_code
+                    param_str = ', '.join(f"{k}={v}" for k, v in grid_params.items())
+                    logger.debug(f"{table_name}: 参数组合 [{param_str or '无'}]")
+
+                    extra = self._grid_extra(api_config_entry, grid_params)
+
+                    if mode == 'full_paging':
+                        total_stored += self._process_full_paging(table_name, api_table, api_config_entry, unique_keys, grid_params, overwrite)
+                    elif mode == 'range':
                         total_stored += self._process_range(table_name, api_table, api_config_entry, unique_keys,
                                                             date_list, current_ts_code, extra, date_column_in_db, overwrite, ts_code)
-                else:
-                    total_stored += self._process_daily(table_name, api_table, api_config_entry, unique_keys,
-                                                        date_list, current_ts_code, extra, date_column_in_db, overwrite, ts_code,
-                                                        param_grid, fetch_type)
-
-            # === Loop 结束后的批量处理 (Range + Overwrite) ===
-            if mode == 'range' and overwrite and len(param_grid) > 1 and 'range_dfs' in locals() and range_dfs:
-                logger.info(f"{table_name}: 检测到多参数 Range 覆盖模式，开始统一存储合并后的 {len(range_dfs)} 个数据集")
-                final_df = pd.concat(range_dfs, ignore_index=True)
-                # 统一调用存储（触发一次性删除 + 插入）
-                # 统一调用存储（触发一次性删除 + 插入）
-                request_start = date_list[0]
-                request_end = date_list[-1]
-
-                # === 针对快照表的覆盖优化 ===
-                overwrite_start = request_start
-                overwrite_end = request_end
-                if not api_config_entry.get('requires_date', True):
-                     logger.info(f"{table_name}: 检测到快照表覆盖模式 (Batch)，将执行全表删除")
-                     overwrite_start = None
-                     overwrite_end = None
-                
-                total_stored = self.storage.store_data(
-                    table_name, final_df, unique_keys,
-                    date_column=date_column_in_db,
-                    storage_mode='replace',
-                    overwrite_start_date=overwrite_start,
-                    overwrite_end_date=overwrite_end,
-                    ts_code=ts_code,
-                    api_config_entry=api_config_entry
-                )
+                    else:
+                        total_stored += self._process_daily(table_name, api_table, api_config_entry, unique_keys,
+                                                            date_list, current_ts_code, extra, date_column_in_db, overwrite, ts_code,
+                                                            param_grid, fetch_type)
 
+            if self.failed_units:
+                # 保留已完成单元：finish() 会清空断点，--resume 重跑将重新拉取整个范围
+                if self.resume:
+                    logger.warning(f"{table_name}: {self.failed_units} 个工作单元未完成，保留断点，"
+                                   f"以 --resume 重新运行只拉取未完成部分")
+                else:
+                    logger.warning(f"{table_name}: {self.failed_units} 个工作单元未完成（未记录断点，需重新运行）")
+            else:
+                self.checkpoint.finish()
             logger.info(f"{table_name}: 日期处理完成。本轮总共存储 {total_stored} 条。")
             return total_stored
 
@@ -112,77 +118,62 @@ class DataProcessor:
         finally:
             logger.info(f"{table_name}: 本轮处理结束")
 
-    def _process_full_paging(self, table_name, api_table, api_config_entry, unique_keys, grid_params):
-        logger.info(f"{table_name}: date_param_mode=full_paging，执行智能增量分页")
+    def _process_full_paging(self, table_name, api_table, api_config_entry, unique_keys, grid_params, overwrite=False):
+        """
+        full_paging 水位增量：逐页拉取并计算页内容哈希（见 watermark.py）。
+
+        - 遇到已知页（哈希命中上次水位，或页内数据已全部原样在库）即停止翻页
+        - 只有发生变化的页以 upsert 方式写入，并更新该页水位
+        - overwrite=True 时忽略水位，完整扫描一遍并刷新全部页
+        """
+        logger.info(f"{table_name}: date_param_mode=full_paging，执行水位增量分页")
         date_col = api_config_entry.get('date_column', 'trade_date')
-        
-        # 获取本地最新日期
-        try:
-            result = self.conn.execute(f"SELECT MAX(\"{date_col}\") FROM \"{table_name}\"").fetchone()
-            local_max_date = result[0] if result and result[0] else '19000101'
-        except Exception:
-             local_max_date = '19000101'
-        
-        logger.info(f"{table_name}: 本地最新 {date_col} = {local_max_date}")
+        limit = api_config_entry.get('limit', 12000)
+        params_key = make_params_key(grid_params)
+        known_hashes = {} if overwrite else load_watermarks(self.conn, table_name, params_key)
+        logger.info(f"{table_name}: 已记录水位 {len(known_hashes)} 页，参数={grid_params or '无'}")
 
         offset = 0
-        limit = api_config_entry.get('limit', 12000)
         total_new = 0
-
+        changed_pages = 0
         while True:
             logger.debug(f"{table_name}: 拉取 offset={offset}")
-            api_params = {'limit': limit, 'offset': offset}
-            api_params.update(grid_params)
-
-            # Use fetcher logic directly here or simpler call? 
-            # Generic fetcher handles retries which is good.
-            # But generic fetcher consumes all pages. Here we want page by page check.
-            # So we use standard API call here or modify fetcher to support this.
-            # For simplicity, I'll use PRO_API directly here as in original code, 
-            # OR better, use fetcher's retry logic if possible.
-            # The original code did manual paging here.
-            
-            # Let's use the fetcher for a single page fetch if we can, but fetcher loops.
-            # So we stick to direct call with simple retry logic or just direct call.
-            # Original code used pro.query directly.
-            
-            try:
-                df_page = PRO_API.query(api_table, **api_params)
-            except Exception as e:
-                logger.error(f"API调用失败: {e}")
+            raw_page = self.fetcher.fetch_page(api_table, dict(grid_params), api_config_entry, offset, limit)
+            if raw_page is None:
+                logger.error(f"{table_name}: offset={offset} 获取失败，停止本轮分页")
                 break
-
-            if df_page is None or df_page.empty:
+            if raw_page.empty:
                 logger.debug(f"{table_name}: 已到最后一页，停止")
                 break
 
-            if date_col not in df_page.columns:
-                logger.error(f"{table_name}: 返回数据缺少 {date_col}，停止")
-                break
+            # 是否最后一页按原始行数判断，清洗（去掉全空行）只影响比对与写入
+            df_page = raw_page.dropna(how='all')
+            if not df_page.empty:
+                page_hash = hash_frame(df_page, unique_keys)
+                if not overwrite and (page_hash in known_hashes or
+                                      count_changed_rows(self.conn, table_name, df_page, api_config_entry) == 0):
+                    logger.info(f"{table_name}: offset={offset} 为已知页，停止拉取")
+                    record_watermark(self.conn, table_name, params_key, offset, page_hash, len(df_page))
+                    break
 
-            df_page[date_col] = pd.to_datetime(df_page[date_col], format='%Y%m%d', errors='coerce')
-            has_new = df_page[date_col].max() > pd.to_datetime(local_max_date, format='%Y%m%d')
+                logger.info(f"{table_name}: offset={offset} 页内容有变化，正在存储...")
+                stored = self.storage.store_data(
+                    table_name, df_page, unique_keys,
+                    date_column=date_col,
+                    storage_mode='upsert',
+                    api_config_entry=api_config_entry
+                )
+                if stored >= 0:
+                    record_watermark(self.conn, table_name, params_key, offset, page_hash, len(df_page))
+                    total_new += stored
+                    changed_pages += 1
 
-            if not has_new:
-                logger.info(f"{table_name}: 本页数据已存在，停止拉取")
+            if len(raw_page) < limit:
                 break
-
-            logger.info(f"{table_name}: 本页包含新数据，正在存储...")
-            stored = self.storage.store_data(
-                table_name, df_page, unique_keys,
-                date_column=date_col,
-                storage_mode='insert_new',
-                api_config_entry=api_config_entry
-            )
-            total_new += stored
-            
-            # Update local_max_date to avoid re-checking strictly if we wanted, 
-            # but the logic relies on max date of page.
-            
             offset += limit
 
         update_metadata(self.conn, table_name, date_col)
-        logger.info(f"{table_name}: 智能增量完成，共新增 {total_new} 条")
+        logger.info(f"{table_name}: 水位增量完成，变化 {changed_pages} 页，共写入 {total_new} 条")
         return total_new
 
     def _fetch_only_range(self, table_name, api_table, api_config_entry, date_list, current_ts_code, extra):
@@ -195,6 +186,10 @@ class DataProcessor:
     def _process_range(self, table_name, api_table, api_config_entry, unique_keys, date_list, current_ts_code, extra, date_column_in_db, overwrite, ts_code):
         request_start = date_list[0]
         request_end = date_list[-1]
+        window = f"{request_start}~{request_end}"
+        if self.checkpoint.is_done(table_name, window, extra):
+            logger.info(f"{table_name}: [resume] 窗口 {window} 已完成，跳过")
+            return 0
         logger.info(f"{table_name}: date_param_mode=range，使用范围拉取 {request_start}~{request_end}")
         
         api_params = build_api_params(table_name, request_start, request_end, current_ts_code, extra)
@@ -211,8 +206,9 @@ class DataProcessor:
                  overwrite_start = None
                  overwrite_end = None
             
-            return self.storage.store_data(
-                table_name, df, unique_keys,
+            stored = self.checkpoint.store_unit(
+                self.storage, table_name, window, df, params=extra,
+                unique_keys=unique_keys,
                 date_column=date_column_in_db,
                 storage_mode=storage_mode,
                 overwrite_start_date=overwrite_start,
@@ -220,8 +216,173 @@ class DataProcessor:
                 ts_code=ts_code,
                 api_config_entry=api_config_entry
             )
+            if stored < 0:
+                self.failed_units += 1
+            return stored
+        if self.fetcher.last_failed:
+            self.failed_units += 1
+        else:
+            self.checkpoint.mark_done(table_name, window, extra)
         return 0
 
+    @staticmethod
+    def _grid_extra(api_config_entry, grid_params):
+        return {**api_config_entry.get('fixed_params', {}), **grid_params, 'config': api_config_entry}
+
+    def _fetch_cells(self, api_table, api_config_entry, requests):
+        """
+        并发拉取多个参数组合（只调用 API，不写库）。
+
+        每个任务使用独立的 TushareFetcher（区分各自的失败状态），
+        共享同一 RateLimiter，总调用频率不超过账户配额。
+
+        Args:
+            requests: [(key, api_params), ...]
+
+        Returns:
+            [(key, df), ...]，与输入顺序一致；df 为 None 表示重试耗尽、获取失败
+        """
+        def fetch_one(api_params):
+            fetcher = TushareFetcher(self.fetcher.api, self.fetcher.rate_limiter)
+            df = fetcher.fetch_data(api_table, api_params, api_config_entry)
+            return None if fetcher.last_failed else df
+
+        if self.fetch_workers <= 1 or len(requests) <= 1:
+            return [(key, fetch_one(api_params)) for key, api_params in requests]
+
+        with ThreadPoolExecutor(max_workers=min(self.fetch_workers, len(requests))) as executor:
+            futures = [executor.submit(fetch_one, api_params) for _, api_params in requests]
+            return [(key, future.result()) for (key, _), future in zip(requests, futures)]
+
+    @staticmethod
+    def _merge_cells(dfs, unique_keys):
+        """合并各参数组合的结果，按唯一键去重（跨组合可能返回重叠数据）"""
+        df = pd.concat(dfs, ignore_index=True)
+        keys = [k for k in (unique_keys or []) if k in df.columns]
+        if keys:
+            df = df.drop_duplicates(subset=keys, keep='last')
+        return df
+
+    def _process_range_fanout(self, table_name, api_table, api_config_entry, unique_keys, date_list, param_grid,
+                              date_column_in_db, overwrite, ts_code):
+        """多参数组合 Range：并发拉取全部组合，合并去重后一次写入"""
+        request_start, request_end = date_list[0], date_list[-1]
+        window = f"{request_start}~{request_end}"
+        requests = []
+        for grid_params in param_grid:
+            extra = self._grid_extra(api_config_entry, grid_params)
+            if self.checkpoint.is_done(table_name, window, extra):
+                continue
+            current_ts_code = grid_params.get('ts_code') or ts_code
+            requests.append((extra, build_api_params(table_name, request_start, request_end, current_ts_code, extra)))
+        if not requests:
+            logger.info(f"{table_name}: [resume] 窗口 {window} 的全部参数组合已完成，跳过")
+            return 0
+
+        logger.info(f"{table_name}: date_param_mode=range，{len(requests)} 个参数组合并发拉取 {window}"
+                    f"（并发 {min(self.fetch_workers, len(requests))}）")
+        results = self._fetch_cells(api_table, api_config_entry, requests)
+        done = [(window, extra) for extra, df in results if df is not None]
+        dfs = [df for _, df in results if df is not None and not df.empty]
+        failed = len(results) - len(done)
+        if failed:
+            self.failed_units += failed
+            logger.warning(f"{table_name}: {failed} 个参数组合获取失败，可稍后以 --resume 重试")
+            if overwrite:
+                # 覆盖会先删除整个日期范围，部分失败时写入会丢失失败组合的旧数据
+                logger.error(f"{table_name}: 覆盖模式下存在获取失败的参数组合，放弃本次覆盖以保留旧数据")
+                self.failed_units += len(done)
+                return 0
+
+        if not dfs:
+            for unit, extra in done:
+                self.checkpoint.mark_done(table_name, unit, extra)
+            return 0
+
+        final_df = self._merge_cells(dfs, unique_keys)
+        logger.info(f"{table_name}: 合并 {len(dfs)} 个参数组合的数据，共 {len(final_df)} 条，统一存储")
+
+        overwrite_start, overwrite_end = request_start, request_end
+        if overwrite and not api_config_entry.get('requires_date', True):
+            logger.info(f"{table_name}: 检测到快照表覆盖模式 (Batch)，将执行全表删除")
+            overwrite_start, overwrite_end = None, None
+
+        stored = self.checkpoint.store_batch(
+            self.storage, table_name, done, final_df,
+            unique_keys=unique_keys,
+            date_column=date_column_in_db,
+            storage_mode='replace' if overwrite else 'insert_new',
+            overwrite_start_date=overwrite_start,
+            overwrite_end_date=overwrite_end,
+            ts_code=ts_code,
+            api_config_entry=api_config_entry
+        )
+        if stored < 0:
+            self.failed_units += len(done)
+        return stored
+
+    def _process_daily_fanout(self, table_name, api_table, api_config_entry, unique_keys, date_list, param_grid,
+                              date_column_in_db, ts_code):
+        """多参数组合逐日（insert_new）：每个日期并发拉取全部组合，合并后一次写入"""
+        is_snapshot = not api_config_entry.get('requires_date', True)
+        if is_snapshot:
+            logger.info(f"{table_name}: 快照模式 (Snapshot)，{len(param_grid)} 个参数组合并发拉取")
+        else:
+            logger.info(f"{table_name}: date_param_mode=single，{len(param_grid)} 个参数组合逐日并发拉取（共 {len(date_list)} 天）")
+        cells = [(grid_params.get('ts_code') or ts_code, self._grid_extra(api_config_entry, grid_params))
+                 for grid_params in param_grid]
+        total_stored = 0
+
+        for current_date in date_list:
+            requests = [
+                (extra, build_api_params(table_name, current_date, current_date, current_ts_code, extra))
+                for current_ts_code, extra in cells
+                if not self.checkpoint.is_done(table_name, current_date, extra)
+            ]
+            if not requests:
+                logger.debug(f"  → [resume] 已完成，跳过: {current_date}")
+                continue
+            if not is_snapshot:
+                logger.info(f"  → 正在拉取: {current_date}（{len(requests)} 个参数组合）")
+
+            done, dfs, hashes = [], [], []
+            for extra, df in self._fetch_cells(api_table, api_config_entry, requests):
+                if df is None:
+                    self.failed_units += 1
+                    continue  # 获取失败，不记录完成，留给 --resume
+                done.append((current_date, extra))
+                if df.empty:
+                    continue
+                if is_snapshot:
+                    # 快照表：该组合内容与上次水位一致时无需写入
+                    params_key = make_params_key(extra)
+                    snapshot_hash = hash_frame(df, unique_keys)
+                    if snapshot_hash in load_watermarks(self.conn, table_name, params_key):
+                        logger.info(f"{table_name}: 参数组合 {params_key} 快照内容与上次水位一致，跳过存储")
+                        continue
+                    hashes.append((params_key, snapshot_hash, len(df)))
+                dfs.append(df)
+
+            if not dfs:
+                for unit, extra in done:
+                    self.checkpoint.mark_done(table_name, unit, extra)
+                continue
+
+            stored = self.checkpoint.store_batch(
+                self.storage, table_name, done, self._merge_cells(dfs, unique_keys),
+                unique_keys=unique_keys,
+                date_column=date_column_in_db,
+                storage_mode='insert_new',
+                api_config_entry=api_config_entry
+            )
+            if stored >= 0:
+                total_stored += stored
+                for params_key, snapshot_hash, rows in hashes:
+                    record_watermark(self.conn, table_name, params_key, 0, snapshot_hash, rows)
+            else:
+                self.failed_units += len(done)
+        return total_stored
+
     def _process_daily(self, table_name, api_table, api_config_entry, unique_keys, date_list, current_ts_code, extra, 
                        date_column_in_db, overwrite, ts_code, param_grid, fetch_type):
         if not api_config_entry.get('requires_date', True):
@@ -259,6 +420,9 @@ class DataProcessor:
             needs_daily_log = api_config_entry.get('requires_date', True)
             
             for current_date in date_list:
+                if self.checkpoint.is_done(table_name, current_date, extra):
+                    logger.debug(f"  → [resume] 已完成，跳过: {current_date}")
+                    continue
                 if needs_daily_log:
                     logger.info(f"  → 正在拉取: {current_date}")
                 else:
@@ -267,6 +431,14 @@ class DataProcessor:
                 api_params = build_api_params(table_name, current_date, current_date, current_ts_code, extra)
                 
                 df = self.fetcher.fetch_data(api_table, api_params, api_config_entry)
+                snapshot_hash = None
+                if not needs_daily_log and df is not None and not df.empty:
+                    # 快照表：内容与上次水位一致时无需写入（覆盖模式仍写入并刷新水位）
+                    snapshot_hash = hash_frame(df, unique_keys)
+                    if not overwrite and snapshot_hash in load_watermarks(self.conn, table_name, make_params_key(extra)):
+                        logger.info(f"{table_name}: 快照内容与上次水位一致，跳过存储")
+                        self.checkpoint.mark_done(table_name, current_date, extra)
+                        continue
                 if df is not None and not df.empty:
                     storage_mode = 'replace' if overwrite else 'insert_new'
                     
@@ -279,8 +451,9 @@ class DataProcessor:
                          ov_start = None
                          ov_end = None
                          
-                    stored = self.storage.store_data(
-                        table_name, df, unique_keys,
+                    stored = self.checkpoint.store_unit(
+                        self.storage, table_name, current_date, df, params=extra,
+                        unique_keys=unique_keys,
                         date_column=date_column_in_db,
                         storage_mode=storage_mode,
                         overwrite_start_date=ov_start,
@@ -290,25 +463,33 @@ class DataProcessor:
                     )
                     if stored >= 0:
                         total_stored += stored
+                        if snapshot_hash:
+                            record_watermark(self.conn, table_name, make_params_key(extra), 0, snapshot_hash, len(df))
+                    else:
+                        self.failed_units += 1
+                elif self.fetcher.last_failed:
+                    self.failed_units += 1
+                else:
+                    self.checkpoint.mark_done(table_name, current_date, extra)
             return total_stored
 
     def _batch_fetch_and_store(self, table_name, api_table, api_config_entry, unique_keys, date_list, param_grid, ts_code, date_column_in_db):
         logger.info(f"{table_name}: 检测到多参数组合 + 覆盖模式，使用优化：全量拉取后统一删除并插入（安全表）")
-        all_dfs = []
+        requests = []
         for grid_params in param_grid:
             current_ts_code = grid_params.get('ts_code') or ts_code
             extra = {**grid_params, 'config': api_config_entry}
-            
-            # Fetch daily for each date (standard loop capture)
-            dfs_for_grid = []
             for current_date in date_list:
                 api_params = build_api_params(table_name, current_date, current_date, current_ts_code, extra)
-                df = self.fetcher.fetch_data(api_table, api_params, api_config_entry)
-                if df is not None and not df.empty:
-                    dfs_for_grid.append(df)
-            
-            if dfs_for_grid:
-                all_dfs.append(pd.concat(dfs_for_grid, ignore_index=True))
+                requests.append((current_date, api_params))
+
+        # 各参数组合 × 日期并发拉取，合并后统一覆盖
+        results = self._fetch_cells(api_table, api_config_entry, requests)
+        if any(df is None for _, df in results):
+            logger.error(f"{table_name}: 覆盖模式下存在获取失败的请求，放弃本次覆盖以保留旧数据")
+            self.failed_units += len(results)
+            return 0
+        all_dfs = [df for _, df in results if not df.empty]
 
         if all_dfs:
             df_combined = pd.concat(all_dfs, ignore_index=True)
@@ -327,18 +508,21 @@ class DataProcessor:
 
     def _batch_fetch_and_store_multicode(self, table_name, api_table, api_config_entry, unique_keys, date_list, param_grid, ts_code, date_column_in_db):
          logger.info(f"{table_name}: 多 ts_code 日线表 + 覆盖模式，强制执行全量拉取 → 统一删除 → 统一插入")
-         all_dfs = []
          request_start, request_end = date_list[0], date_list[-1]
-         
+         requests = []
          for grid_params in param_grid:
              current_ts_code = grid_params.get('ts_code') or ts_code
              extra_grid = {**grid_params, 'config': api_config_entry}
              api_params_grid = build_api_params(table_name, request_start, request_end,current_ts_code, extra_grid)
-             
-             df = self.fetcher.fetch_data(api_table, api_params_grid, api_config_entry)
-             if df is not None and not df.empty:
-                 all_dfs.append(df)
-                 
+             requests.append((current_ts_code, api_params_grid))
+
+         results = self._fetch_cells(api_table, api_config_entry, requests)
+         if any(df is None for _, df in results):
+             logger.error(f"{table_name}: 覆盖模式下存在获取失败的 ts_code，放弃本次覆盖以保留旧数据")
+             self.failed_units += len(results)
+             return 0
+         all_dfs = [df for _, df in results if not df.empty]
+
          if all_dfs:
              df_combined = pd.concat(all_dfs, ignore_index=True)
              logger.info(f"{table_name}: 全量拉取完成，共 {len(df_combined)} 条，准备统一覆盖")
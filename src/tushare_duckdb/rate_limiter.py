@@ -0,0 +1,41 @@
+import time
+import threading
+from collections import deque
+
+from .config import API_RATE_LIMIT
+from .logger import logger
+
+
+class RateLimiter:
+    """
+    线程安全的 API 调用配额（60 秒滑动窗口）。
+
+    所有线程共享同一个实例时，总调用频率不会超过 calls_per_minute，
+    用于并行获取时替代各脚本中手写的 time.sleep / 计数器限流。
+    """
+
+    def __init__(self, calls_per_minute=API_RATE_LIMIT, window_seconds=60):
+        self.calls_per_minute = calls_per_minute
+        self.window_seconds = window_seconds
+        self._calls = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """阻塞直到获得一次调用额度"""
+        if not self.calls_per_minute:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._calls and now - self._calls[0] >= self.window_seconds:
+                    self._calls.popleft()
+                if len(self._calls) < self.calls_per_minute:
+                    self._calls.append(now)
+                    return
+                wait = self.window_seconds - (now - self._calls[0])
+            logger.debug(f"API 配额已用尽，等待 {wait:.1f} 秒")
+            time.sleep(max(wait, 0.01))
+
+
+# 进程内共享的默认限流器（TushareFetcher 默认使用）
+api_rate_limiter = RateLimiter(API_RATE_LIMIT)
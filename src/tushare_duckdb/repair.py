@@ -0,0 +1,153 @@
+"""
+批量修复管道 (Bulk Repair)
+
+缺口修复脚本（fix_daily_gaps、validate_comprehensive）共用：
+
+- 缺失日期（或其他请求单元）在线程池中并发调用 API，每个任务独立的 TushareFetcher
+  共享同一 RateLimiter，总调用频率不超过 API_RATE_LIMIT
+- 结果按完成顺序累积，每 batch_size 个单元合并为一批，经 DuckDBStorage 一次写入
+  （insert_new 反连接去重，或 upsert 按唯一键替换），每批一个事务
+- 可按目标 (ts_code, 日期) 过滤，只写入确实缺失的记录
+
+写入始终在调用线程中进行，同一连接只有一个写者。
+"""
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import pandas as pd
+
+from .config import API_CONFIG, API_FETCH_WORKERS
+from .fetcher import TushareFetcher
+from .storage import DuckDBStorage
+from .logger import logger
+
+
+def find_table_config(table_name):
+    """在所有类别中查找表配置"""
+    for category_config in API_CONFIG.values():
+        tables = category_config.get('tables', {})
+        if table_name in tables:
+            return tables[table_name]
+    raise KeyError(f"settings.yaml 中未配置表 {table_name}")
+
+
+def date_requests(table_name, dates):
+    """按日请求：[(日期, {date_param: 日期}), ...]"""
+    config = find_table_config(table_name)
+    date_param = config.get('date_param', config.get('date_column', 'trade_date'))
+    return [(str(d), {date_param: str(d)}) for d in dates]
+
+
+def target_filter(targets, date_column='trade_date'):
+    """
+    目标记录过滤器：只保留 targets 中列出的 (ts_code, 日期)。
+
+    Args:
+        targets: 含 ts_code 与 date_column 列的 DataFrame（如缺口扫描结果）
+
+    Returns:
+        select(key, df) 函数，key 为日期
+    """
+    codes_by_date = targets.astype({date_column: str}).groupby(date_column)['ts_code'].agg(set).to_dict()
+
+    def select(key, df):
+        return df[df['ts_code'].isin(codes_by_date.get(str(key), ()))]
+    return select
+
+
+def iter_fetch(table_name, requests, workers=API_FETCH_WORKERS, api=None):
+    """
+    并发拉取请求单元，按完成顺序逐个产出。
+
+    Yields:
+        (key, df)；df 为 None 表示重试耗尽、获取失败
+    """
+    config = find_table_config(table_name)
+
+    def fetch_one(api_params):
+        fetcher = TushareFetcher(api)
+        df = fetcher.fetch_data(table_name, api_params, config)
+        return None if fetcher.last_failed else df
+
+    if workers <= 1 or len(requests) <= 1:
+        for key, api_params in requests:
+            yield key, fetch_one(api_params)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(workers, len(requests))) as executor:
+        futures = {executor.submit(fetch_one, api_params): key for key, api_params in requests}
+        for future in as_completed(futures):
+            try:
+                df = future.result()
+            except Exception as e:
+                logger.error(f"{table_name}: {futures[future]} 获取出错: {e}")
+                df = None
+            yield futures[future], df
+
+
+def repair_table(conn, table_name, requests, select=None, storage_mode='insert_new', batch_size=20,
+                 workers=API_FETCH_WORKERS, api=None):
+    """
+    并发拉取并批量写入一张表。
+
+    Args:
+        conn: 可写连接
+        requests: [(key, api_params), ...]，key 用于日志与统计（通常为日期）
+        select: 可选 select(key, df) → df，只保留需要写入的记录
+        storage_mode: 'insert_new'（只补缺失记录）或 'upsert'（按唯一键替换）
+        batch_size: 每批合并写入的请求单元数
+
+    Returns:
+        dict: {'fetched', 'inserted', 'skipped', 'errors': [(key, 原因), ...]}
+    """
+    config = find_table_config(table_name)
+    unique_keys = config.get('unique_keys', [])
+    # 按目标过滤时只写入部分记录，不做入库异常检测
+    storage = DuckDBStorage(conn, monitor=select is None)
+    stats = {'fetched': 0, 'inserted': 0, 'skipped': 0, 'errors': []}
+    pending, pending_keys = [], []
+
+    def flush():
+        if not pending:
+            return
+        df = pd.concat(pending, ignore_index=True)
+        keys = [k for k in unique_keys if k in df.columns]
+        if keys:
+            df = df.drop_duplicates(subset=keys, keep='last')
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            stored = storage.store_data(table_name, df, unique_keys, date_column=config.get('date_column'),
+                                        storage_mode=storage_mode, api_config_entry=config)
+            if stored < 0:
+                conn.execute("ROLLBACK")
+                stats['errors'].extend((k, '写入失败') for k in pending_keys)
+            else:
+                conn.execute("COMMIT")
+                stats['inserted'] += stored
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"{table_name}: 批量写入失败: {e}")
+            stats['errors'].extend((k, str(e)) for k in pending_keys)
+        pending.clear()
+        pending_keys.clear()
+
+    total = len(requests)
+    for i, (key, df) in enumerate(iter_fetch(table_name, requests, workers, api), 1):
+        if df is None:
+            stats['errors'].append((key, '获取失败'))
+            continue
+        stats['fetched'] += len(df)
+        if select is not None and not df.empty:
+            df = select(key, df)
+        if df.empty:
+            stats['skipped'] += 1
+            continue
+        pending.append(df)
+        pending_keys.append(key)
+        if len(pending) >= batch_size:
+            flush()
+            logger.info(f"{table_name}: 已处理 {i}/{total}，累计写入 {stats['inserted']} 条")
+    flush()
+
+    logger.info(f"{table_name}: 修复完成，获取 {stats['fetched']} 条，写入 {stats['inserted']} 条，"
+                f"跳过 {stats['skipped']} 个，失败 {len(stats['errors'])} 个")
+    return stats
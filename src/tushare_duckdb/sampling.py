@@ -0,0 +1,163 @@
+"""
+抽样校验 (Sampling)
+
+日常快速体检不需要对全部股票 / 合约精确统计覆盖率。这里在 DuckDB 中完成抽样，
+再由样本估计总体的缺口率并给出置信区间：
+
+- reservoir : 蓄水池抽样，USING SAMPLE reservoir(n ROWS)，等概率抽取 n 个单元
+- stratified: 分层抽样，按分层表达式（如交易所、上市年份）分组，各层按规模比例分配样本
+              （每层至少 1 个），层内按随机顺序取前 n_h 个
+
+估计量：
+- 比例（如不完整合约占比）：分层加权比例，置信区间为以有效样本量计算的 Wilson 区间
+- 比率（如缺失交易日 / 应有交易日）：分层合并比率估计，线性化方差的正态区间
+
+均含有限总体校正，sample_size <= 0 时为全量普查，区间退化为点估计。
+"""
+import math
+
+SAMPLE_METHODS = ('reservoir', 'stratified')
+CONFIDENCE_Z = 1.96  # 95% 置信水平
+
+
+def create_sample(conn, name, source_sql, sample_size, method='reservoir', strata=(), key='ts_code',
+                  seed=None, params=None):
+    """
+    在连接上创建抽样临时表。
+
+    Args:
+        name: 临时表名，结果包含 source_sql 的全部列及 _stratum（所属层）
+        source_sql: 总体查询（SELECT 语句）
+        sample_size: 样本量，<= 0 时取全部
+        method: 'reservoir' 或 'stratified'
+        strata: 分层 SQL 表达式，仅 stratified 使用
+        key: 唯一键列，stratified 层内随机排序时使用
+        seed: 随机种子，指定时抽样结果可复现
+        params: source_sql 的绑定参数
+
+    Returns:
+        {层: 总体单元数}
+    """
+    if method not in SAMPLE_METHODS:
+        raise ValueError(f"未知抽样方法: {method}（可选 {', '.join(SAMPLE_METHODS)}）")
+    params = list(params or [])
+    stratum = "'all'"
+    if method == 'stratified' and strata:
+        stratum = " || '/' || ".join(f"COALESCE(CAST({expr} AS VARCHAR), '?')" for expr in strata)
+
+    population = dict(conn.execute(
+        f"SELECT {stratum} AS _stratum, COUNT(*) FROM ({source_sql}) GROUP BY 1", params
+    ).fetchall())
+    total = sum(population.values())
+
+    if sample_size <= 0 or sample_size >= total:
+        sample_sql = f"SELECT *, {stratum} AS _stratum FROM ({source_sql})"
+    elif method == 'reservoir':
+        repeatable = f" REPEATABLE ({int(seed)})" if seed is not None else ''
+        sample_sql = (f"SELECT *, {stratum} AS _stratum FROM ({source_sql}) "
+                      f"USING SAMPLE reservoir({int(sample_size)} ROWS){repeatable}")
+    else:
+        # 指定种子时按 md5(键, 种子) 排序，与键本身的任何规律无关且可复现
+        order = f"md5(CAST({key} AS VARCHAR) || '/{int(seed)}')" if seed is not None else "random()"
+        sample_sql = f"""
+            SELECT * EXCLUDE (_rn, _size) FROM (
+                SELECT *, {stratum} AS _stratum,
+                       row_number() OVER (PARTITION BY {stratum} ORDER BY {order}) AS _rn,
+                       COUNT(*) OVER (PARTITION BY {stratum}) AS _size
+                FROM ({source_sql})
+            )
+            WHERE _rn <= GREATEST(1, round({int(sample_size)} * _size / {total}))
+        """
+    conn.execute(f"CREATE OR REPLACE TEMP TABLE {name} AS {sample_sql}", params)
+    return population
+
+
+def _strata_summary(units, population):
+    """按层分组样本单元，返回 [(层权重 W_h, 抽样比 f_h, 层样本 DataFrame), ...]"""
+    total = sum(population.values())
+    groups = []
+    for stratum, size in population.items():
+        part = units[units['_stratum'] == stratum]
+        if size and len(part):
+            groups.append((size / total, min(1.0, len(part) / size), part))
+    return groups
+
+
+def _wilson(p, n_eff, z=CONFIDENCE_Z):
+    if n_eff == math.inf:
+        return p, p
+    if n_eff <= 0:
+        return 0.0, 1.0
+    denom = 1 + z * z / n_eff
+    center = (p + z * z / (2 * n_eff)) / denom
+    half = z * math.sqrt(p * (1 - p) / n_eff + z * z / (4 * n_eff * n_eff)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def estimate_proportion(units, population, flag, z=CONFIDENCE_Z):
+    """
+    估计总体中 flag 为真的单元比例。
+
+    Args:
+        units: 样本 DataFrame，含 _stratum 与布尔列 flag
+        population: {层: 总体单元数}
+
+    Returns:
+        (估计值, 下限, 上限)；无样本时为 None
+    """
+    groups = _strata_summary(units, population)
+    if not groups:
+        return None
+    p, var, n = 0.0, 0.0, 0
+    for weight, frac, part in groups:
+        n_h = len(part)
+        p_h = float(part[flag].mean())
+        p += weight * p_h
+        if n_h > 1:
+            var += weight * weight * (1 - frac) * p_h * (1 - p_h) / (n_h - 1)
+        n += n_h
+
+    if all(frac >= 1.0 for _, frac, _ in groups):
+        n_eff = math.inf
+    elif var > 0:
+        n_eff = p * (1 - p) / var
+    else:
+        # 各层样本比例均为 0 或 1，方差无法估计，按样本量计算 Wilson 区间
+        n_eff = n
+    low, high = _wilson(p, n_eff, z)
+    return p, low, high
+
+
+def estimate_ratio(units, population, numerator, denominator, z=CONFIDENCE_Z):
+    """
+    估计总体比率 Σnumerator / Σdenominator（分层合并比率估计）。
+
+    Returns:
+        (估计值, 下限, 上限)；无样本或分母为 0 时为 None
+    """
+    groups = _strata_summary(units, population)
+    if not groups:
+        return None
+    y = sum(weight * part[numerator].mean() for weight, _, part in groups)
+    x = sum(weight * part[denominator].mean() for weight, _, part in groups)
+    if not x:
+        return None
+    ratio = y / x
+    var = 0.0
+    for weight, frac, part in groups:
+        n_h = len(part)
+        if n_h > 1:
+            residual = part[numerator] - ratio * part[denominator]
+            var += weight * weight * (1 - frac) * float(residual.var(ddof=1)) / n_h
+    half = z * math.sqrt(var) / x
+    return ratio, max(0.0, ratio - half), min(1.0, ratio + half)
+
+
+def format_estimate(estimate):
+    """格式化为 '1.23% (95% CI 0.80% ~ 1.90%)'，普查时只显示点估计"""
+    if estimate is None:
+        return '-'
+    value, low, high = estimate
+    if low == high == value:
+        return f"{value * 100:.2f}%"
+    return f"{value * 100:.2f}% (95% CI {low * 100:.2f}% ~ {high * 100:.2f}%)"
@@ -0,0 +1,164 @@
+"""
+依赖感知的并行调度器 (DAG Scheduler)
+
+- 任务之间声明依赖（如 opt_basic → opt_daily），依赖完成后才会调度下游任务
+- 每个任务属于一个写入组（通常是 DuckDB 文件路径），同一组同一时刻只有一个任务在执行，
+  即「每个文件一个写者」；不同组之间并行
+- 就绪任务按 priority 排序（数值越小越优先），同优先级时下游任务多的（关键路径）优先
+
+API 调用频率由 TushareFetcher 共享的 RateLimiter 统一控制。
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .logger import logger
+
+
+class DagTask:
+    def __init__(self, name, group, func, priority=100, order=0):
+        """
+        Args:
+            name: 任务名（在 DAG 内唯一）
+            group: 写入组，同组任务串行执行
+            func: 无参可调用对象，返回值作为任务结果
+            priority: 数值越小越先调度
+            order: 声明顺序，作为最终的排序依据
+        """
+        self.name = name
+        self.group = group
+        self.func = func
+        self.priority = priority
+        self.order = order
+
+
+def _descendant_counts(names, dependencies):
+    """每个任务的（传递）下游任务数，并检查环"""
+    children = {n: set() for n in names}
+    indegree = {n: 0 for n in names}
+    for name in names:
+        for dep in dependencies.get(name, []):
+            if dep in children:
+                children[dep].add(name)
+                indegree[name] += 1
+
+    # Kahn 拓扑排序检测环
+    queue = [n for n in names if indegree[n] == 0]
+    topo = []
+    while queue:
+        n = queue.pop()
+        topo.append(n)
+        for c in children[n]:
+            indegree[c] -= 1
+            if indegree[c] == 0:
+                queue.append(c)
+    if len(topo) != len(names):
+        cycle = [n for n in names if indegree[n] > 0]
+        raise ValueError(f"任务依赖存在环: {cycle}")
+
+    descendants = {}
+    for n in reversed(topo):
+        d = set(children[n])
+        for c in children[n]:
+            d |= descendants[c]
+        descendants[n] = d
+    return {n: len(d) for n, d in descendants.items()}
+
+
+def topological_order(names, dependencies):
+    """
+    依赖在前的稳定顺序（串行执行用）：保持声明顺序，只把上游任务提前到其下游之前。
+    不在 names 中的依赖忽略。
+    """
+    names = list(names)
+    _descendant_counts(names, dependencies)  # 检查环
+    ordered = []
+    seen = set()
+
+    def visit(name):
+        if name in seen:
+            return
+        seen.add(name)
+        for dep in dependencies.get(name, []):
+            if dep in names:
+                visit(dep)
+        ordered.append(name)
+
+    for name in names:
+        visit(name)
+    return ordered
+
+
+def run_dag(tasks, dependencies=None, max_workers=4, should_stop=None):
+    """
+    执行任务 DAG。
+
+    Args:
+        tasks: DagTask 列表
+        dependencies: {任务名: [依赖任务名, ...]}，不在本次任务集合中的依赖视为已满足
+        max_workers: 最大并行任务数（实际并行度不超过写入组数）
+        should_stop: 可选的无参函数，返回 True 时不再调度新任务
+
+    Returns:
+        dict: {任务名: ('success', 结果) | ('failed', 异常) | ('skipped', None)}
+    """
+    dependencies = dependencies or {}
+    by_name = {t.name: t for t in tasks}
+    fanout = _descendant_counts(list(by_name), dependencies)
+
+    pending = set(by_name)
+    finished = set()
+    busy_groups = set()
+    results = {}
+    cond = threading.Condition()
+
+    def deps_ready(name):
+        return all(d in finished or d not in by_name for d in dependencies.get(name, []))
+
+    def sort_key(task):
+        return (task.priority, -fanout[task.name], task.order)
+
+    def next_task():
+        with cond:
+            while True:
+                if should_stop and should_stop():
+                    return None
+                ready = [by_name[n] for n in pending if deps_ready(n) and by_name[n].group not in busy_groups]
+                if ready:
+                    task = min(ready, key=sort_key)
+                    pending.discard(task.name)
+                    busy_groups.add(task.group)
+                    return task
+                if not pending:
+                    return None
+                cond.wait()
+
+    def worker():
+        while True:
+            task = next_task()
+            if task is None:
+                return
+            failed_deps = [d for d in dependencies.get(task.name, []) if results.get(d, ('',))[0] == 'failed']
+            if failed_deps:
+                logger.warning(f"[调度] {task.name}: 上游任务失败 {failed_deps}，仍继续执行")
+            try:
+                outcome = ('success', task.func())
+            except Exception as e:
+                outcome = ('failed', e)
+            with cond:
+                results[task.name] = outcome
+                finished.add(task.name)
+                busy_groups.discard(task.group)
+                cond.notify_all()
+
+    n_groups = len({t.group for t in tasks})
+    n_workers = max(1, min(max_workers, n_groups))
+    logger.info(f"[调度] {len(tasks)} 个任务, {n_groups} 个写入组, 并行度 {n_workers}")
+
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        futures = [executor.submit(worker) for _ in range(n_workers)]
+        for f in futures:
+            f.result()
+
+    for name in pending:
+        results[name] = ('skipped', None)
+    return results
@@ -2,11 +2,37 @@ import time
 import pandas as pd
 from .utils import get_columns
 from .metadata import update_metadata
+from .ingest_monitor import (monitor_mode, init_ingest_stats, profile_nulls, period_keys, check_batch,
+                             quarantine, record_batch)
 from .logger import logger
 
 class DuckDBStorage:
-    def __init__(self, conn):
+    def __init__(self, conn, monitor=True):
         self.conn = conn
+        # 入库异常检测（见 ingest_monitor.py）；写入的只是部分代码/部分记录时（如按 ts_code 拉取、
+        # 按目标过滤的补数）各日期行数不可比，调用方应关闭
+        self.monitor = monitor
+        # 台账在构造时（调用方开启写入事务之前）建表，store_data 中只读基线、随数据写入台账
+        self.ledger_ready = False
+        if monitor_mode() != 'off':
+            try:
+                init_ingest_stats(conn)
+                self.ledger_ready = True
+            except Exception as e:
+                logger.warning(f"入库台账 ingest_stats 初始化失败，不做入库异常检测: {e}")
+
+    def _monitor_enabled(self, df, date_column, ts_code, api_config_entry):
+        """
+        只检测逐交易日拉取全市场数据的表（date_type=trade、date_param_mode=single），
+        这类表各交易日行数稳定，可与基线比较。公告 / 事件 / 财报类表（按 ann_date、end_date，
+        natural 日期或范围拉取）每日行数本就起伏，快照表与限定 ts_code 的写入也不检测。
+        """
+        config = api_config_entry or {}
+        return (self.monitor and self.ledger_ready and monitor_mode() != 'off' and ts_code is None
+                and bool(date_column) and date_column in df.columns
+                and config.get('requires_date', True)
+                and config.get('date_type') == 'trade'
+                and config.get('date_param_mode', 'single') == 'single')
 
     def store_data(self, table_name, df, unique_keys, date_column='trade_date', storage_mode='insert_new',
                            overwrite_start_date=None, overwrite_end_date=None, ts_code=None, api_config_entry=None):
@@ -40,6 +66,12 @@ class DuckDBStorage:
                     logger.info(f"{table_name}: 字段重命名成功: {rename_dict}")
         # === 映射结束 ===
 
+        # 入库异常检测：主键空值率在清洗（丢弃缺失 ts_code 等）之前统计
+        monitor = self._monitor_enabled(processed_df, date_column, ts_code, api_config_entry)
+        null_rates = {}
+        if monitor:
+            null_rates = profile_nulls(processed_df, date_column, [k for k in unique_keys if k != date_column])
+
         # === Finance Pre-processing Hook ===
         # 针对财务数据的特殊清洗逻辑
         # 判断依据：config category='finance' (但这里没直接传 category)，或者根据 table_name 判断
@@ -158,6 +190,29 @@ class DuckDBStorage:
                 logger.warning(f"{table_name}: 过滤后为空，跳过存储")
                 return 0
 
+        # === 入库异常检测：本批各日期行数 / 空值率与台账基线比较 ===
+        counts, anomalies, quarantined = {}, {}, []
+        if monitor:
+            periods = period_keys(processed_df[date_column])
+            counts = periods.value_counts().to_dict()
+            try:
+                anomalies = check_batch(self.conn, table_name, counts, null_rates)
+            except Exception as e:
+                # 未经检查的日期不写入台账，以免进入后续基线
+                logger.warning(f"{table_name}: 入库异常检测失败，跳过: {e}")
+                counts, anomalies = {}, {}
+            for period, reason in sorted(anomalies.items()):
+                logger.warning(f"{table_name}: [入库异常] {period} {reason}")
+            if anomalies and monitor_mode() == 'quarantine':
+                bad = periods.isin(list(anomalies)).values
+                quarantine_table = quarantine(self.conn, table_name, processed_df[bad])
+                quarantined = sorted(anomalies)
+                logger.warning(f"{table_name}: {int(bad.sum())} 条异常日期记录已转入 {quarantine_table}，未写入主表")
+                processed_df = processed_df[~bad]
+                if processed_df.empty:
+                    record_batch(self.conn, table_name, counts, null_rates, anomalies, 'quarantined')
+                    return 0
+
         temp_view_name = f"temp_view_{table_name}_{int(time.time() * 1000)}"
         try:
             self.conn.register(temp_view_name, processed_df)
@@ -175,6 +230,11 @@ class DuckDBStorage:
                 if ts_code:
                     delete_query += f" AND ts_code = '{ts_code}'"
                     current_count_query += f" AND ts_code = '{ts_code}'"
+                if quarantined:
+                    # 被隔离的日期保留主表中的旧数据
+                    kept = ", ".join(f"'{p}'" for p in quarantined)
+                    delete_query += f" AND \"{date_column}\" NOT IN ({kept})"
+                    current_count_query += f" AND \"{date_column}\" NOT IN ({kept})"
 
                 current_count = self.conn.execute(current_count_query).fetchone()[0]
                 logger.info(
@@ -190,6 +250,13 @@ class DuckDBStorage:
                 self.conn.execute(f"DELETE FROM \"{table_name}\"")
                 logger.info(f"{table_name}: 删除所有记录执行完成")
 
+            elif storage_mode == 'upsert':
+                # upsert 模式：删除与本批唯一键相同的旧记录，随后整体插入（用于内容变化的页）
+                key_cols = ", ".join(f'"{k}"' for k in unique_keys)
+                self.conn.execute(
+                    f'DELETE FROM "{table_name}" WHERE ({key_cols}) IN (SELECT {key_cols} FROM "{temp_view_name}")')
+                logger.info(f"{table_name}: 已按唯一键删除本批 {len(processed_df)} 条记录对应的旧版本")
+
             # === 2. 插入数据 ===
             columns_str = ", ".join([f'"{col}"' for col in processed_df.columns])
             
@@ -214,7 +281,7 @@ class DuckDBStorage:
                 inserted_count = after_count - before_count
                 logger.info(f"{table_name}: 实际插入 {inserted_count} 条新记录（NOT EXISTS 去重后）")
             else:
-                # replace 模式：直接插入
+                # replace / upsert 模式：直接插入
                 insert_query = f"""
                     INSERT INTO "{table_name}" ({columns_str})
                     SELECT {columns_str} FROM "{temp_view_name}"
@@ -223,7 +290,11 @@ class DuckDBStorage:
                 after_count = self.conn.execute(f"SELECT COUNT(*) FROM \"{table_name}\"").fetchone()[0]
                 net_change = after_count - before_count
                 inserted_count = len(processed_df)
-                logger.info(f"{table_name}: 插入 {inserted_count} 条记录（覆盖模式，净新增 {net_change} 条）")
+                logger.info(f"{table_name}: 插入 {inserted_count} 条记录（{storage_mode} 模式，净新增 {net_change} 条）")
+
+            if counts:
+                record_batch(self.conn, table_name, counts, null_rates, anomalies,
+                             'quarantined' if quarantined else 'flagged')
 
             # === 3. 更新元数据 ===
             update_metadata(self.conn, table_name, date_column)
@@ -9,6 +9,7 @@ except ImportError:
 
 from contextlib import contextmanager
 from itertools import product
+from bisect import bisect_left, bisect_right
 import calendar
 from dateutil.relativedelta import relativedelta
 
@@ -50,7 +51,32 @@ def get_all_dates(start_date, end_date):
         return []
 
 
+# 交易日历内存缓存：并行调度时由主线程预加载，避免工作线程以只读方式
+# 打开正被其他线程写入的 stock 库（DuckDB 同进程内不允许不同配置的连接）
+_TRADE_CAL_CACHE = {}
+
+
+def preload_trade_calendar(db_path, exchange='SSE'):
+    """一次性加载某交易所的全部开市日到内存，返回日期数量"""
+    with get_connection(db_path, read_only=True) as conn:
+        if not table_exists(conn, 'trade_cal'):
+            return 0
+        rows = conn.execute(
+            "SELECT cal_date FROM trade_cal WHERE exchange = ? AND is_open = 1 ORDER BY cal_date", [exchange]
+        ).fetchall()
+    _TRADE_CAL_CACHE[exchange] = [r[0] for r in rows]
+    return len(_TRADE_CAL_CACHE[exchange])
+
+
+def clear_trade_calendar_cache():
+    _TRADE_CAL_CACHE.clear()
+
+
 def get_trade_dates(db_path, start_date, end_date, exchange='SSE', conn=None):
+    if exchange in _TRADE_CAL_CACHE:
+        cal = _TRADE_CAL_CACHE[exchange]
+        return cal[bisect_left(cal, start_date):bisect_right(cal, end_date)]
+
     if conn:
         return _query_trade_dates(conn, start_date, end_date, exchange)
     
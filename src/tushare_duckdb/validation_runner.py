@@ -0,0 +1,172 @@
+"""
+并行校验执行器
+
+校验全部为只读操作，各 DuckDB 文件之间互不依赖。这里把每个数据库的校验
+分发到进程池（各进程以只读方式打开连接），完成一个即输出一个进度，
+最后合并 table_status / daily_data。总耗时取决于最慢的数据库，而不是所有数据库之和。
+
+同一数据库文件上的多个类别（如 stock 与 stock_events）合并为一个任务，
+由覆盖率引擎在同一连接上完成查询。
+
+incremental=True 时各数据库只重新统计上次校验后有写入的期间（见 validation_state.py），
+适合每日数据更新后的快速校验。子进程只返回待保存的校验状态，
+由主进程在汇总结果后逐库写入，进程池中不打开可写连接。
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from .config import API_CONFIG, BASIC_DB_PATH
+from .data_validation import get_database_status
+from .logger import logger
+from .validation_state import save_validation_state
+
+
+def category_frequency(category):
+    """类别的校验频率：finance 按报告期，其余按日"""
+    return 'quarterly' if category == 'finance' else 'daily'
+
+
+def build_validation_jobs(categories):
+    """
+    按数据库文件分组校验任务。
+
+    Returns:
+        {db_path: [(category, frequency, [(table_name, date_column), ...]), ...]}，保持类别顺序
+    """
+    jobs = {}
+    for category in categories:
+        config = API_CONFIG.get(category)
+        if not config or 'db_path' not in config:
+            continue
+        tables = [(t, config['tables'][t].get('date_column')) for t in config.get('tables', {})]
+        if tables:
+            jobs.setdefault(config['db_path'], []).append((category, category_frequency(category), tables))
+    return jobs
+
+
+def validate_database(db_path, groups, start_date, end_date, detailed=True, basic_db_path=BASIC_DB_PATH,
+                      exchange='SSE', incremental=False):
+    """
+    校验单个数据库文件中的多个类别（进程池任务，需为模块级函数）。
+
+    Returns:
+        (table_status, {frequency: [daily_data, ...]}, {frequency: 待保存的校验状态})
+    """
+    table_status = []
+    details = {}
+    state = {}
+    for category, frequency, tables in groups:
+        status, daily = get_database_status(
+            db_path=db_path,
+            basic_db_path=basic_db_path,
+            tables=tables,
+            start_date=start_date or None,
+            end_date=end_date or None,
+            detailed=detailed,
+            exchange=exchange,
+            frequency=frequency,
+            verbose=False,
+            incremental=incremental,
+            pending_state=state.setdefault(frequency, {})
+        )
+        table_status.extend(status)
+        if daily:
+            details.setdefault(frequency, []).append(daily)
+    return table_status, details, state
+
+
+def run_checks(tasks, max_workers=None, on_done=None):
+    """
+    在进程池中并行执行相互独立的只读检查。
+
+    Args:
+        tasks: {名称: (函数, args 元组)}，函数需为模块级函数（可被 pickle）
+        max_workers: 进程数，默认 min(CPU 数, 任务数)；1 时在当前进程顺序执行
+        on_done: 可选回调 on_done(名称, 结果, 已用时秒数)，每完成一个任务调用一次
+
+    Returns:
+        {名称: 结果}；任务抛出异常时结果为 None
+    """
+    results = {}
+    if not tasks:
+        return results
+    n_workers = max(1, min(max_workers or os.cpu_count() or 1, len(tasks)))
+    total = len(tasks)
+    start = time.time()
+
+    def report(name, result, elapsed):
+        results[name] = result
+        logger.info(f"[校验] ({len(results)}/{total}) {name} 完成，已用时 {elapsed:.1f}s")
+        if on_done:
+            on_done(name, result, elapsed)
+
+    if n_workers == 1:
+        for name, (func, args) in tasks.items():
+            try:
+                result = func(*args)
+            except Exception as e:
+                logger.error(f"[校验] {name} 失败: {e}")
+                result = None
+            report(name, result, time.time() - start)
+        return results
+
+    logger.info(f"[校验] {total} 个任务，{n_workers} 个进程并行")
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {executor.submit(func, *args): name for name, (func, args) in tasks.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                logger.error(f"[校验] {name} 失败: {e}")
+                result = None
+            report(name, result, time.time() - start)
+    return results
+
+
+def merge_period_rows(tables_of_rows, key):
+    """按期间键（'日期' / '报告期'）横向合并多个 daily_data，按期间排序"""
+    merged = {}
+    for rows in tables_of_rows:
+        for row in rows:
+            merged.setdefault(row[key], {}).update(row)
+    return [merged[k] for k in sorted(merged)]
+
+
+def run_validation(categories, start_date, end_date, detailed=True, max_workers=None, exchange='SSE', on_done=None,
+                   incremental=False):
+    """
+    并行校验多个类别。
+
+    Returns:
+        (table_status, daily_data, report_data)
+        - table_status: 按类别顺序合并的表状态
+        - daily_data: 所有日频类别按 '日期' 合并的逐日详情
+        - report_data: 财务类别按 '报告期' 合并的详情
+    """
+    jobs = build_validation_jobs(categories)
+    db_paths = {Path(db_path).name: db_path for db_path in jobs}
+    tasks = {
+        name: (validate_database,
+               (db_path, jobs[db_path], start_date, end_date, detailed, BASIC_DB_PATH, exchange, incremental))
+        for name, db_path in db_paths.items()
+    }
+    results = run_checks(tasks, max_workers, on_done)
+
+    table_status = []
+    daily_parts, report_parts = [], []
+    for name in tasks:
+        result = results.get(name)
+        if not result:
+            continue
+        status, details, state = result
+        table_status.extend(status)
+        daily_parts.extend(details.get('daily', []))
+        report_parts.extend(details.get('quarterly', []))
+        # 校验状态在主进程中逐库保存，子进程保持只读
+        for frequency, pending in state.items():
+            save_validation_state(db_paths[name], frequency, pending)
+
+    return table_status, merge_period_rows(daily_parts, '日期'), merge_period_rows(report_parts, '报告期')
@@ -0,0 +1,172 @@
+"""
+增量校验状态 (Validation State)
+
+每次校验都重新统计整个日期范围，而历史数据绝大多数时候并未变化。这里把每表
+每期间的校验结果（记录数）保存在各数据库的 validation_state 表中，并在
+validation_marks 表中记录每表的高水位：
+
+- high_water   : 已校验且有数据的最大期间
+- data_version : 校验时 metadata.last_updated 的值（表最近一次写入时间）
+
+下次增量校验时，只有以下期间会重新统计，其余直接使用已保存的计数：
+
+- 从未校验过的期间
+- 上次校验时缺失（记录数为 0）的期间，补数后即可被发现
+- 表在上次校验后有写入（metadata.last_updated 变化）时，高水位及之后的期间
+- 随机抽取的少量历史期间（审计抽样），计数与保存值不一致时输出警告
+"""
+import random
+from datetime import datetime
+
+import pandas as pd
+
+from .config import VALIDATION_AUDIT_SAMPLE
+from .utils import table_exists, get_connection
+from .logger import logger
+
+
+def init_validation_state(conn):
+    """初始化 validation_state / validation_marks 表 (如果不存在)"""
+    if not table_exists(conn, 'validation_state'):
+        conn.execute('''
+            CREATE TABLE validation_state (
+                table_name VARCHAR,
+                frequency VARCHAR,    -- daily / monthly / quarterly
+                period VARCHAR,       -- 日期、月份或报告期
+                cnt BIGINT,
+                distinct_cnt BIGINT,
+                validated_at TIMESTAMP,
+                PRIMARY KEY (table_name, frequency, period)
+            );
+        ''')
+        logger.info("创建 validation_state 校验状态表")
+    if not table_exists(conn, 'validation_marks'):
+        conn.execute('''
+            CREATE TABLE validation_marks (
+                table_name VARCHAR,
+                frequency VARCHAR,
+                high_water VARCHAR,
+                data_version TIMESTAMP,
+                validated_at TIMESTAMP,
+                PRIMARY KEY (table_name, frequency)
+            );
+        ''')
+
+
+def load_validation_state(conn, table_names, frequency):
+    """
+    读取已保存的校验状态（只读连接可用，表不存在时返回空）。
+
+    Returns:
+        (cached, marks, versions)
+        - cached: {table_name: {period: (cnt, distinct_cnt)}}
+        - marks: {table_name: (high_water, data_version)}
+        - versions: {table_name: metadata.last_updated}
+    """
+    cached = {t: {} for t in table_names}
+    marks, versions = {}, {}
+    if not table_names:
+        return cached, marks, versions
+
+    placeholders = ", ".join("?" for _ in table_names)
+    if table_exists(conn, 'validation_state'):
+        rows = conn.execute(
+            f"SELECT table_name, period, cnt, distinct_cnt FROM validation_state "
+            f"WHERE frequency = ? AND table_name IN ({placeholders})",
+            [frequency, *table_names]
+        ).fetchall()
+        for table_name, period, cnt, distinct_cnt in rows:
+            cached[table_name][period] = (cnt, distinct_cnt)
+    if table_exists(conn, 'validation_marks'):
+        rows = conn.execute(
+            f"SELECT table_name, high_water, data_version FROM validation_marks "
+            f"WHERE frequency = ? AND table_name IN ({placeholders})",
+            [frequency, *table_names]
+        ).fetchall()
+        marks = {r[0]: (r[1], r[2]) for r in rows}
+    if table_exists(conn, 'metadata'):
+        rows = conn.execute(
+            f"SELECT table_name, last_updated FROM metadata WHERE table_name IN ({placeholders})",
+            list(table_names)
+        ).fetchall()
+        versions = {r[0]: r[1] for r in rows}
+    return cached, marks, versions
+
+
+def plan_recheck(periods, cached, mark, data_version, audit_size=VALIDATION_AUDIT_SAMPLE, rng=random):
+    """
+    确定单表需要重新统计的期间。
+
+    Args:
+        periods: 本次校验的期间列表
+        cached: {period: (cnt, distinct_cnt)}，已保存的计数
+        mark: (high_water, data_version) 或 None
+        data_version: 当前 metadata.last_updated（未知时为 None）
+
+    Returns:
+        (recheck, audited)：需要重新统计的期间集合，以及其中属于审计抽样的期间集合
+    """
+    recheck = {p for p in periods if p not in cached or not cached[p][0]}
+
+    high_water, last_version = mark if mark else (None, None)
+    changed = mark is None or data_version is None or data_version != last_version
+    if changed:
+        recheck.update(p for p in periods if high_water is None or p >= high_water)
+
+    history = sorted(p for p in periods if p not in recheck)
+    audited = set(rng.sample(history, min(audit_size, len(history)))) if audit_size > 0 else set()
+    return recheck | audited, audited
+
+
+def save_validation_state(db_path, frequency, results):
+    """
+    写入本次重新统计的期间计数并更新高水位（需要可写连接）。
+
+    Args:
+        results: {table_name: {'rows': [(period, cnt, distinct_cnt), ...], 'data_version': ts}}
+
+    数据库正被其他进程写入时保存失败只输出警告，不影响校验结果。
+    """
+    if not results:
+        return
+    now = datetime.now()
+    frames = [
+        pd.DataFrame(info['rows'], columns=['period', 'cnt', 'distinct_cnt']).assign(table_name=table_name)
+        for table_name, info in results.items() if info['rows']
+    ]
+    try:
+        with get_connection(db_path) as conn:
+            init_validation_state(conn)
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                if frames:
+                    state_df = pd.concat(frames, ignore_index=True)
+                    conn.register('vs_rows', state_df)
+                    conn.execute('''
+                        INSERT INTO validation_state
+                        SELECT table_name, ?, period, cnt, distinct_cnt, ? FROM vs_rows
+                        ON CONFLICT (table_name, frequency, period) DO UPDATE SET
+                            cnt = excluded.cnt,
+                            distinct_cnt = excluded.distinct_cnt,
+                            validated_at = excluded.validated_at;
+                    ''', [frequency, now])
+                    conn.unregister('vs_rows')
+                for table_name, info in results.items():
+                    high_water = conn.execute(
+                        "SELECT MAX(period) FROM validation_state WHERE table_name = ? AND frequency = ? AND cnt > 0",
+                        [table_name, frequency]
+                    ).fetchone()[0]
+                    conn.execute('''
+                        INSERT INTO validation_marks (table_name, frequency, high_water, data_version, validated_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (table_name, frequency) DO UPDATE SET
+                            high_water = excluded.high_water,
+                            data_version = excluded.data_version,
+                            validated_at = excluded.validated_at;
+                    ''', (table_name, frequency, high_water, info['data_version'], now))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+    except Exception as e:
+        logger.warning(f"[增量校验] 保存校验状态失败（下次将完整复查）: {e}")
@@ -0,0 +1,115 @@
+"""
+分页水位 (Watermark)
+
+full_paging 表（如 opt_basic）与快照表没有可靠的「最新日期」可用于增量判断，
+且 API 返回的分页顺序并不固定。这里为每个 (表, 参数组合, 页偏移) 记录页内容哈希，
+作为 metadata 的补充保存在 metadata_watermarks 表中：
+
+- 页哈希命中上次记录的任一页，或页内数据已全部原样在库 → 视为已知页，停止翻页
+- 只有内容发生变化的页才会写入（upsert），并更新该页的水位
+"""
+import hashlib
+from datetime import datetime
+
+import pandas as pd
+
+from .utils import table_exists, get_columns
+from .logger import logger
+
+
+def init_watermarks(conn):
+    """初始化 metadata_watermarks 表 (如果不存在)"""
+    if not table_exists(conn, 'metadata_watermarks'):
+        conn.execute('''
+            CREATE TABLE metadata_watermarks (
+                table_name VARCHAR,
+                params VARCHAR,       -- 参数组合（JSON，按键排序）
+                page_offset BIGINT,   -- 页偏移；快照表整体记为 0
+                page_hash VARCHAR,
+                row_count BIGINT,
+                last_updated TIMESTAMP,
+                PRIMARY KEY (table_name, params, page_offset)
+            );
+        ''')
+        logger.info("创建 metadata_watermarks 水位表")
+
+
+def hash_frame(df, unique_keys=None):
+    """
+    计算 DataFrame 的内容哈希（与行顺序无关）。
+
+    先按唯一键（缺失时按全部列）排序，再对逐行哈希做 MD5。
+    """
+    if df is None or df.empty:
+        return None
+    sort_cols = [k for k in (unique_keys or []) if k in df.columns] or list(df.columns)
+    ordered = df[sorted(df.columns)].sort_values(sort_cols, kind='mergesort')
+    row_hashes = pd.util.hash_pandas_object(ordered.astype(str), index=False).values
+    return hashlib.md5(row_hashes.tobytes()).hexdigest()
+
+
+def load_watermarks(conn, table_name, params_key):
+    """读取 (表, 参数组合) 上次记录的页哈希 → {page_hash: page_offset}"""
+    init_watermarks(conn)
+    rows = conn.execute(
+        "SELECT page_hash, page_offset FROM metadata_watermarks WHERE table_name = ? AND params = ?",
+        [table_name, params_key]
+    ).fetchall()
+    return {r[0]: r[1] for r in rows}
+
+
+def record_watermark(conn, table_name, params_key, page_offset, page_hash, row_count):
+    """写入/更新一页的水位"""
+    conn.execute('''
+        INSERT INTO metadata_watermarks (table_name, params, page_offset, page_hash, row_count, last_updated)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (table_name, params, page_offset) DO UPDATE SET
+            page_hash = excluded.page_hash,
+            row_count = excluded.row_count,
+            last_updated = excluded.last_updated;
+    ''', (table_name, params_key, page_offset, page_hash, row_count, datetime.now()))
+
+
+def count_changed_rows(conn, table_name, df, api_config_entry=None):
+    """
+    统计 df 中未原样存在于本地表的行数（新增或内容变化）。
+
+    只比较双方共有的列，且先把页规整成与库中相同的形态再比较：
+    去掉全空行与重复行、NaN 统一为 NULL、各列按表中的类型 CAST（如 API 的 float64
+    与表中 FLOAT、数值与 VARCHAR），避免类型差异被误判为内容变化。
+    比较失败（如无法转换类型）时按全部变化处理。
+    """
+    if df is None or df.empty:
+        return 0
+    if not table_exists(conn, table_name):
+        return len(df)
+
+    field_mappings = (api_config_entry or {}).get('field_mappings', {})
+    page = df.rename(columns={k: v for k, v in field_mappings.items() if k in df.columns})
+    table_columns, _, column_info = get_columns(conn, table_name)
+    columns = [c for c in page.columns if c in table_columns]
+    if not columns:
+        return len(df)
+    page = page[columns].dropna(how='all').drop_duplicates()
+    page = page.astype(object).where(page.notna(), None)
+
+    view_name = f"wm_page_{table_name}"
+    columns_str = ", ".join(f'"{c}"' for c in columns)
+    page_select = ", ".join(f'CAST("{c}" AS {column_info[c]["type"]}) AS "{c}"' for c in columns)
+    try:
+        conn.register(view_name, page)
+        return conn.execute(f'''
+            SELECT COUNT(*) FROM (
+                SELECT {page_select} FROM "{view_name}"
+                EXCEPT
+                SELECT {columns_str} FROM "{table_name}"
+            )
+        ''').fetchone()[0]
+    except Exception as e:
+        logger.debug(f"{table_name}: 页内容比对失败，按变化处理: {e}")
+        return len(df)
+    finally:
+        try:
+            conn.unregister(view_name)
+        except Exception:
+            pass
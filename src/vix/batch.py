@@ -0,0 +1,58 @@
+"""
+Multi-underlying VIX
+====================
+Computes VIX for several underlyings in one job: the option chains of all underlyings are
+fetched with one query and the SHIBOR curve is loaded once, then each underlying's series is
+calculated in a process pool (calculate_vix_batch is CPU bound and independent per underlying).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .config import VIX_WORKERS
+from .data_loader import fetch_option_chains, get_shibor_curve
+from .calculator import calculate_vix_batch
+from .term_structure import ShiborCurve
+
+
+def _compute_one(underlying: str, options: pd.DataFrame,
+                 shibor_curve: ShiborCurve) -> Tuple[str, pd.DataFrame, pd.DataFrame]:
+    summary, details = calculate_vix_batch(options, shibor_curve)
+    return underlying, summary, details
+
+
+def compute_vix_many(start_date: str, end_date: str, underlyings: List[str],
+                     start_dates: Optional[Dict[str, str]] = None,
+                     workers: int = VIX_WORKERS) -> Dict[str, Tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    Calculates VIX for several underlyings with shared data loading.
+
+    Args:
+        start_date, end_date: Date range 'YYYYMMDD' loaded for all underlyings.
+        underlyings: Underlying codes.
+        start_dates: Optional per-underlying first date (>= start_date), e.g. for incremental updates;
+            only those dates are loaded.
+        workers: Process pool size; 1 calculates in this process.
+
+    Returns:
+        Dict: {underlying: (summary, details)} as returned by calculate_vix_batch;
+            underlyings without option data are omitted.
+    """
+    chains = fetch_option_chains(start_date, end_date, underlyings, start_dates)
+    if not chains:
+        return {}
+    shibor_curve = get_shibor_curve(start_date, end_date)
+    if shibor_curve.empty:
+        return {}
+
+    jobs = list(chains.items())
+
+    if workers <= 1 or len(jobs) <= 1:
+        results = [_compute_one(u, options, shibor_curve) for u, options in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            futures = [executor.submit(_compute_one, u, options, shibor_curve) for u, options in jobs]
+            results = [future.result() for future in futures]
+
+    return {underlying: (summary, details) for underlying, summary, details in results}
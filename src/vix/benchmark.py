@@ -0,0 +1,162 @@
+import argparse
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, Tuple
+from .data_loader import fetch_option_data, get_shibor_curve
+from .calculator import YEARS, _calculate_sigma_square, _lookup_rates
+from .term_structure import ShiborCurve
+
+# Compared outputs of the detail frame
+DETAIL_FIELDS = ['exercise_price', 'call', 'put', 'diff', 'Q_K', 'contribution', 'F', 'K0',
+                 'risk_free_rate', 'maturity']
+
+
+def reference_sigma_square(options: pd.DataFrame, term: float, r: float) -> Tuple[float, float, float, pd.DataFrame]:
+    """Original pivot / row-wise apply implementation, kept as the benchmark reference."""
+    term_options = options[np.isclose(options['maturity'], term)].copy()
+
+    if term_options.empty:
+        raise ValueError(f"No options for term {term}")
+
+    term_options = term_options.drop_duplicates(subset=['exercise_price', 'contract_type'])
+    strike_matrix = term_options.pivot(index='exercise_price', columns='contract_type', values='close')
+
+    if 'call' not in strike_matrix.columns or 'put' not in strike_matrix.columns:
+        raise ValueError("Missing call or put columns")
+
+    strike_matrix.sort_index(inplace=True)
+
+    strikes = strike_matrix.index.values
+    diff = np.zeros(len(strikes))
+    if len(strikes) > 1:
+        diff[0] = strikes[1] - strikes[0]
+        diff[-1] = strikes[-1] - strikes[-2]
+        diff[1:-1] = (strikes[2:] - strikes[0:-2]) / 2.0
+    else:
+        diff[0] = 0.0
+
+    strike_matrix['diff'] = diff
+
+    abs_diff = np.abs(strike_matrix['call'] - strike_matrix['put'])
+    min_diff_k = abs_diff.idxmin()
+    min_row = strike_matrix.loc[min_diff_k]
+
+    F = min_diff_k + np.exp(r * term) * (min_row['call'] - min_row['put'])
+
+    below_F = strikes[strikes < F]
+    if len(below_F) > 0:
+        K0 = below_F.max()
+    else:
+        K0 = strikes.min()
+
+    def get_Q(row):
+        K = row.name
+        if K < K0:
+            return row['put']
+        elif K > K0:
+            return row['call']
+        else:
+            return (row['call'] + row['put']) / 2.0
+
+    Q_K = strike_matrix.apply(get_Q, axis=1)
+
+    contribution = (strike_matrix['diff'] / (strikes ** 2)) * np.exp(r * term) * Q_K
+    sum_contribution = contribution.sum()
+
+    term1 = (2.0 / term) * sum_contribution
+    term2 = (1.0 / term) * ((F / K0 - 1.0) ** 2)
+
+    sigma_sq = term1 - term2
+
+    strike_matrix['Q_K'] = Q_K
+    strike_matrix['contribution'] = contribution
+    strike_matrix['F'] = F
+    strike_matrix['K0'] = K0
+    strike_matrix['risk_free_rate'] = r
+    strike_matrix['maturity'] = term
+    strike_matrix.reset_index(inplace=True)
+
+    return sigma_sq, F, K0, strike_matrix
+
+
+def _term_cases(options: pd.DataFrame, shibor_curve: ShiborCurve):
+    """Yields (date, daily valid options, term, r) for the near and next term of each date."""
+    for date, daily_options in options.groupby('date'):
+        if date not in shibor_curve.index:
+            continue
+        valid_options = daily_options[daily_options['maturity'] >= (7.0 / YEARS)]
+        maturities = np.sort(valid_options['maturity'].unique())
+        if len(maturities) < 2:
+            continue
+        for term in maturities[:2]:
+            yield date, valid_options, term, _lookup_rates(shibor_curve, [date], np.array([term]))[0]
+
+
+def compare_sigma_square(options: pd.DataFrame, shibor_curve: ShiborCurve) -> Dict:
+    """
+    Runs the reference and the strike-strip kernel on every near / next term.
+
+    Returns:
+        Dict: term count, timings (seconds) and the terms whose results are not identical.
+    """
+    cases = list(_term_cases(options, shibor_curve))
+    results = {}
+    timings = {}
+    for name, func in (('reference', reference_sigma_square), ('kernel', _calculate_sigma_square)):
+        out = []
+        start = time.perf_counter()
+        for _, valid_options, term, r in cases:
+            try:
+                out.append(func(valid_options, term, r))
+            except ValueError as e:
+                out.append(e)
+        timings[name] = time.perf_counter() - start
+        results[name] = out
+
+    mismatches = []
+    for (date, _, term, _), ref, new in zip(cases, results['reference'], results['kernel']):
+        if isinstance(ref, Exception) or isinstance(new, Exception):
+            if type(ref) is not type(new):
+                mismatches.append((date, term, f"{ref!r} vs {new!r}"))
+            continue
+        for label, a, b in zip(('sigma_sq', 'F', 'K0'), ref[:3], new[:3]):
+            if not np.array_equal(a, b, equal_nan=True):
+                mismatches.append((date, term, f"{label}: {a!r} vs {b!r}"))
+        ref_details, new_details = ref[3], new[3]
+        for field in DETAIL_FIELDS:
+            if not np.array_equal(ref_details[field].to_numpy(float), new_details[field].to_numpy(float),
+                                  equal_nan=True):
+                mismatches.append((date, term, f"details.{field} differs"))
+
+    return {'terms': len(cases), 'timings': timings, 'mismatches': mismatches}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the VIX strike-strip kernel against the reference")
+    parser.add_argument('--start_date', type=str, required=True, help='Start date YYYYMMDD')
+    parser.add_argument('--end_date', type=str, required=True, help='End date YYYYMMDD')
+    parser.add_argument('--underlying', type=str, default='510050.SH', help='Underlying ETF code (default 510050.SH)')
+
+    args = parser.parse_args()
+
+    options_all = fetch_option_data(args.start_date, args.end_date, args.underlying)
+    shibor_curve = get_shibor_curve(args.start_date, args.end_date)
+    if options_all.empty or shibor_curve.empty:
+        print("No option or Shibor data found. Exiting.")
+        return
+
+    report = compare_sigma_square(options_all, shibor_curve)
+    reference, kernel = report['timings']['reference'], report['timings']['kernel']
+    print(f"Terms: {report['terms']}")
+    print(f"Reference: {reference:.3f}s, Kernel: {kernel:.3f}s ({reference / max(kernel, 1e-9):.1f}x)")
+    if report['mismatches']:
+        print(f"{len(report['mismatches'])} mismatches:")
+        for date, term, reason in report['mismatches'][:20]:
+            print(f"  {date:%Y-%m-%d} T={term:.6f}: {reason}")
+    else:
+        print("Results identical.")
+
+
+if __name__ == "__main__":
+    main()
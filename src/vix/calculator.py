@@ -3,6 +3,7 @@ import numpy as np
 import pandas as pd
 import warnings
 from typing import Dict, Tuple, Optional
+from .term_structure import ShiborCurve
 
 # Constants
 YEARS = 365.0
@@ -107,74 +108,371 @@ def _get_risk_free_rate(shibor_ser: pd.Series, term_years: float) -> float:
 
 def _calculate_sigma_square(options: pd.DataFrame, term: float, r: float) -> Tuple[float, float, float, pd.DataFrame]:
     """Calculates the variance (sigma^2) for a specific term."""
-    term_options = options[np.isclose(options['maturity'], term)].copy()
+    term_options = options[np.isclose(options['maturity'], term)]
     
     if term_options.empty:
         raise ValueError(f"No options for term {term}")
         
-    term_options = term_options.drop_duplicates(subset=['exercise_price', 'contract_type'])
-    strike_matrix = term_options.pivot(index='exercise_price', columns='contract_type', values='close')
+    strikes, calls, puts = _strike_strip(term_options)
     
-    if 'call' not in strike_matrix.columns or 'put' not in strike_matrix.columns:
+    n = len(strikes)
+    diff, q, contribution = np.empty(n), np.empty(n), np.empty(n)
+    sigma_sq, F, K0 = sigma_square_kernel(strikes, calls, puts, r, term, diff, q, contribution)
+    
+    # Prepare Detail DataFrame
+    details = pd.DataFrame({
+        'exercise_price': strikes,
+        'call': calls,
+        'put': puts,
+        'diff': diff,
+        'Q_K': q,
+        'contribution': contribution,
+        'F': F,
+        'K0': K0,
+        'risk_free_rate': r,
+        'maturity': term,
+    })
+    
+    return sigma_sq, F, K0, details
+
+
+def _strike_strip(term_options: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Builds the strike strip of one term as contiguous arrays.
+
+    Returns:
+        (strikes, calls, puts): sorted unique strikes and the aligned call / put closes
+        (NaN where there is no quote). The first quote wins on duplicate (strike, type).
+    """
+    strike_values = term_options['exercise_price'].to_numpy(dtype=float)
+    types = term_options['contract_type'].to_numpy()
+    close = term_options['close'].to_numpy(dtype=float)
+    is_call = types == 'call'
+    is_put = types == 'put'
+    if not is_call.any() or not is_put.any():
         raise ValueError("Missing call or put columns")
         
-    strike_matrix.sort_index(inplace=True)
+    strikes, strike_idx = np.unique(strike_values, return_inverse=True)
+    calls = np.full(len(strikes), np.nan)
+    puts = np.full(len(strikes), np.nan)
+    for mask, out in ((is_call, calls), (is_put, puts)):
+        # np.unique returns the index of the first occurrence of each strike
+        _, first = np.unique(strike_idx[mask], return_index=True)
+        rows = np.flatnonzero(mask)[first]
+        out[strike_idx[rows]] = close[rows]
+    return strikes, calls, puts
+
+
+def sigma_square_kernel(strikes: np.ndarray, calls: np.ndarray, puts: np.ndarray, r: float, term: float,
+                        diff: Optional[np.ndarray] = None, q: Optional[np.ndarray] = None,
+                        contribution: Optional[np.ndarray] = None) -> Tuple[float, float, float]:
+    """
+    Variance of one term from its strike strip (CBOE method).
+
+    Args:
+        strikes: Sorted unique strikes (float64, contiguous).
+        calls, puts: Closes aligned with strikes, NaN where there is no quote.
+        r, term: Risk free rate and maturity in years.
+        diff, q, contribution: Optional preallocated buffers of len(strikes); filled with
+            delta K, Q(K) and each strike's contribution. Allocated when not given.
+
+    Returns:
+        (sigma_sq, F, K0). Raises ValueError when no strike has both a call and a put.
+    """
+    n = len(strikes)
+    diff = np.empty(n) if diff is None else diff
+    q = np.empty(n) if q is None else q
+    contribution = np.empty(n) if contribution is None else contribution
     
-    # Calculate Diff (delta_K)
-    strikes = strike_matrix.index.values
-    diff = np.zeros(len(strikes))
-    if len(strikes) > 1:
+    # Delta K: central differences inside, one-sided at the ends
+    if n > 1:
+        np.subtract(strikes[2:], strikes[:-2], out=diff[1:-1])
+        diff[1:-1] /= 2.0
         diff[0] = strikes[1] - strikes[0]
         diff[-1] = strikes[-1] - strikes[-2]
-        diff[1:-1] = (strikes[2:] - strikes[0:-2]) / 2.0
     else:
         diff[0] = 0.0
         
-    strike_matrix['diff'] = diff
+    # Forward price from the strike with the smallest |call - put| (contribution used as scratch)
+    np.subtract(calls, puts, out=contribution)
+    np.abs(contribution, out=contribution)
+    m = int(np.nanargmin(contribution))
+    growth = np.exp(r * term)
+    F = strikes[m] + growth * (calls[m] - puts[m])
     
-    # Determine F (Forward Price)
-    abs_diff = np.abs(strike_matrix['call'] - strike_matrix['put'])
-    min_diff_k = abs_diff.idxmin()
-    min_row = strike_matrix.loc[min_diff_k]
+    # K0: largest strike below F, else the lowest strike
+    k0_idx = max(int(np.searchsorted(strikes, F, side='left')) - 1, 0)
+    K0 = strikes[k0_idx]
     
-    F = min_diff_k + np.exp(r * term) * (min_row['call'] - min_row['put'])
+    # Q(K): puts below K0, calls above, the average at K0
+    np.copyto(q, calls)
+    q[:k0_idx] = puts[:k0_idx]
+    q[k0_idx] = (calls[k0_idx] + puts[k0_idx]) / 2.0
     
-    # Determine K0
-    below_F = strikes[strikes < F]
-    if len(below_F) > 0:
-        K0 = below_F.max()
-    else:
-        K0 = strikes.min()
-        
-    # Select Options for Calculation (Q(K))
-    def get_Q(row):
-        K = row.name
-        if K < K0:
-            return row['put']
-        elif K > K0:
-            return row['call']
-        else:
-            return (row['call'] + row['put']) / 2.0
-            
-    Q_K = strike_matrix.apply(get_Q, axis=1)
-    
-    contribution = (strike_matrix['diff'] / (strikes ** 2)) * np.exp(r * term) * Q_K
-    sum_contribution = contribution.sum()
+    np.divide(diff, strikes ** 2, out=contribution)
+    contribution *= growth
+    contribution *= q
+    # Missing quotes contribute nothing (same as pandas' skipna sum)
+    sum_contribution = np.where(np.isnan(contribution), 0.0, contribution).sum()
     
     term1 = (2.0 / term) * sum_contribution
     term2 = (1.0 / term) * ((F / K0 - 1.0) ** 2)
     
-    sigma_sq = term1 - term2
-    
-    # Prepare Detail DataFrame
-    # Enrich strike_matrix with info
-    strike_matrix['Q_K'] = Q_K
-    strike_matrix['contribution'] = contribution
-    strike_matrix['F'] = F
-    strike_matrix['K0'] = K0
-    strike_matrix['risk_free_rate'] = r
-    strike_matrix['maturity'] = term
-    strike_matrix.reset_index(inplace=True) # make exercise_price a column
-    
-    return sigma_sq, F, K0, strike_matrix
+    return term1 - term2, F, K0
+
+
+SUMMARY_COLUMNS = ['date', 'vix', 'near_term', 'next_term', 'r_near', 'r_next',
+                   'sigma_sq_near', 'sigma_sq_next', 'F_near', 'F_next', 'K0_near', 'K0_next',
+                   'weight', 'weighted_variance']
+DETAIL_COLUMNS = ['exercise_price', 'call', 'put', 'diff', 'Q_K', 'contribution', 'F', 'K0',
+                  'risk_free_rate', 'maturity', 'term_type', 'term_maturity', 'date']
+EXPIRY_COLUMNS = ['date', 'expiry_idx', 'maturity', 'days', 'risk_free_rate', 'sigma_sq', 'F', 'K0']
+CONSTANT_MATURITY_COLUMNS = ['date', 'horizon', 'variance', 'vol', 'lower_maturity', 'upper_maturity']
+
+# Default constant-maturity horizons (days)
+TERM_HORIZONS = (9, 30, 60, 90, 180)
+
+
+def calculate_vix_batch(options: pd.DataFrame,
+                        shibor_curve: ShiborCurve) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Calculates VIX for every date in the option panel in one pass.
+
+    Same method and results as calling calculate_vix_for_date per date, but the panel
+    is sorted once by (date, term, strike) and term selection, forward price, K0 and
+    the variance contributions are computed as grouped array operations over
+    contiguous strike strips, so the cost is O(N log N) instead of O(N * D).
+
+    Args:
+        options: Output of fetch_option_data (all dates).
+        shibor_curve: Output of get_shibor_curve.
+
+    Returns:
+        (summary, details): one row per date with SUMMARY_COLUMNS, and the strike-level
+        details of the near and next terms with DETAIL_COLUMNS (term_type 'near'/'next').
+    """
+    strips = _expiry_strips(options, shibor_curve, max_terms=2)
+    return _vix_from_strips(strips)
+
+
+def calculate_vix_term_structure(options: pd.DataFrame, shibor_curve: ShiborCurve,
+                                 horizons=TERM_HORIZONS) -> Dict[str, pd.DataFrame]:
+    """
+    VIX plus the model-free variance term structure from one strike-strip pass.
+
+    sigma^2 is computed once per (date, expiry) over every expiry of at least 7 days
+    that has both calls and puts; the 30-day VIX and all constant-maturity horizons
+    are interpolated from those per-expiry values.
+
+    Constant maturity at horizon tau (years) uses the expiries bracketing tau (the two
+    shortest when tau is below the first expiry, as VIX does) with total variance
+    linear in maturity:
+        var(tau) = [T1 s1 (T2 - tau) / (T2 - T1) + T2 s2 (tau - T1) / (T2 - T1)] / tau
+    and is NaN beyond the last expiry.
+
+    Args:
+        options: Output of fetch_option_data (all dates).
+        shibor_curve: Output of get_shibor_curve.
+        horizons: Constant-maturity horizons in days.
+
+    Returns:
+        Dict with 'summary' / 'details' (as calculate_vix_batch), 'expiries'
+        (EXPIRY_COLUMNS, one row per date and expiry) and 'constant_maturity'
+        (CONSTANT_MATURITY_COLUMNS, one row per date and horizon; vol = 100 * sqrt(variance)).
+    """
+    strips = _expiry_strips(options, shibor_curve)
+    summary, details = _vix_from_strips(strips)
+    if strips is None:
+        return {'summary': summary, 'details': details,
+                'expiries': pd.DataFrame(columns=EXPIRY_COLUMNS),
+                'constant_maturity': pd.DataFrame(columns=CONSTANT_MATURITY_COLUMNS)}
+
+    per_term = strips['per_term']
+    expiries = per_term[per_term['ok']].rename(columns={'term_idx': 'expiry_idx', 'term': 'maturity',
+                                                        'r': 'risk_free_rate'})
+    expiries = expiries.assign(days=np.rint(expiries['maturity'] * YEARS).astype(int))
+    expiries = expiries.reset_index(drop=True)[EXPIRY_COLUMNS]
+    return {'summary': summary, 'details': details, 'expiries': expiries,
+            'constant_maturity': _constant_maturity(expiries, horizons)}
+
+
+def _expiry_strips(options: pd.DataFrame, shibor_curve: ShiborCurve,
+                   max_terms: Optional[int] = None) -> Optional[Dict]:
+    """
+    Strike strips and per-expiry variance for every (date, expiry).
+
+    Args:
+        max_terms: Only the first max_terms expiries (>= 7 days) of each date.
+
+    Returns:
+        Dict with 'strips' (one row per date, expiry, strike), the strike-level arrays,
+        strip boundaries and 'per_term' (date, term_idx, term, r, sigma_sq, F, K0, ok);
+        None when nothing can be computed. Expiries without both calls and puts are dropped.
+    """
+    if options.empty or shibor_curve.empty:
+        return None
+
+    opts = options.loc[options['maturity'] >= 7.0 / YEARS,
+                       ['date', 'maturity', 'exercise_price', 'contract_type', 'close']]
+    opts = opts[opts['date'].isin(shibor_curve.index)]
+    if opts.empty:
+        return None
+
+    # 1. Expiries per date ranked by maturity (0 = near, 1 = next, ...)
+    terms = opts[['date', 'maturity']].drop_duplicates().sort_values(['date', 'maturity'])
+    terms['term_idx'] = terms.groupby('date').cumcount()
+    if max_terms is not None:
+        terms = terms[terms['term_idx'] < max_terms]
+    opts = opts.merge(terms, on=['date', 'maturity'])
+
+    # An expiry needs both call and put contracts (even if some prices are missing)
+    flags = opts[['date', 'term_idx']].assign(has_call=opts['contract_type'] == 'call',
+                                              has_put=opts['contract_type'] == 'put')
+    has_both = flags.groupby(['date', 'term_idx'])[['has_call', 'has_put']].any().all(axis=1)
+    valid = has_both[has_both].index
+    opts = opts[pd.MultiIndex.from_frame(opts[['date', 'term_idx']]).isin(valid) &
+                opts['contract_type'].isin(['call', 'put'])]
+    if opts.empty:
+        return None
+
+    # 2. Strike strips: one row per (date, term, strike), first quote wins on duplicates
+    opts = opts.drop_duplicates(subset=['date', 'term_idx', 'exercise_price', 'contract_type'])
+    strips = (opts.set_index(['date', 'term_idx', 'maturity', 'exercise_price', 'contract_type'])['close']
+                  .unstack('contract_type')
+                  .reindex(columns=['call', 'put'])
+                  .sort_index()
+                  .reset_index())
+    strips.columns.name = None
+
+    K = strips['exercise_price'].to_numpy(dtype=float)
+    call = strips['call'].to_numpy(dtype=float)
+    put = strips['put'].to_numpy(dtype=float)
+    group = (strips[['date', 'term_idx']] != strips[['date', 'term_idx']].shift()).any(axis=1).cumsum().to_numpy() - 1
+    starts = np.flatnonzero(np.r_[True, group[1:] != group[:-1]])
+    ends = np.r_[starts[1:], len(K)] - 1
+    sizes = ends - starts + 1
+
+    # 3. Delta K: one-sided at the ends of each strip, central inside
+    diff = np.zeros(len(K))
+    inner = np.ones(len(K), dtype=bool)
+    inner[starts] = False
+    inner[ends] = False
+    diff[1:-1] = (K[2:] - K[:-2]) / 2.0
+    diff[~inner] = 0.0
+    multi = sizes > 1
+    diff[starts[multi]] = K[starts[multi] + 1] - K[starts[multi]]
+    diff[ends[multi]] = K[ends[multi]] - K[ends[multi] - 1]
+
+    # 4. Risk free rate per strip, same lookup rules as _get_risk_free_rate
+    strip_dates = strips['date'].to_numpy()[starts]
+    term = strips['maturity'].to_numpy(dtype=float)[starts]
+    r = _lookup_rates(shibor_curve, strip_dates, term)
+    growth = np.exp(r * term)
+
+    # 5. Forward price from the strike with the smallest |call - put| (first on ties)
+    abs_diff = np.abs(call - put)
+    ranked = np.where(np.isnan(abs_diff), np.inf, abs_diff)
+    order = np.lexsort((np.arange(len(K)), ranked, group))
+    first = order[starts]
+    has_forward = np.isfinite(ranked[first])
+    F = K[first] + growth * (call[first] - put[first])
+
+    # 6. K0: largest strike below F, else the lowest strike
+    F_rows = np.repeat(F, sizes)
+    below_max = np.maximum.reduceat(np.where(K < F_rows, K, -np.inf), starts)
+    K0 = np.where(np.isfinite(below_max), below_max, K[starts])
+    K0_rows = np.repeat(K0, sizes)
+
+    # 7. Q(K) and contributions; missing quotes contribute nothing
+    Q = np.where(K < K0_rows, put, np.where(K > K0_rows, call, (call + put) / 2.0))
+    contribution = (diff / (K ** 2)) * np.repeat(growth, sizes) * Q
+    total = np.add.reduceat(np.where(np.isnan(contribution), 0.0, contribution), starts)
+    sigma_sq = (2.0 / term) * total - (1.0 / term) * ((F / K0 - 1.0) ** 2)
+
+    per_term = pd.DataFrame({'date': strip_dates, 'term_idx': strips['term_idx'].to_numpy()[starts],
+                             'term': term, 'r': r, 'sigma_sq': sigma_sq, 'F': F, 'K0': K0, 'ok': has_forward})
+    return {'strips': strips, 'diff': diff, 'Q': Q, 'contribution': contribution,
+            'F_rows': F_rows, 'K0_rows': K0_rows, 'r_rows': np.repeat(r, sizes), 'per_term': per_term}
+
+
+def _vix_from_strips(strips: Optional[Dict]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """30-day VIX from the near (term_idx 0) and next (term_idx 1) expiries of each date."""
+    empty = (pd.DataFrame(columns=SUMMARY_COLUMNS), pd.DataFrame(columns=DETAIL_COLUMNS))
+    if strips is None:
+        return empty
+
+    # 8. Combine near and next terms per date (both must have calls and puts)
+    per_term = strips['per_term']
+    near = per_term[per_term['term_idx'] == 0].set_index('date')
+    nxt = per_term[per_term['term_idx'] == 1].set_index('date').reindex(near.index)
+    summary = pd.DataFrame({
+        'near_term': near['term'], 'next_term': nxt['term'],
+        'r_near': near['r'], 'r_next': nxt['r'],
+        'sigma_sq_near': near['sigma_sq'], 'sigma_sq_next': nxt['sigma_sq'],
+        'F_near': near['F'], 'F_next': nxt['F'],
+        'K0_near': near['K0'], 'K0_next': nxt['K0'],
+    })
+    t30 = 30.0 / YEARS
+    summary['weight'] = (summary['next_term'] - t30) / (summary['next_term'] - summary['near_term'])
+    summary['weighted_variance'] = (summary['near_term'] * summary['sigma_sq_near'] * summary['weight'] +
+                                    summary['next_term'] * summary['sigma_sq_next'] * (1.0 - summary['weight']))
+    keep = near['ok'].to_numpy(dtype=bool) & nxt['ok'].fillna(False).to_numpy(dtype=bool) & \
+        (summary['weighted_variance'] >= 0).to_numpy()
+    summary = summary[keep]
+    summary = summary.assign(vix=100.0 * np.sqrt(summary['weighted_variance'] * (YEARS / 30.0)))
+    summary = summary.reset_index()[SUMMARY_COLUMNS]
+
+    # 9. Strike-level details of the near and next terms for the dates that produced a VIX
+    rows = strips['strips']
+    term_idx = rows['term_idx'].to_numpy()
+    details = rows[['exercise_price', 'call', 'put']].assign(
+        diff=strips['diff'], Q_K=strips['Q'], contribution=strips['contribution'],
+        F=strips['F_rows'], K0=strips['K0_rows'],
+        risk_free_rate=strips['r_rows'],
+        maturity=rows['maturity'].to_numpy(),
+        term_type=np.where(term_idx == 0, 'near', 'next'),
+        term_maturity=rows['maturity'].to_numpy(),
+        date=rows['date'].to_numpy(),
+    )
+    details = details[(term_idx < 2) & details['date'].isin(summary['date']).to_numpy()]
+    return summary, details.reset_index(drop=True)[DETAIL_COLUMNS]
+
+
+def _constant_maturity(expiries: pd.DataFrame, horizons) -> pd.DataFrame:
+    """Interpolates per-expiry variances (sorted by date, maturity) to constant horizons in days."""
+    if expiries.empty:
+        return pd.DataFrame(columns=CONSTANT_MATURITY_COLUMNS)
+
+    dates = expiries['date'].to_numpy()
+    T = expiries['maturity'].to_numpy(dtype=float)
+    total = T * expiries['sigma_sq'].to_numpy(dtype=float)
+    starts = np.flatnonzero(np.r_[True, dates[1:] != dates[:-1]])
+    sizes = np.diff(np.r_[starts, len(T)])
+
+    frames = []
+    for horizon in horizons:
+        tau = horizon / YEARS
+        # Bracketing pair: lower = last expiry below tau (at least the first), upper = next one
+        below = np.add.reduceat((T < tau).astype(int), starts)
+        lower = starts + np.clip(below - 1, 0, np.maximum(sizes - 2, 0))
+        upper = np.minimum(lower + 1, starts + sizes - 1)
+        usable = (sizes >= 2) & (below < sizes)
+        T1, T2 = T[lower], T[upper]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            weight = (T2 - tau) / (T2 - T1)
+            weighted = total[lower] * weight + total[upper] * (1.0 - weight)
+            variance = np.where(usable, weighted * (YEARS / horizon), np.nan)
+            vol = 100.0 * np.sqrt(np.where(variance >= 0, variance, np.nan))
+        frames.append(pd.DataFrame({
+            'date': dates[starts], 'horizon': horizon, 'variance': variance, 'vol': vol,
+            'lower_maturity': np.where(usable, T1, np.nan), 'upper_maturity': np.where(usable, T2, np.nan),
+        }))
+    return pd.concat(frames, ignore_index=True).sort_values(['date', 'horizon'], kind='stable') \
+        .reset_index(drop=True)[CONSTANT_MATURITY_COLUMNS]
+
 
+def _lookup_rates(shibor_curve: ShiborCurve, dates: np.ndarray, terms: np.ndarray) -> np.ndarray:
+    """Vectorized _get_risk_free_rate over (date, term) pairs."""
+    days = np.maximum(1, np.rint(terms * YEARS))
+    rates = shibor_curve.rates_at(dates, days)
+    return np.where(np.isnan(rates), 0.03, rates)
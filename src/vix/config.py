@@ -43,6 +43,12 @@ API_CONFIG = interpolate_config(_raw_config, DB_ROOT)
 OPT_DB_PATH = API_CONFIG.get('option', {}).get('db_path')
 MACRO_DB_PATH = API_CONFIG.get('macro', {}).get('db_path')
 
+# First date computed when an underlying is added to the VIX store (50ETF options listing)
+VIX_START_DATE = os.getenv('VIX_START_DATE', '20150209')
+
+# Process pool size for multi-underlying VIX jobs (run.py --all, store updates)
+VIX_WORKERS = int(os.getenv('VIX_WORKERS', '4'))
+
 # ETF Options Configuration
 ETF_OPTIONS = {
     "510300.SH": {"exchange": "SSE", "name": "华泰柏瑞沪深300ETF", "index_code": "000300.SH"},
@@ -1,18 +1,55 @@
 
 import argparse
 import pandas as pd
-from tqdm import tqdm
-from .data_loader import fetch_option_data, get_shibor_interpolated
-from .calculator import calculate_vix_for_date
+from .data_loader import fetch_option_data, get_shibor_curve
+from .calculator import calculate_vix_batch, calculate_vix_term_structure, TERM_HORIZONS
+from .batch import compute_vix_many
+from .config import VIX_WORKERS
+from .store import save_vix, supported_underlyings
+
+def run_many(start_date: str, end_date: str, underlyings: list, workers: int):
+    """Calculates several underlyings in one job and writes them to the VIX store."""
+    print(f"--- Starting Chinese VIX Calculation ({len(underlyings)} underlyings, {workers} workers) ---")
+    print(f"Period: {start_date} to {end_date}")
+    
+    try:
+        results = compute_vix_many(start_date, end_date, underlyings, workers=workers)
+    except Exception as e:
+        print(f"Data loading failed: {e}")
+        return
+    
+    print("\n--- Summary Result ---")
+    for underlying in underlyings:
+        summary, details = results.get(underlying, (pd.DataFrame(), pd.DataFrame()))
+        if summary.empty:
+            print(f"{underlying}: no VIX calculated")
+            continue
+        written = save_vix(underlying, summary, details, start_date, end_date)
+        last = summary.iloc[-1]
+        print(f"{underlying}: {written} dates stored, latest {last['date']:%Y-%m-%d} VIX {last['vix']:.2f}")
 
 def main():
     parser = argparse.ArgumentParser(description="Calculate VIX for Chinese Operations")
     parser.add_argument('--start_date', type=str, required=True, help='Start date YYYYMMDD')
     parser.add_argument('--end_date', type=str, required=True, help='End date YYYYMMDD')
-    parser.add_argument('--underlying', type=str, default='510050.SH', help='Underlying ETF code (default 510050.SH)')
+    parser.add_argument('--underlying', type=str, default='510050.SH',
+                        help='Underlying ETF code (default 510050.SH); comma separated for several')
+    parser.add_argument('--all', action='store_true', help='Calculate every configured underlying')
+    parser.add_argument('--workers', type=int, default=VIX_WORKERS,
+                        help=f'Process pool size for several underlyings (default {VIX_WORKERS})')
+    parser.add_argument('--store', action='store_true', help='Also write the results to the VIX store (vix_daily / vix_details)')
+    parser.add_argument('--term-structure', type=str, default=None, const=','.join(map(str, TERM_HORIZONS)), nargs='?',
+                        help=f'Also save per-expiry and constant-maturity variances (horizons in days, '
+                             f'default {",".join(map(str, TERM_HORIZONS))})')
     
     args = parser.parse_args()
     
+    # Several underlyings: shared data loading, process pool, results go to the VIX store
+    underlyings = supported_underlyings() if args.all else args.underlying.split(',')
+    if len(underlyings) > 1:
+        run_many(args.start_date, args.end_date, underlyings, args.workers)
+        return
+    
     print(f"--- Starting Chinese VIX Calculation ---")
     print(f"Period: {args.start_date} to {args.end_date}")
     print(f"Underlying: {args.underlying}")
@@ -25,8 +62,8 @@ def main():
             print("No option data found. Exiting.")
             return
 
-        shibor_interp = get_shibor_interpolated(args.start_date, args.end_date)
-        if shibor_interp.empty:
+        shibor_curve = get_shibor_curve(args.start_date, args.end_date)
+        if shibor_curve.empty:
             print("No Shibor data found. Exiting.")
             return
             
@@ -34,49 +71,24 @@ def main():
         print(f"Data loading failed: {e}")
         return
 
-    # 2. Iterate and Calculate
-    # Unique dates
-    dates = sorted(options_all['date'].unique())
-    
-    results = []
-    all_details = []
-    
-    print(f"Calculating VIX for {len(dates)} trading days...")
-    
-    for current_date in tqdm(dates):
-        # type: current_date is pd.Timestamp from data_loader
-        
-        # Filter options for this date
-        daily_opts = options_all[options_all['date'] == current_date]
-        
-        # Get Shibor rate for this date
-        # shibor_interp index is date.
-        try:
-            daily_shibor = shibor_interp.loc[current_date]
-        except KeyError:
-            # print(f"Missing Shibor for {current_date.strftime('%Y-%m-%d')}, skipping.")
-            continue
-            
-        # Calculate
-        result_dict = calculate_vix_for_date(current_date, daily_opts, daily_shibor)
-        
-        if result_dict is not None:
-            # Extract details
-            details_df = result_dict.pop('details')
-            
-            # Summary Record
-            result_record = {'date': current_date.strftime('%Y%m%d')}
-            result_record.update(result_dict)
-            results.append(result_record)
-            
-            # Details Record (add to list, concat later)
-            all_details.append(details_df)
+    # 2. Calculate all dates in one pass
+    print(f"Calculating VIX for {options_all['date'].nunique()} trading days...")
+    if args.term_structure:
+        horizons = [int(h) for h in args.term_structure.split(',')]
+        surface = calculate_vix_term_structure(options_all, shibor_curve, horizons)
+        df_result, df_details = surface['summary'], surface['details']
+    else:
+        df_result, df_details = calculate_vix_batch(options_all, shibor_curve)
             
     # 3. Output
-    if not results:
+    if df_result.empty:
         print("No VIX Calculated.")
     else:
-        df_result = pd.DataFrame(results)
+        if args.store:
+            written = save_vix(args.underlying, df_result, df_details, args.start_date, args.end_date)
+            print(f"Stored {written} dates in the VIX store.")
+        
+        df_result['date'] = df_result['date'].dt.strftime('%Y%m%d')
         print("\n--- Summary Result ---")
         print(df_result.head())
         
@@ -88,9 +100,7 @@ def main():
         print(f"Saved summary to {summary_file}")
         
         # Save Details
-        if all_details:
-            df_details = pd.concat(all_details)
-            
+        if not df_details.empty:
             # Split into Near and Next for clarity/file size
             df_near = df_details[df_details['term_type'] == 'near']
             df_next = df_details[df_details['term_type'] == 'next']
@@ -101,6 +111,14 @@ def main():
             df_near.to_csv(near_file, index=False)
             df_next.to_csv(next_file, index=False)
             print(f"Saved details to:\n  - {near_file}\n  - {next_file}")
+        
+        # Save Term Structure
+        if args.term_structure:
+            expiry_file = f"data/vix_expiries_{args.underlying}_{args.start_date}_{args.end_date}.csv"
+            cm_file = f"data/vix_term_structure_{args.underlying}_{args.start_date}_{args.end_date}.csv"
+            surface['expiries'].to_csv(expiry_file, index=False)
+            surface['constant_maturity'].to_csv(cm_file, index=False)
+            print(f"Saved term structure to:\n  - {expiry_file}\n  - {cm_file}")
 
 if __name__ == "__main__":
     main()
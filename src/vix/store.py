@@ -0,0 +1,246 @@
+"""
+VIX Store
+=========
+Persists calculated VIX series in the option database so they are computed once:
+
+- vix_daily  : one row per (underlying, trade_date) with VIX and its intermediate values
+- vix_details: strike-level details of the near and next terms
+
+update_all() / update_vix() compute only the dates after each underlying's stored maximum
+(or from VIX_START_DATE for a new underlying), all underlyings in one job, and run after
+the option tables are updated (daily_fetcher).
+load_vix() is a plain range query used by the dashboard.
+
+Dates are stored as VARCHAR 'YYYYMMDD', like trade_date in the other option tables.
+"""
+import argparse
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import duckdb
+import pandas as pd
+
+from .config import OPT_DB_PATH, ETF_OPTIONS, INDEX_OPTIONS, VIX_START_DATE, VIX_WORKERS
+from .calculator import SUMMARY_COLUMNS, DETAIL_COLUMNS
+from .batch import compute_vix_many
+
+VIX_DAILY_TABLE = 'vix_daily'
+VIX_DETAILS_TABLE = 'vix_details'
+
+# Stored value columns (everything except underlying / trade_date / term_type)
+_SUMMARY_VALUES = [c for c in SUMMARY_COLUMNS if c != 'date']
+_DETAIL_VALUES = [c for c in DETAIL_COLUMNS if c not in ('date', 'term_type')]
+
+
+def init_vix_tables(conn):
+    """Creates the VIX store tables if they do not exist."""
+    summary_cols = ",\n            ".join(f"{c} DOUBLE" for c in _SUMMARY_VALUES)
+    detail_cols = ",\n            ".join(f"{c} DOUBLE" for c in _DETAIL_VALUES)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {VIX_DAILY_TABLE} (
+            underlying VARCHAR NOT NULL,
+            trade_date VARCHAR NOT NULL,
+            {summary_cols},
+            computed_at TIMESTAMP,
+            PRIMARY KEY (underlying, trade_date)
+        )
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {VIX_DETAILS_TABLE} (
+            underlying VARCHAR NOT NULL,
+            trade_date VARCHAR NOT NULL,
+            term_type VARCHAR NOT NULL,
+            {detail_cols},
+            PRIMARY KEY (underlying, trade_date, term_type, exercise_price)
+        )
+    """)
+
+
+def supported_underlyings() -> List[str]:
+    """All underlyings with a VIX configuration."""
+    return list(ETF_OPTIONS) + list(INDEX_OPTIONS)
+
+
+def _has_store(conn) -> bool:
+    return conn.execute(
+        "SELECT COUNT(*) FROM information_schema.tables WHERE table_name = ?", [VIX_DAILY_TABLE]
+    ).fetchone()[0] > 0
+
+
+def get_stored_max_date(underlying: str) -> Optional[str]:
+    """Latest stored trade_date of an underlying, or None."""
+    conn = duckdb.connect(OPT_DB_PATH, read_only=True)
+    try:
+        if not _has_store(conn):
+            return None
+        return conn.execute(
+            f"SELECT MAX(trade_date) FROM {VIX_DAILY_TABLE} WHERE underlying = ?", [underlying]
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def save_vix(underlying: str, summary: pd.DataFrame, details: pd.DataFrame,
+             start_date: str, end_date: str) -> int:
+    """
+    Replaces the stored results of an underlying in [start_date, end_date] with the given ones.
+
+    Args:
+        summary, details: Output of calculate_vix_batch.
+
+    Returns:
+        int: Number of vix_daily rows written.
+    """
+    summary = summary[SUMMARY_COLUMNS].copy()
+    summary.insert(0, 'underlying', underlying)
+    summary['date'] = summary['date'].dt.strftime('%Y%m%d')
+    summary = summary.rename(columns={'date': 'trade_date'})
+    summary['computed_at'] = datetime.now()
+
+    details = details[DETAIL_COLUMNS].copy()
+    details['date'] = pd.to_datetime(details['date']).dt.strftime('%Y%m%d')
+    details = details.rename(columns={'date': 'trade_date'})
+    details.insert(0, 'underlying', underlying)
+    detail_cols = ['underlying', 'trade_date', 'term_type'] + _DETAIL_VALUES
+
+    conn = duckdb.connect(OPT_DB_PATH)
+    try:
+        init_vix_tables(conn)
+        conn.execute("BEGIN TRANSACTION")
+        try:
+            for table in (VIX_DAILY_TABLE, VIX_DETAILS_TABLE):
+                conn.execute(f"DELETE FROM {table} WHERE underlying = ? AND trade_date BETWEEN ? AND ?",
+                             [underlying, start_date, end_date])
+            conn.register('vix_summary_new', summary)
+            conn.register('vix_details_new', details[detail_cols])
+            conn.execute(f"INSERT INTO {VIX_DAILY_TABLE} BY NAME SELECT * FROM vix_summary_new")
+            conn.execute(f"INSERT INTO {VIX_DETAILS_TABLE} BY NAME SELECT * FROM vix_details_new")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    return len(summary)
+
+
+def update_vix(underlying: str, end_date: Optional[str] = None, rebuild: bool = False) -> int:
+    """
+    Computes and stores VIX for the dates after the stored maximum.
+
+    Args:
+        underlying: Underlying ETF or Index code.
+        end_date: Last date 'YYYYMMDD' (default today).
+        rebuild: Recompute from VIX_START_DATE, replacing stored results.
+
+    Returns:
+        int: Number of dates written.
+    """
+    return update_all(end_date, [underlying], rebuild, workers=1, raise_errors=True)[underlying]
+
+
+def update_all(end_date: Optional[str] = None, underlyings: Optional[List[str]] = None,
+               rebuild: bool = False, workers: int = VIX_WORKERS, raise_errors: bool = False) -> Dict[str, int]:
+    """
+    Incrementally updates every (or the given) underlying in one job.
+
+    Each underlying starts after its own stored maximum; the option chains and SHIBOR
+    are loaded once for the earliest start and the series are computed in a process pool
+    (compute_vix_many), then written one underlying per transaction.
+
+    Returns:
+        Dict: {underlying: dates written}; -1 when the update failed (reported, not raised).
+    """
+    end_date = end_date or datetime.now().strftime('%Y%m%d')
+    underlyings = underlyings or supported_underlyings()
+    results = {}
+    start_dates = {}
+    for underlying in underlyings:
+        last_date = None if rebuild else get_stored_max_date(underlying)
+        if last_date:
+            start_dates[underlying] = (datetime.strptime(last_date, '%Y%m%d') + timedelta(days=1)).strftime('%Y%m%d')
+        else:
+            start_dates[underlying] = VIX_START_DATE
+        if start_dates[underlying] > end_date:
+            print(f"{underlying}: VIX store up to date ({last_date}).")
+            results[underlying] = 0
+            del start_dates[underlying]
+    if not start_dates:
+        return results
+
+    start_date = min(start_dates.values())
+    try:
+        computed = compute_vix_many(start_date, end_date, list(start_dates), start_dates, workers)
+    except Exception as e:
+        if raise_errors:
+            raise
+        print(f"VIX update failed: {e}")
+        return {**results, **{u: -1 for u in start_dates}}
+
+    for underlying, first in start_dates.items():
+        summary, details = computed.get(underlying, (pd.DataFrame(), pd.DataFrame()))
+        if summary.empty:
+            print(f"{underlying}: no VIX calculated for {first} ~ {end_date}.")
+            results[underlying] = 0
+            continue
+        try:
+            results[underlying] = save_vix(underlying, summary, details, first, end_date)
+            print(f"{underlying}: stored VIX for {results[underlying]} dates ({first} ~ {end_date}).")
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"{underlying}: VIX update failed: {e}")
+            results[underlying] = -1
+    return results
+
+
+def load_vix(start_date: str, end_date: str, underlying: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Reads stored VIX results for a date range.
+
+    Returns:
+        (summary, details) in the calculate_vix_batch layout ('date' as Timestamp);
+        empty frames when the store has not been built.
+    """
+    conn = duckdb.connect(OPT_DB_PATH, read_only=True)
+    try:
+        if not _has_store(conn):
+            return pd.DataFrame(columns=SUMMARY_COLUMNS), pd.DataFrame(columns=DETAIL_COLUMNS)
+        params = [underlying, start_date, end_date]
+        summary = conn.execute(f"""
+            SELECT strptime(trade_date, '%Y%m%d') AS date, {', '.join(_SUMMARY_VALUES)}
+            FROM {VIX_DAILY_TABLE}
+            WHERE underlying = ? AND trade_date BETWEEN ? AND ?
+            ORDER BY trade_date
+        """, params).fetchdf()
+        details = conn.execute(f"""
+            SELECT {', '.join(DETAIL_COLUMNS[:-1])}, strptime(trade_date, '%Y%m%d') AS date
+            FROM {VIX_DETAILS_TABLE}
+            WHERE underlying = ? AND trade_date BETWEEN ? AND ?
+            ORDER BY trade_date, term_type, exercise_price
+        """, params).fetchdf()
+    finally:
+        conn.close()
+    return summary, details
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Update the persisted VIX series")
+    parser.add_argument('--underlying', type=str, default=None,
+                        help='Underlying code (default: all supported underlyings)')
+    parser.add_argument('--end_date', type=str, default=None, help='End date YYYYMMDD (default today)')
+    parser.add_argument('--workers', type=int, default=VIX_WORKERS,
+                        help=f'Process pool size (default {VIX_WORKERS})')
+    parser.add_argument('--rebuild', action='store_true',
+                        help=f'Recompute from VIX_START_DATE ({VIX_START_DATE}) instead of incrementally')
+
+    args = parser.parse_args()
+
+    underlyings = [args.underlying] if args.underlying else None
+    results = update_all(args.end_date, underlyings, args.rebuild, args.workers)
+    failed = [u for u, n in results.items() if n < 0]
+    print(f"VIX store: {sum(n for n in results.values() if n > 0)} dates written, {len(failed)} failed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+# SHIBOR tenor columns -> days
+SHIBOR_TENORS: Dict[str, int] = {
+    'on': 1, '1w': 7, '2w': 14, '1m': 30, '3m': 90, '6m': 180, '9m': 270, '1y': 365
+}
+
+
+class ShiborCurve:
+    """
+    Daily SHIBOR term structure.
+
+    Stores only the quoted tenors per date (a dates x tenors array, rates in decimals) and
+    linearly interpolates at any maturity on demand, flat beyond the shortest / longest
+    tenor. Evaluating at integer days gives exactly the values of the former 1..365 day grid.
+    """
+
+    def __init__(self, dates: pd.DatetimeIndex, tenor_days: np.ndarray, rates: np.ndarray):
+        order = np.argsort(tenor_days, kind='stable')
+        tenor_days = np.asarray(tenor_days, dtype=float)[order]
+        rates = np.ascontiguousarray(np.asarray(rates, dtype=float)[:, order])
+        # Dedup tenors (keep the first quote of each)
+        tenor_days, first = np.unique(tenor_days, return_index=True)
+        self.index = pd.DatetimeIndex(dates)
+        self.tenor_days = tenor_days
+        self.rates = np.ascontiguousarray(rates[:, first])
+
+    @classmethod
+    def from_shibor(cls, shibor_df: pd.DataFrame) -> 'ShiborCurve':
+        """
+        Builds the curve from rows of the shibor table (date + tenor columns in percent).
+
+        Missing quotes are forward / backward filled per tenor; dates without any rate are dropped.
+        """
+        df = shibor_df.copy()
+        df['date'] = pd.to_datetime(df['date'].astype(str))
+        df = df.set_index('date').sort_index()
+        tenors = [c for c in SHIBOR_TENORS if c in df.columns]
+        quotes = (df[tenors] / 100.0).ffill().bfill()
+        quotes = quotes[quotes.notna().any(axis=1)]
+        return cls(quotes.index, np.array([SHIBOR_TENORS[c] for c in tenors]), quotes.to_numpy(dtype=float))
+
+    @property
+    def empty(self) -> bool:
+        return len(self.index) == 0 or len(self.tenor_days) == 0
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def rates_at(self, dates, days) -> np.ndarray:
+        """
+        Interpolated rates for (date, maturity in days) pairs, all evaluated at once.
+
+        Args:
+            dates: Dates (broadcast against days); dates not on the curve give NaN.
+            days: Maturities in days (float allowed).
+        """
+        dates, days = np.broadcast_arrays(np.asarray(dates), np.asarray(days, dtype=float))
+        row = self.index.get_indexer(pd.DatetimeIndex(dates.ravel()))
+        x = days.ravel()
+        xp = self.tenor_days
+        fp = self.rates[np.maximum(row, 0)]
+
+        # Same arithmetic as np.interp, row by row: fp[j] + slope * (x - xp[j])
+        j = np.clip(np.searchsorted(xp, x, side='right') - 1, 0, len(xp) - 1)
+        j_next = np.minimum(j + 1, len(xp) - 1)
+        k = np.arange(len(x))
+        y0, y1 = fp[k, j], fp[k, j_next]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            slope = (y1 - y0) / (xp[j_next] - xp[j])
+            out = slope * (x - xp[j]) + y0
+        out = np.where(x == xp[j], y0, out)
+        out = np.where(x <= xp[0], fp[:, 0], out)
+        out = np.where(x >= xp[-1], fp[:, -1], out)
+        out = np.where(row >= 0, out, np.nan)
+        return out.reshape(days.shape)
+
+    def rate(self, date, days: float) -> float:
+        """Interpolated rate of one date at one maturity in days."""
+        return float(self.rates_at([date], [days])[0])
+
+    def to_frame(self, days: Optional[np.ndarray] = None) -> pd.DataFrame:
+        """Dense grid (index=date, columns=days, default 1..365) as produced by get_shibor_interpolated."""
+        days = np.arange(1, 366) if days is None else np.asarray(days)
+        grid = self.rates_at(np.repeat(self.index.values, len(days)), np.tile(days, len(self.index)))
+        return pd.DataFrame(grid.reshape(len(self.index), len(days)), index=self.index, columns=days)